@@ -1,5 +1,7 @@
+from collections import Counter
 from PyQt6.QtWidgets import QMainWindow, QVBoxLayout, QWidget, QStackedWidget, QApplication, QHBoxLayout
 from PyQt6.QtGui import QIcon, QFont
+from PyQt6.QtCore import QTimer
 # Removed Qt and QLabel as they are not directly used now in this scope or handled by imported widgets
 
 # Import the actual views
@@ -12,6 +14,17 @@ from views.reports_view import ReportsView # Import ReportsView
 # Import the NavigationBar
 from navigation_bar import NavigationBar
 from theme_manager import THEME_MANAGER # Import ThemeManager
+from frame_dispatcher import FrameDispatcher
+from instrumentation import TRACER, HEARTBEAT_INTERVAL_MS
+from core import config
+from core.job_store import JobStore
+from core.sync import SyncClient
+from core.erp_outbox import ErpOutbox
+from core.production_log import ProductionLog
+from core.metrics import DashboardMetrics
+from core.printer_stats import PrinterStats
+from core.autosave import Autosave
+from core.event_bus import EVENT_BUS, JOBS_CHANGED, PRODUCTION
 
 class AppWindow(QMainWindow):
     def __init__(self):
@@ -20,6 +33,9 @@ class AppWindow(QMainWindow):
         # self.setWindowIcon(QIcon("path/to/your/icon.png")) # Add icon later
         self.setGeometry(100, 100, 1280, 720) # Adjusted size
 
+        # Events published from any thread reach the views once per frame, merged
+        self.event_dispatcher = FrameDispatcher(parent=self)
+
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
         self.main_layout = QHBoxLayout(self.central_widget)
@@ -34,12 +50,49 @@ class AppWindow(QMainWindow):
         self.content_area = QStackedWidget()
         self.main_layout.addWidget(self.content_area)
 
+        # Job store and the shared in-memory job history (columnar; read directly by the views' models)
+        self.job_store = JobStore()
+        self.job_table = self.job_store.load_table()
+        self.job_store.register_for_changes(self.publish_job_changes)
+        EVENT_BUS.subscribe(JOBS_CHANGED, self.on_jobs_changed)
+
+        # Multi-station sync (only when a hub is configured)
+        self.sync_client = None
+        if config.SYNC_HUB_URL:
+            self.sync_client = SyncClient(self.job_store)
+            self.sync_client.start()
+
+        # Step 7 tracking-system updates go through a local write-behind queue, never inline
+        self.erp_outbox = None
+        if config.TRACKING_URL:
+            self.erp_outbox = ErpOutbox()
+            self.erp_outbox.watch(self.job_store)
+            self.erp_outbox.start()
+
+        # Per-label production events (encoded / voided / retried) from the attached printers
+        self.production_log = ProductionLog()
+
+        # Dashboard counters, maintained per event instead of counted on refresh
+        self.metrics = DashboardMetrics()
+        self.metrics.seed(self.job_table)
+        self.metrics.seed_production(self.production_log.directory)
+        self.metrics.watch(self.job_store, self.production_log)
+
+        # Per-printer void/retry windows; calibration problems show up as System Alerts
+        self.printer_stats = PrinterStats(alerts=self.metrics)
+        self.printer_stats.watch(self.production_log)
+        # Registered after the counters above, so views never see a count they have not taken in yet
+        self.production_log.register_for_events(self.publish_production)
+
+        # Unsaved form input (checklists) is journaled on every edit and recovered after a crash
+        self.autosave = Autosave()
+
         # Initialize and add views
-        self.dashboard_view = DashboardView() # Instantiate DashboardView
-        self.jobs_view = JobsView()
-        self.labels_view = LabelsView()  # Use the new LabelsView
+        self.dashboard_view = DashboardView(self.metrics) # Instantiate DashboardView
+        self.jobs_view = JobsView(self.job_table, self.job_store, self.autosave)
+        self.labels_view = LabelsView(self.job_store)  # Use the new LabelsView
         self.settings_view = SettingsView()
-        self.reports_view = ReportsView() # Instantiate ReportsView
+        self.reports_view = ReportsView(self.job_store) # Instantiate ReportsView
 
         self.content_area.addWidget(self.dashboard_view) # Index 0
         self.content_area.addWidget(self.jobs_view)      # Index 1
@@ -60,6 +113,13 @@ class AppWindow(QMainWindow):
         THEME_MANAGER.register_for_theme_updates(self.update_theme_stylesheet)
         self.update_theme_stylesheet() # Apply initial theme
 
+        # Stall detection (ERP_TRACE): the watchdog thread flags the GUI thread when this timer stops firing
+        if TRACER.enabled:
+            self.stall_heartbeat = QTimer(self)
+            self.stall_heartbeat.timeout.connect(TRACER.heartbeat)
+            self.stall_heartbeat.start(HEARTBEAT_INTERVAL_MS)
+            TRACER.watch_current_thread()
+
     def update_theme_stylesheet(self):
         theme = THEME_MANAGER.current()
         self.setStyleSheet(f"""
@@ -78,10 +138,62 @@ class AppWindow(QMainWindow):
         # self.central_widget.setAutoFillBackground(True)
 
     def switch_view(self, index):
-        self.content_area.setCurrentIndex(index)
+        with TRACER.span("switch_view", "navigation", index=index):
+            self.content_area.setCurrentIndex(index)
+
+    def publish_job_changes(self, changes):
+        EVENT_BUS.publish(JOBS_CHANGED, None, changes)
+
+    def publish_production(self, events):
+        counts = Counter(event.printer for event in events)
+        EVENT_BUS.publish_many(PRODUCTION, counts.items())
+
+    def on_jobs_changed(self, events):
+        # Fold committed job deltas (local edits or pulled from other stations) into the shared table;
+        # everything committed during the last frame arrives as one merged list
+        changes = events[0].payload
+        with TRACER.span("fold_job_changes", "model", changes=len(changes)):
+            for change in changes:
+                if change.entity == "bulk":
+                    first, last = map(int, change.key.split(":"))
+                    for batch in self.job_store.iter_changes(first, last):
+                        self.fold_job_changes(batch)
+            self.fold_job_changes(changes)
+        self.jobs_view.job_model.refresh()
+
+    def fold_job_changes(self, changes):
+        new_jobs = {}
+        for change in changes:
+            if change.entity != "job":
+                continue
+            job_id = int(change.key)
+            if job_id in new_jobs:
+                new_jobs[job_id].update(change.data)
+                continue
+            row = self.job_table.row_of(job_id)
+            if row < 0:
+                new_jobs[job_id] = dict(change.data, job_id=job_id)
+            else:
+                self.job_table.update(row, change.data)
+        self.job_table.extend(new_jobs.values())
+
+    def closeEvent(self, event):
+        if self.sync_client:
+            self.sync_client.stop()
+        if self.erp_outbox:
+            self.erp_outbox.stop()
+        self.metrics.unwatch()
+        self.printer_stats.unwatch()
+        self.production_log.unregister_for_events(self.publish_production)
+        self.job_store.unregister_for_changes(self.publish_job_changes)
+        self.production_log.close()
+        self.autosave.close()
+        self.event_dispatcher.stop()
+        super().closeEvent(event)
 
     def __del__(self):
         THEME_MANAGER.unregister_for_theme_updates(self.update_theme_stylesheet)
+        EVENT_BUS.unsubscribe(JOBS_CHANGED, self.on_jobs_changed)
 
 if __name__ == '__main__':
     import sys
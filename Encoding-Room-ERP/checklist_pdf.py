@@ -0,0 +1,339 @@
+import os
+import time
+
+from PyQt6.QtCore import QMarginsF, QPointF, QRectF, Qt
+from PyQt6.QtGui import (
+    QColor, QFont, QGuiApplication, QPageLayout, QPageSize, QPainter, QPainterPath, QPdfWriter, QPen, QStaticText
+)
+
+from core.checklist import (APPROVAL_STEP, APPROVALS, CHECKLIST_STEPS, CHECKLIST_VERSION, DATE_FIELD, JOB_DETAILS,
+                            SAMPLE_TAGS, checklist_data, checklist_path, value_name)
+
+# Encoding Checklist (V4.1) PDFs rendered with QPdfWriter / QPainter.
+#
+# The form's geometry, its static text (as QStaticText, laid out once) and all
+# of its lines and empty boxes (one QPainterPath) are built once per process
+# by ChecklistTemplate; rendering a job only draws that template plus the
+# job's values. render_checklists() spreads a batch over a process pool; each
+# worker runs its own offscreen QGuiApplication, so a month of checklists
+# renders without touching the GUI process's event loop.
+#
+# Coordinates are PDF points (the writer runs at 72 dpi) on an A4 page.
+
+PAGE_WIDTH = 595.0
+PAGE_HEIGHT = 842.0
+MARGIN = 36.0
+BATCH_CHUNK_SIZE = 16  # jobs per pool task: big enough to amortize the IPC, small enough for smooth progress
+
+_BOX = 8.0
+_INK = QColor("#212529")
+_MUTED = QColor("#6c757d")
+_RULE = QColor("#adb5bd")
+_WATERMARK = QColor("#e3e6e9")
+
+
+def _font(size, bold=False, family="Arial"):
+    font = QFont(family)
+    font.setPointSizeF(size)
+    font.setBold(bold)
+    return font
+
+
+class ChecklistTemplate:
+    """Page layout of the checklist form; built once and reused for every page"""
+
+    def __init__(self):
+        self.title_font = _font(16, True)
+        self.detail_font = _font(9.5, True)
+        self.heading_font = _font(10.5, True)
+        self.item_font = _font(8)
+        self.entry_font = _font(8, True)
+        self.entry_font.setItalic(True)
+        self.label_font = _font(7)
+        self.value_font = _font(9)
+        self.mono_font = _font(6.5, family="Courier")
+        self.watermark_font = _font(22, True)
+        self.static_text = []  # (QPointF, QStaticText, QFont, QColor)
+        self.lines = QPainterPath()
+        self.heavy_lines = QPainterPath()
+        self.fields = {}  # name -> QRectF the value is drawn into
+        self.boxes = {}   # name -> QRectF of a check box
+        self._build()
+
+    # -- building ------------------------------------------------------------
+
+    def _text(self, x, y, text, font, color=_INK):
+        static = QStaticText(text)
+        static.setPerformanceHint(QStaticText.PerformanceHint.AggressiveCaching)
+        static.prepare(font=font)
+        self.static_text.append((QPointF(x, y), static, font, color))
+        return static.size().width()
+
+    def _rule(self, x1, x2, y, path=None):
+        path = self.lines if path is None else path
+        path.moveTo(x1, y)
+        path.lineTo(x2, y)
+
+    def _box(self, name, x, y):
+        rect = QRectF(x, y, _BOX, _BOX)
+        self.lines.addRect(rect)
+        self.boxes[name] = rect
+
+    def _field(self, name, x, y, width, height=11.0, underline=True):
+        self.fields[name] = QRectF(x, y, width, height)
+        if underline:
+            self._rule(x, x + width, y + height)
+
+    def _build(self):
+        left, right = MARGIN, PAGE_WIDTH - MARGIN
+        middle = left + (right - left) / 2
+        y = MARGIN
+
+        # Header: "Encoding Checklist / Date: ____"
+        self._text(right - 140, y - 14, f"Form {CHECKLIST_VERSION}", self.label_font, _MUTED)
+        self._text(right - 90, y - 14, "Job", self.label_font, _MUTED)
+        self._field("job_id", right - 74, y - 16, 74, underline=False)
+        width = self._text(left, y, "Encoding Checklist / Date:", self.title_font)
+        self._field(value_name(APPROVAL_STEP, DATE_FIELD), left + width + 10, y + 3, 150)
+        y += 26
+
+        # Job details: two columns, one ruled row per field
+        for column, details in enumerate(JOB_DETAILS):
+            x = left if column == 0 else middle + 4
+            column_right = middle - 4 if column == 0 else right
+            value_x = x + max(self._text(x, y + row * 14 + 1, f"{label}:", self.detail_font)
+                              for row, (_, label) in enumerate(details)) + 8
+            for row in range(len(details)):
+                row_y = y + row * 14
+                self._field(f"detail:{column}:{row}", value_x, row_y + 1, column_right - value_x, underline=False)
+                self._rule(x, column_right, row_y + 13)
+        y += max(len(details) for details in JOB_DETAILS) * 14 + 2
+        self._rule(left, right, y, self.heavy_lines)
+        y += 8
+
+        # Steps: 1-3 on the left; 5, the sample, 6, approvals and 7 on the right
+        column_y = [y, y]
+        column_x = [left, middle + 4]
+        column_width = [middle - 4 - left, right - middle - 4]
+        for step in CHECKLIST_STEPS:
+            if step.number == 6:
+                column_y[1] = self._sample_box(column_x[1], column_y[1], column_width[1])
+            if step.number == 7:
+                column_y[1] = self._approvals(column_x[1], column_y[1], column_width[1])
+            column_y[step.column] = self._step(step, column_x[step.column], column_y[step.column],
+                                               column_width[step.column])
+        self.bottom = max(column_y)
+
+    def _step(self, step, x, y, width):
+        self._text(x, y, f"{step.number}. {step.title}", self.heading_font)
+        y += 16
+        for item in step.items:
+            name = value_name(step.number, item.field)
+            indent = x + 12 + item.level * 14
+            if item.kind == "check":
+                self._box(name, indent, y + 1)
+                self._text(indent + 14, y, item.label, self.entry_font if item.level else self.item_font)
+                y += 13
+            else:
+                self._text(indent + 8, y + 1, f"{item.label}:", self.entry_font)
+                self._field(name, indent + 68, y, min(110, x + width - indent - 68))
+                y += 15
+        return y + 6
+
+    def _sample_box(self, x, y, width):
+        # Each sample tag gets its own two single-line fields (EPC, URI) below the watermark,
+        # so a line never runs into the next tag's
+        height, line, gap = 130.0, 8.0, 4.0
+        self.lines.addRect(QRectF(x, y, width, height))
+        self._text(x + width - 150, y + 8, "Attach", self.watermark_font, _WATERMARK)
+        self._text(x + 14, y + 32, "Sample Here", self.watermark_font, _WATERMARK)
+        row_y = y + height - 6 - SAMPLE_TAGS * (2 * line + gap) + gap
+        for index in range(SAMPLE_TAGS):
+            self._field(f"sample:{index}:epc", x + 6, row_y, width - 12, line, underline=False)
+            self._field(f"sample:{index}:uri", x + 6, row_y + line, width - 12, line, underline=False)
+            row_y += 2 * line + gap
+        return y + height + 10
+
+    def _approvals(self, x, y, width):
+        for field, label in APPROVALS:
+            self._text(x, y + 1, f"{label}:", self.entry_font)
+            self._field(value_name(APPROVAL_STEP, field), x + 110, y, width - 110)
+            y += 20
+        return y + 4
+
+    # -- drawing -------------------------------------------------------------
+
+    def draw(self, painter, data):
+        painter.setPen(QPen(_RULE, 0.5))
+        painter.drawPath(self.lines)
+        painter.setPen(QPen(_INK, 1.5))
+        painter.drawPath(self.heavy_lines)
+        for point, static, font, color in self.static_text:
+            painter.setFont(font)
+            painter.setPen(color)
+            painter.drawStaticText(point, static)
+
+        values = data["values"]
+        painter.setPen(_INK)
+        painter.setFont(self.value_font)
+        self._value(painter, "job_id", str(data["job_id"]))
+        self._value(painter, value_name(APPROVAL_STEP, DATE_FIELD), values.get(value_name(APPROVAL_STEP, DATE_FIELD)))
+        for column, details in enumerate(data["details"]):
+            for row, (_, value) in enumerate(details):
+                self._value(painter, f"detail:{column}:{row}", value)
+        for step in CHECKLIST_STEPS:
+            for item in step.items:
+                name = value_name(step.number, item.field)
+                if item.kind == "check":
+                    if values.get(name):
+                        self._check(painter, name)
+                else:
+                    self._value(painter, name, values.get(name))
+        for field, _ in APPROVALS:
+            name = value_name(APPROVAL_STEP, field)
+            self._value(painter, name, values.get(name))
+
+        painter.setFont(self.mono_font)
+        for index, (tag, epc, uri) in enumerate(data["sample"]):
+            self._value(painter, f"sample:{index}:epc", f"#{tag} {epc}")
+            self._value(painter, f"sample:{index}:uri", uri)
+
+    def _value(self, painter, name, value):
+        if value not in (None, "", False):
+            painter.drawText(self.fields[name], Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, str(value))
+
+    def _check(self, painter, name):
+        rect = self.boxes[name].adjusted(1.5, 1.5, -1.5, -1.5)
+        mark = QPainterPath(QPointF(rect.left(), rect.center().y()))
+        mark.lineTo(rect.left() + rect.width() * 0.4, rect.bottom())
+        mark.lineTo(rect.right(), rect.top())
+        painter.save()
+        painter.setPen(QPen(_INK, 1.2))
+        painter.drawPath(mark)
+        painter.restore()
+
+
+_TEMPLATE = None
+
+
+def template():
+    global _TEMPLATE
+    if _TEMPLATE is None:
+        _TEMPLATE = ChecklistTemplate()
+    return _TEMPLATE
+
+
+def render_checklist(data, path):
+    """Write one job's checklist (data from core.checklist.checklist_data) to `path`"""
+    tmp_path = path + ".tmp"
+    writer = QPdfWriter(tmp_path)
+    writer.setResolution(72)
+    writer.setPageLayout(QPageLayout(QPageSize(QPageSize.PageSizeId.A4), QPageLayout.Orientation.Portrait,
+                                     QMarginsF(0, 0, 0, 0)))
+    writer.setTitle(f"Encoding Checklist - Job {data['job_id']}")
+    writer.setCreator("Encoding Room ERP")
+    painter = QPainter(writer)
+    try:
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        template().draw(painter, data)
+    finally:
+        painter.end()
+    os.replace(tmp_path, path)
+
+
+# -- batches -------------------------------------------------------------------
+
+_APP = None
+
+
+def _ensure_app():
+    """Painting text needs a QGuiApplication; worker processes and the CLI run one offscreen"""
+    global _APP
+    if QGuiApplication.instance() is None:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        _APP = QGuiApplication([])
+
+
+def _render_chunk(job_ids, directory):
+    """Render several jobs in one worker; returns [(job_id, ok, message)]"""
+    from core.job_store import JobStore
+    _ensure_app()
+    store = JobStore()
+    results = []
+    try:
+        for job_id in job_ids:
+            try:
+                data = checklist_data(store, job_id)
+                if data is None:
+                    results.append((job_id, False, f"job {job_id}: not found"))
+                    continue
+                path = checklist_path(directory, job_id)
+                render_checklist(data, path)
+                results.append((job_id, True, f"job {job_id}: {path}"))
+            except (OSError, ValueError) as error:
+                results.append((job_id, False, f"job {job_id}: {error}"))
+    finally:
+        store.close()
+    return results
+
+
+def render_checklists(job_ids, directory, workers=None, progress=None, chunk_size=BATCH_CHUNK_SIZE):
+    """Render the checklists of many jobs into `directory`; yields (job_id, ok, message) as they finish
+
+    workers: processes (default: all cores but one, so the GUI keeps a core); 1
+    renders in this process. progress(done, total) is called after every chunk.
+    """
+    os.makedirs(directory, exist_ok=True)
+    job_ids = list(job_ids)
+    chunks = [job_ids[i:i + chunk_size] for i in range(0, len(job_ids), chunk_size)]
+    workers = max(1, (os.cpu_count() or 2) - 1) if workers is None else workers
+    done = 0
+    if workers <= 1 or len(chunks) <= 1:
+        finished = (_render_chunk(chunk, directory) for chunk in chunks)
+    else:
+        finished = _pool_results(chunks, directory, min(workers, len(chunks)))
+    for results in finished:
+        done += len(results)
+        if progress is not None:
+            progress(done, len(job_ids))
+        yield from results
+
+
+def _pool_results(chunks, directory, workers):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    # spawn, not fork: forking a process that already runs Qt (the GUI) is unsafe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(_render_chunk, chunk, directory) for chunk in chunks]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+if __name__ == '__main__':
+    # Time a batch against the jobs in ERP_DATA_DIR: python checklist_pdf.py OUT_DIR [jobs] [workers]
+    import sys
+
+    from core.job_store import JobStore
+
+    out = sys.argv[1] if len(sys.argv) > 1 else "checklists"
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    store = JobStore()
+    job_ids = list(store.load_table().column("job_id").values)[:limit]
+    store.close()
+    if not job_ids:
+        sys.exit("no jobs")
+
+    _ensure_app()
+    started = time.perf_counter()
+    template()
+    print(f"template built in {(time.perf_counter() - started) * 1000:.1f} ms")
+    started = time.perf_counter()
+    failures = sum(not ok for _, ok, _ in render_checklists(job_ids[:50], out, workers=1))
+    single = (time.perf_counter() - started) / min(50, len(job_ids))
+    print(f"one process:  {single * 1000:.1f} ms per checklist")
+    started = time.perf_counter()
+    failures += sum(not ok for _, ok, _ in render_checklists(job_ids, out, workers=workers))
+    elapsed = time.perf_counter() - started
+    print(f"process pool: {len(job_ids):,} checklists in {elapsed:.1f}s ({elapsed / len(job_ids) * 1000:.1f} ms each), "
+          f"{failures} failed")
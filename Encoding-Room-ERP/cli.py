@@ -0,0 +1,444 @@
+import argparse
+import os
+import sys
+import time
+
+# Headless entry point for the print server and cron jobs:
+#   python cli.py generate 1200 1300 --workers 4
+#   python cli.py export --status "In Progress" --format zpl --out /srv/spool
+#   python cli.py passwords 1200 --tags 1-10
+#   python cli.py passwords --new-key
+#   python cli.py verify 1200:reads/1200.csv
+#   python cli.py import orders/*.csv
+#   python cli.py report --date 2024-05-02
+#   python cli.py schedule --printers printers.json
+#   python cli.py checklists --month 2024-05 --out /srv/compliance/2024-05
+#   python cli.py extract tags --from 2024-05-01 --to 2024-05-31 --out tags-2024-05.parquet
+#
+# Uses the same core engines and data directory (ERP_DATA_DIR) as the app but
+# never imports PyQt6 (except `checklists`, which renders with Qt offscreen);
+# engine modules (NumPy etc.) are imported by the command that needs them, so
+# `--help` and small commands start immediately.
+
+
+def _job_ids(args, store):
+    job_ids = list(args.job_ids)
+    if args.status:
+        table = store.load_table("WHERE status = ?", (args.status,))
+        job_ids += list(table.column("job_id").values)
+    if not job_ids:
+        raise SystemExit("no jobs selected (give job ids or --status)")
+    return job_ids
+
+
+def _run_parallel(function, tasks, workers):
+    """function(*task) for every task, in a process pool when --workers > 1; yields results as they finish"""
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield function(*task)
+        return
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(function, *task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _load_jobs(args, job_ids=None):
+    """Job records (as dicts, for the process pool) of the selected jobs, or of `job_ids`"""
+    from core.job_store import JobStore
+    store = JobStore()
+    try:
+        jobs = []
+        for job_id in job_ids if job_ids is not None else _job_ids(args, store):
+            job = store.get_job(int(job_id))
+            if job is None:
+                print(f"job {job_id}: not found", file=sys.stderr)
+                continue
+            jobs.append(job.as_dict())
+        return jobs
+    finally:
+        store.close()
+
+
+# -- workers (top-level so the process pool can pickle them) -------------------
+
+def _generate_one(job, company_digits, force):
+    from core.epc_data_file import ensure_job_data, generate_job_data
+    from core.epc_guard import EpcGuard
+    from core.job_records import JobRecord
+    started = time.perf_counter()
+    record = JobRecord.from_dict(job)
+    try:
+        # A data file written before the job's serials / GTIN changed is regenerated, not reused; the
+        # duplicate-EPC guard refuses a job whose EPCs were already issued to another job
+        if force:
+            data_file = generate_job_data(record, company_digits=company_digits, guard=EpcGuard())
+        else:
+            data_file = ensure_job_data(record, company_digits, guard=EpcGuard())
+    except (ValueError, OSError) as error:
+        return False, f"job {job['job_id']}: {error}"
+    return True, (f"job {job['job_id']}: {len(data_file):,} tags, {data_file.roll_count:,} rolls "
+                  f"({time.perf_counter() - started:.2f}s)")
+
+
+def _export_one(job, fmt, directory, company_digits, lock, password_workers):
+    from core.encode_export import export_job, export_path
+    from core.epc_data_file import ensure_job_data
+    from core.epc_guard import EpcGuard
+    from core.job_records import JobRecord
+    from core.tag_passwords import job_secret
+    started = time.perf_counter()
+    try:
+        # Generated first if missing, regenerated if the job changed since
+        guard = EpcGuard()
+        data_file = ensure_job_data(JobRecord.from_dict(job), company_digits, guard=guard)
+        path = export_path(data_file, directory, fmt)
+        # Jobs flagged for memory locking carry per-tag access / kill passwords
+        secret = job_secret(job["job_id"]) if lock or job.get("lock") else None
+        labels = export_job(data_file, path, fmt, secret=secret, workers=password_workers, guard=guard)
+    except (ValueError, OSError) as error:
+        return False, f"job {job['job_id']}: {error}"
+    return True, f"job {job['job_id']}: {labels:,} labels -> {path} ({time.perf_counter() - started:.2f}s)"
+
+
+def _verify_one(job, reads_path, report_directory, company_digits):
+    from core.encode_export import read_epc_list, verify_reads
+    from core.epc_array import to_hex
+    from core.epc_data_file import open_job_data
+    from core.job_records import JobRecord
+    job_id = job["job_id"]
+    try:
+        # A stale data file (job edited since) is an error here: verifying against old EPCs proves nothing
+        data_file = open_job_data(JobRecord.from_dict(job), company_digits=company_digits)
+    except ValueError as error:
+        return False, f"job {job_id}: {error}"
+    if data_file is None:
+        return False, f"job {job_id}: no EPC data (run generate first)"
+    try:
+        result = verify_reads(data_file, read_epc_list(reads_path))
+    except (ValueError, OSError) as error:
+        return False, f"job {job_id}: {error}"
+    ok = not (result["missing"] or result["unexpected"] or result["duplicated"])
+    message = (f"job {job_id}: {'OK' if ok else 'MISMATCH'} - {result['unique']:,}/{result['expected']:,} tags read, "
+               f"{result['missing']:,} missing, {result['unexpected']:,} unexpected, "
+               f"{result['duplicated']:,} read more than once")
+    if report_directory and not ok:
+        path = os.path.join(report_directory, f"job-{job_id}-verify.csv")
+        with open(path, "w", newline="") as handle:
+            handle.write("Problem,Tag,EPC\r\n")
+            handle.writelines(f"missing,{tag + 1},{data_file.hex(tag)}\r\n" for tag in result["missing_tags"])
+            handle.writelines(f"unexpected,,{epc}\r\n" for epc in to_hex(result["unexpected_epcs"]))
+            handle.writelines(f"duplicated,,{epc}\r\n" for epc in to_hex(result["duplicated_epcs"]))
+        message += f" (details in {path})"
+    return ok, message
+
+
+# -- commands ------------------------------------------------------------------
+
+def _report_results(results):
+    failures = 0
+    for ok, message in results:
+        print(message, file=sys.stdout if ok else sys.stderr)
+        failures += not ok
+    return 1 if failures else 0
+
+
+def cmd_generate(args):
+    jobs = _load_jobs(args)
+    return _report_results(_run_parallel(
+        _generate_one, [(job, args.company_digits, args.force) for job in jobs], args.workers))
+
+
+def cmd_export(args):
+    os.makedirs(args.out, exist_ok=True)
+    jobs = _load_jobs(args)
+    # Password derivation gets its own process pool only when jobs are not already exported in parallel
+    password_workers = 1 if args.workers > 1 else None
+    return _report_results(_run_parallel(
+        _export_one, [(job, args.format, args.out, args.company_digits, args.lock, password_workers) for job in jobs],
+        args.workers))
+
+
+def cmd_passwords(args):
+    from core.epc_data_file import open_job_data
+    from core.job_records import JobRecord
+    from core.tag_passwords import TagKeyError, create_master_key, job_passwords, job_secret, tag_passwords, to_hex
+
+    try:
+        if args.new_key:
+            print(create_master_key().hex().upper())
+            return 0
+        if args.job_id is None:
+            raise SystemExit("give a JOB_ID (or --new-key)")
+        secret = job_secret(args.job_id)
+    except TagKeyError as error:
+        raise SystemExit(str(error))
+    if args.epc:
+        for epc in args.epc:
+            access, kill = tag_passwords(secret, epc)
+            print(f"{epc.upper()},{access},{kill}")
+        return 0
+    jobs = _load_jobs(args, [args.job_id])
+    if not jobs:
+        return 1
+    try:
+        data_file = open_job_data(JobRecord.from_dict(jobs[0]), company_digits=args.company_digits)
+    except ValueError as error:
+        raise SystemExit(f"job {args.job_id}: {error}")
+    if data_file is None:
+        raise SystemExit(f"job {args.job_id}: no EPC data (run generate first, or give --epc)")
+    first, last = 1, len(data_file)
+    if args.tags:
+        first, _, last = args.tags.partition("-")
+        first, last = int(first), int(last or first)
+        if not 1 <= first <= last <= len(data_file):
+            raise SystemExit(f"job {args.job_id}: tags run from 1 to {len(data_file):,}")
+    print("Tag,EPC,AccessPwd,KillPwd")
+    (access, kill), = job_passwords(data_file, secret, [(first - 1, last)], workers=1)
+    for tag, epc, a, k in zip(range(first, last + 1), data_file.hex_range(first - 1, last), to_hex(access), to_hex(kill)):
+        print(f"{tag},{epc},{a},{k}")
+    return 0
+
+
+def cmd_verify(args):
+    tasks = []
+    for pair in args.pairs:
+        job_id, _, reads_path = pair.partition(":")
+        if not job_id.isdigit() or not reads_path:
+            raise SystemExit(f"expected JOB_ID:READS_FILE, got {pair!r}")
+        tasks.append((int(job_id), reads_path))
+    jobs = {job["job_id"]: job for job in _load_jobs(args, [job_id for job_id, _ in tasks])}
+    tasks = [(jobs[job_id], reads_path, args.report_dir, args.company_digits)
+             for job_id, reads_path in tasks if job_id in jobs]
+    if args.report_dir:
+        os.makedirs(args.report_dir, exist_ok=True)
+    return _report_results(_run_parallel(_verify_one, tasks, args.workers))
+
+
+def cmd_import(args):
+    # One writer: the job store is a single SQLite database, so files are imported one after another
+    from core.job_import import import_jobs
+    from core.job_store import JobStore
+    store = JobStore()
+    failures = 0
+    try:
+        for path in args.files:
+            result = import_jobs(path, store, chunk_size=args.chunk_size)
+            print(result)
+            for error in result.errors[:args.show_errors]:
+                print(f"  line {error.line}, {error.column}: {error.message}", file=sys.stderr)
+            failures += bool(result.errors)
+    finally:
+        store.close()
+    return 1 if failures else 0
+
+
+def cmd_report(args):
+    import json
+    from collections import Counter
+    from datetime import date, datetime, timedelta
+    from core.job_store import JobStore
+    from core.production_log import EVENT_KINDS, read_events
+
+    day = date.fromisoformat(args.date) if args.date else date.today()
+    day_start = datetime.combine(day, datetime.min.time()).timestamp()
+    day_end = datetime.combine(day + timedelta(days=1), datetime.min.time()).timestamp()
+
+    store = JobStore()
+    try:
+        jobs_by_status = store.count_jobs_by("status")
+        completed = store.count_jobs_by("status", "WHERE completed_date = ?", (day.toordinal(),)).get("Completed", 0)
+    finally:
+        store.close()
+    production = Counter()
+    for event in read_events(since=day_start):
+        if event.ts < day_end:
+            production[event.printer, EVENT_KINDS.get(event.kind, str(event.kind))] += 1
+
+    report = {
+        "date": day.isoformat(),
+        "jobs_by_status": jobs_by_status,
+        "jobs_completed": completed,
+        "labels": {printer: {kind: count for (p, kind), count in sorted(production.items()) if p == printer}
+                   for printer in sorted({printer for printer, _ in production})},
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    print(f"Report for {report['date']}")
+    print("Jobs by status: " + ", ".join(f"{status or '-'}: {count:,}" for status, count in jobs_by_status.items()))
+    print(f"Jobs completed: {completed:,}")
+    for printer, kinds in report["labels"].items():
+        print(f"  {printer:<12} " + "  ".join(f"{kind} {count:,}" for kind, count in kinds.items()))
+    return 0
+
+
+def cmd_schedule(args):
+    from core import config
+    from core.job_store import JobStore
+    from core.scheduler import Scheduler, jobs_from_records, load_printers
+
+    path = args.printers or config.data_path("printers.json")
+    try:
+        printers = load_printers(path)
+    except FileNotFoundError:
+        raise SystemExit(f"no printer setup: {path} not found (create it, or give --printers)")
+    except (ValueError, TypeError) as error:
+        raise SystemExit(f"printer setup {path}: {error}")
+    store = JobStore()
+    try:
+        table = store.load_table("WHERE status IN ('Pending', 'In Progress')")
+    finally:
+        store.close()
+    scheduler = Scheduler(printers, jobs_from_records(
+        (table.record(row) for row in range(len(table))), urgent_days=args.urgent_days))
+    started = time.perf_counter()
+    assignments = scheduler.plan()
+    print(f"{len(table):,} open jobs on {len(printers)} printers: total weighted completion "
+          f"{scheduler.cost():,.0f} min, last job done after {scheduler.makespan():,.0f} min "
+          f"(planned in {(time.perf_counter() - started) * 1000:.0f} ms)")
+    for assignment in assignments:
+        split = assignment.job_id in scheduler.shares
+        print(f"  {assignment.printer:<12} job {assignment.job_id:<8} {assignment.start:8.0f} - {assignment.end:8.0f} min"
+              + (f"  rolls {assignment.first_roll}-{assignment.first_roll + assignment.rolls - 1}" if split else "")
+              + (f"  (changeover {assignment.changeover:.0f} min)" if assignment.changeover else ""))
+    for job_id in scheduler.unassigned:
+        print(f"job {job_id}: no printer that is up can print it", file=sys.stderr)
+    return 1 if scheduler.unassigned else 0
+
+
+def cmd_checklists(args):
+    from checklist_pdf import render_checklists
+    from core.checklist import completed_job_ids, month_range
+    from core.job_store import JobStore
+
+    store = JobStore()
+    try:
+        job_ids = _job_ids(args, store) if args.job_ids or args.status else []
+        if args.month:
+            year, month = (int(part) for part in args.month.split("-"))
+            job_ids += completed_job_ids(store, *month_range(year, month))
+    finally:
+        store.close()
+    if not job_ids:
+        raise SystemExit("no jobs selected (give job ids, --status or --month)")
+    started = time.perf_counter()
+    status = _report_results((ok, message) for _, ok, message in
+                             render_checklists(job_ids, args.out, workers=args.workers))
+    print(f"{len(job_ids):,} checklists in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return status
+
+
+def cmd_extract(args):
+    from datetime import date
+    from core.job_store import JobStore
+    from core.report_export import export_report, report_source
+
+    first_day = date.fromisoformat(args.first) if args.first else None
+    last_day = date.fromisoformat(args.last) if args.last else first_day
+    fmt = args.format or ("xlsx" if args.out.lower().endswith(".xlsx") else "parquet")
+
+    def progress(rows, fraction):
+        print(f"\r{rows:,} rows ({fraction:.0%})", end="", file=sys.stderr, flush=True)
+
+    store = JobStore()
+    try:
+        source = report_source(store, args.kind, first_day, last_day, args.job_ids)
+        result = export_report(source, args.out, fmt, args.kind, progress=progress)
+    finally:
+        store.close()
+    print(f"\n{result.rows:,} rows to {result.path} in {result.elapsed:.1f}s", file=sys.stderr)
+    if result.skipped:
+        print(f"no EPC data for jobs {', '.join(map(str, result.skipped))}", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    from core import config  # settings only; no engine imports
+    parser = argparse.ArgumentParser(prog="cli.py", description="Encoding Room ERP batch tools (no GUI)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def company_digits(command):
+        command.add_argument("--company-digits", type=int, default=config.COMPANY_DIGITS,
+                             help=f"GS1 company prefix length used for SGTIN encoding "
+                                  f"(default {config.COMPANY_DIGITS}, from ERP_COMPANY_DIGITS)")
+
+    def job_selection(command):
+        command.add_argument("job_ids", nargs="*", type=int, metavar="JOB_ID")
+        command.add_argument("--status", help='select every job with this status, e.g. "In Progress"')
+        company_digits(command)
+        command.add_argument("--workers", type=int, default=1, help="jobs processed in parallel (processes)")
+
+    generate = commands.add_parser("generate", help="write the EPC data file of jobs")
+    job_selection(generate)
+    generate.add_argument("--force", action="store_true", help="regenerate even if the data file exists")
+    generate.set_defaults(handler=cmd_generate)
+
+    export = commands.add_parser("export", help="export encode data (BarTender CSV or ZPL)")
+    job_selection(export)
+    export.add_argument("--format", choices=("csv", "zpl"), default="csv")
+    export.add_argument("--out", default=".", help="output directory")
+    export.add_argument("--lock", action="store_true",
+                        help="include per-tag access / kill passwords for every job (default: jobs marked Lock)")
+    export.set_defaults(handler=cmd_export)
+
+    passwords = commands.add_parser("passwords", help="regenerate per-tag access / kill passwords of a job")
+    passwords.add_argument("job_id", type=int, nargs="?", metavar="JOB_ID")
+    passwords.add_argument("--tags", help="tag or range of tags, e.g. 1-100 (default: every tag)")
+    passwords.add_argument("--epc", nargs="+", help="passwords for these EPCs (hex) instead of the job's data file")
+    passwords.add_argument("--new-key", action="store_true",
+                           help="create this station's master key file and print it (hex) for the other stations")
+    company_digits(passwords)
+    passwords.set_defaults(handler=cmd_passwords)
+
+    verify = commands.add_parser("verify", help="check reader read-back files against the job data")
+    verify.add_argument("pairs", nargs="+", metavar="JOB_ID:READS_FILE")
+    verify.add_argument("--report-dir", help="write a per-job CSV of missing/unexpected/duplicated tags")
+    verify.add_argument("--workers", type=int, default=1)
+    company_digits(verify)
+    verify.set_defaults(handler=cmd_verify)
+
+    import_ = commands.add_parser("import", help="import customer order files (CSV / XLSX)")
+    import_.add_argument("files", nargs="+")
+    import_.add_argument("--chunk-size", type=int, default=10000)
+    import_.add_argument("--show-errors", type=int, default=20, help="rejected rows to print per file")
+    import_.set_defaults(handler=cmd_import)
+
+    report = commands.add_parser("report", help="daily job and production summary")
+    report.add_argument("--date", help="YYYY-MM-DD (default today)")
+    report.add_argument("--json", action="store_true")
+    report.set_defaults(handler=cmd_report)
+
+    schedule = commands.add_parser("schedule", help="plan which printer runs which open job, and in what order")
+    schedule.add_argument("--printers", help="printer setup JSON (default printers.json in the data directory)")
+    schedule.add_argument("--urgent-days", type=int, default=1, help="jobs due within this many days are urgent")
+    schedule.set_defaults(handler=cmd_schedule)
+
+    checklists = commands.add_parser("checklists", help="render Encoding Checklist PDFs")
+    checklists.add_argument("job_ids", nargs="*", type=int, metavar="JOB_ID")
+    checklists.add_argument("--status", help='every job with this status, e.g. "Completed"')
+    checklists.add_argument("--month", help="every job completed in this month (YYYY-MM)")
+    checklists.add_argument("--out", default="checklists", help="output directory")
+    checklists.add_argument("--workers", type=int, help="rendering processes (default: all cores but one)")
+    checklists.set_defaults(handler=cmd_checklists)
+
+    extract = commands.add_parser("extract", help="per-tag or per-event extract (Parquet / XLSX)")
+    extract.add_argument("kind", choices=("tags", "production"))
+    extract.add_argument("job_ids", nargs="*", type=int, metavar="JOB_ID",
+                         help="only these jobs (tags: default every job completed in the date range)")
+    extract.add_argument("--from", dest="first", help="first day, YYYY-MM-DD")
+    extract.add_argument("--to", dest="last", help="last day, YYYY-MM-DD (default --from)")
+    extract.add_argument("--format", choices=("parquet", "xlsx"), help="default: from the --out extension")
+    extract.add_argument("--out", required=True, help="output file")
+    extract.set_defaults(handler=cmd_extract)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import logging
+import os
+from collections import namedtuple
+from datetime import date
+
+# The Encoding Checklist (form V4.1): what the form contains and where each value
+# is stored. Job details come from the job record, the steps and approvals from
+# the job store's checklist_steps (set_step / get_steps), the sample from the
+# job's EPC data file. Renderers and forms read these definitions, so the
+# layout lives in one place. Step numbers follow the printed form, which has
+# no step 4.
+#
+# Forms and renderers address a value as "step:field", e.g. "3:darkness".
+
+log = logging.getLogger(__name__)
+
+CHECKLIST_VERSION = "V4.1"
+
+ChecklistStep = namedtuple("ChecklistStep", "number title items column")
+ChecklistItem = namedtuple("ChecklistItem", "field label kind level")  # kind "check" or "text"
+
+
+def _check(field, label, level=0):
+    return ChecklistItem(field, label, "check", level)
+
+
+def _text(field, label, level=1):
+    return ChecklistItem(field, label, "text", level)
+
+
+# Header block, two columns of (job field, label); "production_qty" is QTY plus overage
+JOB_DETAILS = (
+    (("customer", "Customer"), ("part_number", "Part #"), ("job_ticket", "Job Ticket #"),
+     ("customer_po", "Customer PO #"), ("inlay_type", "Inlay Type"), ("label_size", "Label Size"),
+     ("layout", "Layout"), ("qty", "QTY")),
+    (("start_serial", "START"), ("end_serial", "STOP"), ("lpr", "LPR"), ("rolls", "ROLLS"), ("upc", "UPC"),
+     ("item", "Item"), ("label_type", "Label Type"), ("overage", "Overage"), ("production_qty", "PRODUCTION QTY")),
+)
+
+CHECKLIST_STEPS = (
+    ChecklistStep(1, "Job Ticket Review", (
+        _check("verify_customer", "Verify customer name"),
+        _check("confirm_job_po", "Confirm job number and purchase order number"),
+        _check("master_rolls_oriented", "Verify Master Rolls Are Oriented Correctly"),
+        _check("check_size_qty", "Check label size and quantity"),
+        _check("verify_inlay", "Verify inlay type and placement"),
+        _check("special_instructions", "Note any special instructions /specific requirements"),
+    ), 0),
+    ChecklistStep(2, "Material Preparation", (
+        _check("label_stock_matches", "Label stock is available and matches job ticket"),
+        _check("verify_ribbon", "Verify ribbon type and size"),
+        _text("ribbon", "Ribbon"),
+    ), 0),
+    ChecklistStep(3, "Printer Setup & RFID calibration", (
+        _check("verify_printer_settings", "Verify printer settings"),
+        _text("printer", "Printer"),
+        _text("speed", "Speed"),
+        _text("darkness", "Darkness"),
+        _check("rfid_calibration", "RFID Calibration"),
+        _check("check_encoding_settings", "Check encoding settings"),
+        _check("internal", "Internal", 1),
+        _check("external", "External", 1),
+        _check("lock", "Lock", 1),
+        _text("lock_code", "Code", 2),
+        _check("label_design", "Label Design & Encoding Scheme"),
+        _check("bartender", "Bartender", 1),
+        _check("nice_label", "Nice Label", 1),
+        _check("hex", "HEX", 1),
+        _check("ascii", "ASCII", 1),
+        _check("other_scheme", "Other", 1),
+        _text("other", "Scheme", 2),
+    ), 0),
+    ChecklistStep(5, "Print and Encode Test", (
+        _check("test_batch", "Print and encode a small batch labels (typically 5-10)"),
+        _check("inspect_print", "Inspect printed elements for quality and placement"),
+        _check("verify_test_encoding", "Verify correct encoding on all test labels"),
+        _check("compare_to_ticket", "Compare encoded data to job ticket requirements"),
+    ), 1),
+    ChecklistStep(6, "Final Checks", (
+        _check("verify_settings_again", "Verify all printer settings once more"),
+        _check("confirm_stock_ribbon", "Confirm correct label stock and ribbon are loaded"),
+        _check("tag_data_matches", "Ensure RFID tag data matches customer requirements"),
+    ), 1),
+    ChecklistStep(7, "Job Completion", (
+        _check("tracking_system_entered", "Details are correctly entered in the tracking system"),
+        _check("setup_issues_noted", "Note any setup issues or special considerations"),
+        _check("start_stop_email_sent", "Start/Stop Email Sent"),
+        _text("initials", "Initials"),
+    ), 1),
+)
+
+# Approvals and the form date are stored as step 8 fields
+APPROVAL_STEP = 8
+APPROVALS = (("completed_by", "Completed by"), ("peer_approval", "Peer Approval"),
+             ("supervisor_approval", "Supervisor Approval"))
+DATE_FIELD = "date"
+
+SAMPLE_TAGS = 3
+
+
+def value_name(step, field):
+    return f"{step}:{field}"
+
+
+def job_defaults(job):
+    """Values the form starts from before anyone has touched it, taken from the job record"""
+    encoding = (job.encoding or "").upper()
+    return {
+        "2:ribbon": job.ribbon or "",
+        "3:printer": job.printer or "",
+        "3:hex": encoding == "HEX",
+        "3:ascii": encoding == "ASCII",
+        "3:other_scheme": encoding not in ("", "HEX", "ASCII"),
+        "3:other": job.encoding if encoding not in ("", "HEX", "ASCII") else "",
+        "3:lock": bool(job.lock),
+    }
+
+
+def stored_values(store, job_id):
+    """{"step:field": value} as saved in the job store"""
+    return {value_name(step, field): value for step, fields in store.get_steps(job_id).items()
+            for field, value in fields.items()}
+
+
+def checklist_path(directory, job_id):
+    return os.path.join(directory, f"checklist-{job_id}.pdf")
+
+
+def checklist_data(store, job_id, sample_tags=SAMPLE_TAGS):
+    """Everything printed on one job's checklist, as plain (picklable) values; None if the job doesn't exist"""
+    job = store.get_job(job_id)
+    if job is None:
+        return None
+    details = []
+    for column in JOB_DETAILS:
+        values = []
+        for field, label in column:
+            if field == "production_qty":
+                value = job.qty + (job.qty * job.overage + 99) // 100 if job.qty else ""
+            else:
+                value = getattr(job, field, "")
+            values.append((label, "" if value is None else str(value)))
+        details.append(values)
+    values = job_defaults(job)
+    values.update(stored_values(store, job_id))
+    return {
+        "job_id": job_id,
+        "details": details,
+        "values": values,
+        "sample": _sample(job, sample_tags),
+    }
+
+
+def _sample(job, sample_tags):
+    """[(tag, hex, uri)] for the first tags of the job's EPC data file; none if it is missing or stale"""
+    from core.epc_data_file import StaleDataError, open_job_data  # NumPy; only needed for the sample
+    from core.epc_schemes import SCHEMES
+    try:
+        data_file = open_job_data(job) if sample_tags and job is not None else None
+    except StaleDataError as error:
+        log.warning("job %s: no EPC sample: %s", job.job_id, error)
+        data_file = None
+    if data_file is None:
+        return []
+    try:
+        count = min(sample_tags, len(data_file))
+        scheme = SCHEMES.get(data_file.scheme)
+        columns = scheme.decode(data_file[:count]) if scheme is not None and count else None
+        return [(tag + 1, data_file.hex(tag), scheme.uri(columns, tag) if columns is not None else "")
+                for tag in range(count)]
+    finally:
+        data_file.close()
+
+
+def completed_job_ids(store, first_day, last_day):
+    """Ids of the jobs completed between two dates (inclusive), e.g. a month for the month-end batch"""
+    table = store.load_table("WHERE completed_date BETWEEN ? AND ?", (first_day.toordinal(), last_day.toordinal()))
+    return list(table.column("job_id").values)
+
+
+def month_range(year, month):
+    """(first day, last day) of a month"""
+    first = date(year, month, 1)
+    following = date(year + month // 12, month % 12 + 1, 1)
+    return first, date.fromordinal(following.toordinal() - 1)
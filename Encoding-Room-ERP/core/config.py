@@ -0,0 +1,31 @@
+import os
+import socket
+
+# Station-wide settings for the non-GUI engines, overridable through the environment
+# so the app, the CLI and cron jobs on the print server all agree on where data lives.
+
+DATA_DIR = os.environ.get("ERP_DATA_DIR", os.path.join(os.path.expanduser("~"), ".encoding_room"))
+
+# Identity of this workstation in the shared change feed
+STATION_ID = os.environ.get("ERP_STATION_ID", socket.gethostname())
+STATION_NUMBER = int(os.environ.get("ERP_STATION_NUMBER", "0"))  # 0-99, keeps new job ids unique across stations
+
+# Sync hub shared by the encoding workstations; sync stays off when unset
+SYNC_HUB_URL = os.environ.get("ERP_SYNC_HUB_URL", "")
+SYNC_INTERVAL_S = float(os.environ.get("ERP_SYNC_INTERVAL_S", "2.0"))
+
+# Upstream ERP / tracking system endpoint for checklist step 7 updates; posting stays off when unset
+TRACKING_URL = os.environ.get("ERP_TRACKING_URL", "")
+
+# Digits in the GS1 company prefix of the GTINs this station encodes (6-12); sets the SGTIN partition
+COMPANY_DIGITS = int(os.environ.get("ERP_COMPANY_DIGITS", "7"))
+
+# Master key (64 hex digits) for per-tag access / kill passwords; must be the same on every station
+# that encodes or verifies locked jobs. Unset: the key file made by `cli.py passwords --new-key`.
+TAG_PASSWORD_KEY = os.environ.get("ERP_TAG_PASSWORD_KEY", "")
+
+
+def data_path(*parts):
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
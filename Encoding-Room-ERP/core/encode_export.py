@@ -0,0 +1,105 @@
+import csv
+import os
+
+import numpy as np
+
+from core.epc_array import as_epc_array, fingerprint
+
+# Encode-data exports for the print stations and read-back verification, streamed
+# from a job's memory-mapped EpcDataFile a chunk at a time.
+#   csv  BarTender database: Tag, Roll, EPC (one row per label)
+#   zpl  one RFID write + human-readable EPC per label, ready for the spooler
+#
+# For jobs that lock tag memory (pass the job secret from core.tag_passwords),
+# the CSV gains AccessPwd / KillPwd columns and each ZPL label sets both
+# passwords and locks the password and EPC banks with them; the passwords are
+# derived in a process pool, a few chunks ahead of the writer.
+
+EXPORT_FORMATS = ("csv", "zpl")
+EXPORT_CHUNK_SIZE = 100_000
+
+ZPL_LABEL = "^XA^RFW,H,,,A^FD{epc}^FS^FO40,40^A0N,28,28^FD{epc}^FS^XZ\n"
+ZPL_LOCKED_LABEL = ("^XA^RFW,H,,,A^FD{epc}^FS^RZ{access},A,L^FS^RZ{kill},K,L^FS^RZ{access},E,L^FS"
+                    "^FO40,40^A0N,28,28^FD{epc}^FS^XZ\n")
+
+
+def export_path(data_file, directory, fmt):
+    return os.path.join(directory, f"job-{data_file.job_id}.{fmt}")
+
+
+def export_job(data_file, path, fmt="csv", chunk_size=EXPORT_CHUNK_SIZE, secret=None, workers=1, guard=None):
+    """Write all tags of a job to `path`; with a job secret, each label also carries its tag passwords.
+    With an EpcGuard, a job whose EPCs were issued to another job is refused (DuplicateEpcError) before
+    anything is written. Returns the number of labels written"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format {fmt!r} (expected one of {', '.join(EXPORT_FORMATS)})")
+    if guard is not None:
+        # Claim rather than only check: data files written before the guard existed get recorded here
+        guard.claim(data_file.job_id, data_file.epcs)
+    chunks = []  # (roll, start, stop); chunks never span rolls
+    for roll in range(data_file.roll_count):
+        first, last = data_file.roll_range(roll)
+        chunks.extend((roll, start, min(start + chunk_size, last)) for start in range(first, last, chunk_size))
+    passwords = None
+    if secret is not None:
+        from core.tag_passwords import job_passwords, to_hex
+        passwords = job_passwords(data_file, secret, [(start, stop) for _, start, stop in chunks], workers=workers)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="ascii") as handle:
+        if fmt == "csv":
+            handle.write("Tag,Roll,EPC,AccessPwd,KillPwd\r\n" if passwords is not None else "Tag,Roll,EPC\r\n")
+        for roll, start, stop in chunks:
+            epcs = data_file.hex_range(start, stop)
+            tags = range(start + 1, stop + 1)
+            if passwords is None:
+                if fmt == "csv":
+                    handle.write("".join(f"{tag},{roll + 1},{epc}\r\n" for tag, epc in zip(tags, epcs)))
+                else:
+                    handle.write("".join(ZPL_LABEL.format(epc=epc) for epc in epcs))
+                continue
+            access, kill = (to_hex(values) for values in next(passwords))
+            if fmt == "csv":
+                handle.write("".join(f"{tag},{roll + 1},{epc},{a},{k}\r\n"
+                                     for tag, epc, a, k in zip(tags, epcs, access, kill)))
+            else:
+                handle.write("".join(ZPL_LOCKED_LABEL.format(epc=epc, access=a, kill=k)
+                                     for epc, a, k in zip(epcs, access, kill)))
+    os.replace(tmp_path, path)
+    return len(data_file)
+
+
+def read_epc_list(path):
+    """EPCs read back from a reader log: one hex EPC per line, or a CSV with an "EPC" column"""
+    with open(path, newline="") as handle:
+        sample = handle.readline()
+        handle.seek(0)
+        if "," in sample or ";" in sample:
+            reader = csv.DictReader(handle, dialect=csv.Sniffer().sniff(sample, delimiters=",;"))
+            column = next((name for name in reader.fieldnames if name.strip().upper() == "EPC"), None)
+            if column is None:
+                raise ValueError(f"{path}: no EPC column")
+            return [row[column].strip() for row in reader if row[column].strip()]
+        return [line.strip() for line in handle if line.strip()]
+
+
+def verify_reads(data_file, reads):
+    """Compare read-back EPCs with the job's data: counts plus tag indices / EPCs for each problem"""
+    reads = as_epc_array(reads, data_file.width)
+    expected_fp = fingerprint(np.asarray(data_file.epcs))
+    read_fp = fingerprint(reads)
+    unique_fp, first_index, read_counts = np.unique(read_fp, return_index=True, return_counts=True)
+    missing_tags = np.flatnonzero(~np.isin(expected_fp, unique_fp))
+    unexpected = first_index[~np.isin(unique_fp, expected_fp)]
+    duplicated = first_index[read_counts > 1]
+    return {
+        "job_id": data_file.job_id,
+        "expected": len(data_file),
+        "read": len(reads),
+        "unique": len(unique_fp),
+        "missing": len(missing_tags),
+        "unexpected": len(unexpected),
+        "duplicated": len(duplicated),
+        "missing_tags": missing_tags,
+        "unexpected_epcs": reads[unexpected],
+        "duplicated_epcs": reads[duplicated],
+    }
@@ -0,0 +1,82 @@
+import numpy as np
+
+# Bulk EPC arrays. A batch of EPCs is an (N, W) uint8 array holding the raw
+# big-endian EPC bytes, W = 12 for the 96-bit schemes. Everything that handles
+# many EPCs (guard, decoders, per-job data files, password derivation) passes
+# them around in this form instead of as lists of hex strings.
+
+EPC96_BYTES = 12
+
+_M1 = np.uint64(0xBF58476D1CE4E5B9)
+_M2 = np.uint64(0x94D049BB133111EB)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def from_hex(values, width=EPC96_BYTES):
+    """Hex strings (as printed on the checklist / read back by the readers) -> (N, width) uint8"""
+    values = list(values)
+    if not values:
+        return np.empty((0, width), dtype=np.uint8)
+    raw = bytes.fromhex("".join(value.strip().rjust(width * 2, "0") for value in values))
+    if len(raw) != len(values) * width:
+        raise ValueError(f"EPCs must be at most {width * 8} bits")
+    return np.frombuffer(raw, dtype=np.uint8).reshape(len(values), width).copy()
+
+
+def to_hex(epcs):
+    epcs = as_epc_array(epcs)
+    text = epcs.tobytes().hex().upper()
+    step = epcs.shape[1] * 2
+    return [text[i:i + step] for i in range(0, len(text), step)]
+
+
+def as_epc_array(epcs, width=EPC96_BYTES):
+    """Accept an (N, W) array, a list of hex strings or a list of bytes"""
+    if isinstance(epcs, np.ndarray):
+        if epcs.ndim != 2 or epcs.dtype != np.uint8:
+            raise ValueError("EPC arrays are (N, bytes) uint8")
+        return epcs
+    epcs = list(epcs)
+    if epcs and isinstance(epcs[0], (bytes, bytearray)):
+        return np.frombuffer(b"".join(epcs), dtype=np.uint8).reshape(len(epcs), -1).copy()
+    return from_hex(epcs, width)
+
+
+def from_reads(values):
+    """Reads of any length (hex strings or bytes) -> (N, widest) uint8, shorter EPCs zero-padded at the end"""
+    raw = [bytes.fromhex(value.strip()) if isinstance(value, str) else bytes(value) for value in values]
+    width = max((len(value) for value in raw), default=EPC96_BYTES)
+    if not raw:
+        return np.empty((0, width), dtype=np.uint8)
+    return np.frombuffer(b"".join(value.ljust(width, b"\0") for value in raw), dtype=np.uint8).reshape(-1, width)
+
+
+def words(epcs):
+    """Big-endian 64-bit words per EPC, zero-padded at the end: (N, ceil(W / 8)) uint64"""
+    epcs = as_epc_array(epcs)
+    n, width = epcs.shape
+    padded_width = -(-width // 8) * 8
+    if padded_width != width:
+        padded = np.zeros((n, padded_width), dtype=np.uint8)
+        padded[:, :width] = epcs
+        epcs = padded
+    return np.ascontiguousarray(epcs).view(">u8").astype(np.uint64)
+
+
+def _mix(x):
+    # splitmix64 finaliser; uint64 arithmetic wraps, which is what we want
+    x = x ^ (x >> np.uint64(30))
+    x = x * _M1
+    x = x ^ (x >> np.uint64(27))
+    x = x * _M2
+    return x ^ (x >> np.uint64(31))
+
+
+def fingerprint(epcs, seed=0):
+    """64-bit hash of each EPC: (N,) uint64. Different seeds give independent hashes."""
+    w = words(epcs)
+    with np.errstate(over="ignore"):
+        h = np.full(w.shape[0], _mix(np.uint64(seed) * _GOLDEN + _GOLDEN), dtype=np.uint64)
+        for column in range(w.shape[1]):
+            h = _mix(h ^ w[:, column])
+    return h
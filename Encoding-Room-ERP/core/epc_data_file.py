@@ -0,0 +1,275 @@
+import logging
+import os
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+from core import config
+from core.epc_array import EPC96_BYTES, to_hex
+from core.epc_schemes import SGTIN96
+
+# Per-job EPC data files.
+#
+# A job's generated EPCs are written once, in chunks, to a fixed-width binary
+# file and memory-mapped from then on, so previews, export, verification and
+# reprints read any tag (or any roll) by index without regenerating the job or
+# loading it into Python objects. Layout:
+#   96-byte header   magic, version, record width, job id, tag count, roll count,
+#                    data offset, scheme name, and the job fields the EPCs were
+#                    generated from: start / end serial, GTIN, company prefix digits
+#   roll offsets     (rolls + 1) uint64 tag indices; roll r is tags offsets[r]:offsets[r + 1]
+#   records          count x width bytes, 64-byte aligned
+#
+# A job edited after its file was written (new serial range, GTIN, ...) no longer
+# matches it: open_job_data(job) raises StaleDataError and ensure_job_data(job)
+# regenerates. Version 1 files carry no source fields and are always stale.
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"ERPEPC1\0"
+VERSION = 2
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+_HEADER_V1 = struct.Struct("<8sHHIqQQQ16s")
+_HEADER = struct.Struct("<8sHHIqQQQ16sqq14sBx")
+
+# The job fields a data file was generated from
+DataSource = namedtuple("DataSource", "start_serial end_serial gtin company_digits")
+
+
+class StaleDataError(ValueError):
+    """A job's data file was generated from different job fields than the job has now"""
+
+
+def job_data_path(job_id):
+    return config.data_path("epc_data", f"job-{job_id}.epc")
+
+
+def job_source(job, company_digits=None):
+    """DataSource of a job (JobRecord) as it is now"""
+    return DataSource(int(job.start_serial), int(job.end_serial), str(job.upc).strip().zfill(14),
+                      company_digits or config.COMPANY_DIGITS)
+
+
+class EpcDataFile:
+    """Read-only, memory-mapped view of one job's EPCs"""
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as handle:
+            header = handle.read(_HEADER.size)
+            magic, version = struct.unpack_from("<8sH", header.ljust(10, b"\0"))
+            if magic != MAGIC or version not in (1, VERSION) or \
+                    len(header) < (_HEADER_V1.size if version == 1 else _HEADER.size):
+                raise ValueError(f"{path} is not an EPC data file")
+            if version == 1:
+                fields, self.source = _HEADER_V1.unpack_from(header), None
+                handle.seek(_HEADER_V1.size)
+            else:
+                fields = _HEADER.unpack(header)
+                start_serial, end_serial, gtin, company_digits = fields[9:]
+                self.source = DataSource(start_serial, end_serial, gtin.decode("ascii"), company_digits)
+            _, _, self.width, _, self.job_id, self.count, self.roll_count, data_offset, scheme = fields[:9]
+            self.offsets = np.frombuffer(handle.read(8 * (self.roll_count + 1)), dtype="<u8").astype(np.int64)
+        self.scheme = scheme.rstrip(b"\0").decode("ascii")
+        if self.count:
+            self.epcs = np.memmap(path, dtype=np.uint8, mode="r", offset=data_offset, shape=(self.count, self.width))
+        else:
+            self.epcs = np.empty((0, self.width), dtype=np.uint8)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return self.epcs[index]
+
+    def epc(self, tag):
+        return self.epcs[tag].tobytes()
+
+    def hex(self, tag):
+        return self.epcs[tag].tobytes().hex().upper()
+
+    def hex_range(self, start, stop):
+        return to_hex(np.asarray(self.epcs[start:stop]))
+
+    def roll(self, roll):
+        """EPCs of one roll (0-based) as an (N, width) view"""
+        return self.epcs[self.offsets[roll]:self.offsets[roll + 1]]
+
+    def roll_range(self, roll):
+        return int(self.offsets[roll]), int(self.offsets[roll + 1])
+
+    def roll_of(self, tag):
+        return int(np.searchsorted(self.offsets, tag, side="right")) - 1
+
+    def close(self):
+        self.epcs = None
+
+
+def write_data_file(path, job_id, count, lpr, chunks, scheme="SGTIN-96", width=EPC96_BYTES, before_commit=None,
+                    source=DataSource(0, 0, "", 0)):
+    """Write `count` EPCs from `chunks` (an iterable of (N, width) uint8 arrays) in one pass.
+    before_commit(epcs) sees the written records before the file replaces `path`; raising discards it.
+    `source` records the job fields the EPCs were generated from."""
+    lpr = max(1, int(lpr or count or 1))
+    offsets = np.append(np.arange(0, count, lpr, dtype=np.uint64), np.uint64(count)).astype("<u8")
+    if count == 0:
+        offsets = np.zeros(1, dtype="<u8")
+    roll_count = len(offsets) - 1
+    data_offset = -(-(_HEADER.size + offsets.nbytes) // 64) * 64
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as handle:
+            handle.write(_HEADER.pack(MAGIC, VERSION, width, 0, job_id, count, roll_count, data_offset,
+                                      scheme.encode("ascii"), source.start_serial, source.end_serial,
+                                      source.gtin.encode("ascii"), source.company_digits))
+            handle.write(offsets.tobytes())
+            handle.truncate(data_offset + count * width)
+        if count:
+            records = np.memmap(tmp_path, dtype=np.uint8, mode="r+", offset=data_offset, shape=(count, width))
+            try:
+                written = 0
+                for chunk in chunks:
+                    records[written:written + len(chunk)] = chunk
+                    written += len(chunk)
+                records.flush()
+                if written != count:
+                    raise ValueError(f"expected {count} EPCs, got {written}")
+                if before_commit is not None:
+                    before_commit(records)
+            finally:
+                del records  # unmapped before the file is renamed or removed (Windows)
+        with open(tmp_path, "rb+") as handle:
+            os.fsync(handle.fileno())
+    except BaseException:
+        # A failing chunk generator, a short count or a refused claim leaves nothing behind
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    os.replace(tmp_path, path)
+    return EpcDataFile(path)
+
+
+def sgtin_chunks(company_prefix, item_reference, partition, start_serial, count, filter_value=1,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+    """Consecutive SGTIN-96 serials, encoded in bulk one chunk at a time"""
+    if start_serial < 0 or start_serial + count > 1 << 38:
+        raise ValueError("SGTIN-96 serials must be within 0 .. 2^38 - 1")
+    for first in range(start_serial, start_serial + count, chunk_size):
+        serials = np.arange(first, min(first + chunk_size, start_serial + count), dtype=np.uint64)
+        yield SGTIN96.encode(filter=filter_value, partition=partition, company_prefix=company_prefix,
+                             item_reference=item_reference, serial=serials)
+
+
+def split_gtin(gtin, company_digits=7):
+    """GTIN/UPC -> (partition, company prefix, indicator + item reference) for SGTIN encoding"""
+    digits = str(gtin).strip().zfill(14)
+    if not digits.isdigit() or len(digits) != 14 or not 6 <= company_digits <= 12:
+        raise ValueError(f"cannot encode GTIN {gtin!r} with a {company_digits}-digit company prefix")
+    company_prefix = int(digits[1:1 + company_digits])
+    item_reference = int(digits[0] + digits[1 + company_digits:13])
+    return 12 - company_digits, company_prefix, item_reference
+
+
+def generate_job_data(job, path=None, company_digits=None, chunk_size=DEFAULT_CHUNK_SIZE, guard=None):
+    """Write the SGTIN-96 data file for a job (JobRecord): serials start_serial..end_serial, lpr per roll.
+    company_digits defaults to config.COMPANY_DIGITS. With an EpcGuard the job's EPCs are claimed before
+    the file is committed (DuplicateEpcError refuses it)."""
+    source = job_source(job, company_digits)
+    partition, company_prefix, item_reference = split_gtin(source.gtin, source.company_digits)
+    count = job.end_serial - job.start_serial + 1
+    if count <= 0:
+        raise ValueError(f"job {job.job_id} has no serial range")
+    chunks = sgtin_chunks(company_prefix, item_reference, partition, job.start_serial, count,
+                          chunk_size=chunk_size)
+    before_commit = (lambda epcs: guard.claim(job.job_id, epcs)) if guard is not None else None
+    return write_data_file(path or job_data_path(job.job_id), job.job_id, count, job.lpr, chunks,
+                           before_commit=before_commit, source=source)
+
+
+def open_job_data(job, path=None, company_digits=None):
+    """The job's (JobRecord) data file, or None if it was never generated. Raises StaleDataError if the
+    file was generated from other serials, GTIN or company prefix digits than the job has now."""
+    path = path or job_data_path(job.job_id)
+    if not os.path.exists(path):
+        return None
+    data_file = EpcDataFile(path)
+    expected = job_source(job, company_digits)
+    if data_file.source != expected:
+        found = data_file.source
+        data_file.close()
+        if found is None:
+            raise StaleDataError("EPC data file predates source checks; regenerate it")
+        raise StaleDataError(f"EPC data was generated for serials {found.start_serial}-"
+                             f"{found.end_serial}, GTIN {found.gtin} ({found.company_digits}-digit prefix); "
+                             f"the job now has {expected.start_serial}-{expected.end_serial}, GTIN {expected.gtin} "
+                             f"({expected.company_digits}-digit prefix)")
+    return data_file
+
+
+def ensure_job_data(job, company_digits=None, guard=None, path=None):
+    """open_job_data(), (re)generating the file when it is missing or stale"""
+    try:
+        data_file = open_job_data(job, path, company_digits)
+    except StaleDataError as error:
+        log.info("job %s: %s; regenerating", job.job_id, error)
+        data_file = None
+    if data_file is None:
+        data_file = generate_job_data(job, path, company_digits, guard=guard)
+    return data_file
+
+
+if __name__ == '__main__':
+    # Generate a large job and time random access: python -m core.epc_data_file [tags] [lpr]
+    import sys
+    import tempfile
+    import time
+
+    from core.job_records import JobRecord
+
+    tags = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    lpr = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    job = JobRecord.from_dict({"job_id": 4242, "upc": "614141812345", "start_serial": 1_000_000,
+                               "end_serial": 1_000_000 + tags - 1, "lpr": lpr})
+    path = os.path.join(tempfile.mkdtemp(prefix="erp-epcdata-"), "job-4242.epc")
+
+    started = time.perf_counter()
+    data = generate_job_data(job, path)
+    elapsed = time.perf_counter() - started
+    print(f"generated {len(data):,} tags ({data.roll_count:,} rolls) in {elapsed:.2f}s, "
+          f"{os.path.getsize(path) / 2**20:.0f} MiB")
+
+    started = time.perf_counter()
+    data = EpcDataFile(path)
+    print(f"open: {(time.perf_counter() - started) * 1000:.2f} ms")
+
+    rng = np.random.default_rng(7)
+    picks = rng.integers(0, len(data), 100_000)
+    started = time.perf_counter()
+    for tag in picks:
+        data.hex(tag)
+    print(f"random tag lookup: {(time.perf_counter() - started) / len(picks) * 1e6:.2f} us/tag")
+
+    roll = data.roll_count - 1
+    started = time.perf_counter()
+    first, last = data.roll_range(roll)
+    rows = data.hex_range(first, last)
+    print(f"last roll ({len(rows)} tags) as hex: {(time.perf_counter() - started) * 1000:.2f} ms, "
+          f"first {rows[0]}")
+
+    # The file remembers what it was generated from: an edited job no longer opens it
+    assert open_job_data(job, path).source == job_source(job)
+    first_epc = data.hex(0)
+    job.start_serial += 5000
+    job.end_serial += 5000
+    try:
+        open_job_data(job, path)
+        raise AssertionError("stale data file accepted")
+    except StaleDataError as error:
+        print(f"after editing the job: {error}")
+    data.close()
+    data = ensure_job_data(job, path=path)
+    assert data.source == job_source(job) and data.hex(0) != first_epc
+    print(f"regenerated: first EPC {data.hex(0)}")
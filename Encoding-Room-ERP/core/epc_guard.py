@@ -0,0 +1,489 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import numpy as np
+
+from core import config
+from core.epc_array import EPC96_BYTES, as_epc_array, fingerprint, to_hex
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Global duplicate-EPC guard.
+#
+# Every EPC ever issued is recorded twice on disk:
+#   bloom.bin          a Bloom filter (k bits per EPC) for fast, definite negatives
+#   seg-*.fp/.epc/.job sorted segments of (64-bit fingerprint, raw EPC, owning job id)
+#                      rows, memory-mapped, used to confirm Bloom hits exactly
+# A job's EPCs are claimed when its data file is committed (one segment per job);
+# once there are more than MAX_SEGMENTS the smaller ones are merged (size-tiered,
+# streamed in MERGE_CHUNK rows) so lookups only probe a handful of arrays. A job
+# may re-check its own EPCs (re-export, reprint); any EPC owned by another job
+# refuses the job with DuplicateEpcError.
+#
+# The app and the CLI share the directory: add / merge hold an exclusive lock on
+# guard.lock, lookups a shared one, and each process reloads guard.json when
+# another one has changed it.
+#
+# Write order keeps the guard crash-safe without a log: segment files are written
+# and renamed first, then the Bloom bits are set and flushed, then guard.json is
+# atomically replaced. A crash can leave an unused segment or extra Bloom bits
+# (a few more false positives to confirm), never a missed duplicate.
+
+GuardResult = namedtuple("GuardResult", "issued repeated owners")  # owners: job id per issued EPC (-1 unknown)
+
+DEFAULT_CAPACITY = 200_000_000
+DEFAULT_ERROR_RATE = 0.01
+MAX_SEGMENTS = 8
+MERGE_CHUNK = 1 << 20
+CHECK_CHUNK = 1 << 20
+NO_JOB = -1
+
+
+class DuplicateEpcError(ValueError):
+    """A job's EPCs collide with EPCs already issued to another job (or repeat within the job)"""
+    def __init__(self, job_id, epcs, owners, repeated=0):
+        self.job_id = job_id
+        self.epcs = epcs
+        self.owners = owners
+        self.repeated = repeated
+        problems = []
+        if len(epcs):
+            others = sorted({int(owner) for owner in owners if owner != NO_JOB})
+            owned = f" (job{'s' if len(others) > 1 else ''} {', '.join(map(str, others[:5]))})" if others else ""
+            problems.append(f"{len(epcs):,} EPCs already issued{owned}, e.g. {to_hex(epcs[:1])[0]}")
+        if repeated:
+            problems.append(f"{repeated:,} EPCs repeated within the job")
+        super().__init__(f"refused (duplicate EPCs): {'; '.join(problems)}")
+
+
+def bloom_parameters(capacity, error_rate):
+    bits = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+    bits = -(-bits // 64) * 64
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+@contextmanager
+def _file_lock(path, shared=False):
+    """Advisory lock between processes; released when the handle closes"""
+    with open(path, "a+b") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield
+            return
+        # msvcrt has no shared locks; LK_LOCK gives up after ten one-second tries, so keep trying
+        handle.seek(0)
+        while True:
+            try:
+                msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError:
+                time.sleep(0.1)
+        try:
+            yield
+        finally:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class BloomFilter:
+    """Memory-mapped Bloom filter over EPC fingerprints (double hashing)"""
+    def __init__(self, path, bits, hashes):
+        self.bits = bits
+        self.hashes = hashes
+        if not os.path.exists(path):
+            with open(path, "wb") as handle:
+                handle.truncate(bits // 8)  # sparse until bits get set
+        self.array = np.memmap(path, dtype=np.uint8, mode="r+", shape=(bits // 8,))
+
+    def _positions(self, h1, h2):
+        # (N, k) bit positions; h2 forced odd so the k probes are distinct
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            return (h1[:, None] + steps[None, :] * (h2 | np.uint64(1))[:, None]) % np.uint64(self.bits)
+
+    def might_contain(self, h1, h2):
+        positions = self._positions(h1, h2)
+        present = (self.array[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return present.all(axis=1)
+
+    def add(self, h1, h2):
+        positions = self._positions(h1, h2).ravel()
+        np.bitwise_or.at(self.array, positions >> np.uint64(3),
+                         np.left_shift(1, (positions & np.uint64(7)).astype(np.uint8)).astype(np.uint8))
+
+    def flush(self):
+        self.array.flush()
+
+
+class _Segment:
+    def __init__(self, directory, name, count, width):
+        self.name = name
+        self.count = count
+        self.job = None  # segments written before job ownership was recorded: every owner unknown
+        if count:
+            self.fp = np.memmap(os.path.join(directory, f"{name}.fp"), dtype=np.uint64, mode="r", shape=(count,))
+            self.epc = np.memmap(os.path.join(directory, f"{name}.epc"), dtype=np.uint8, mode="r",
+                                 shape=(count, width))
+            job_path = os.path.join(directory, f"{name}.job")
+            if os.path.exists(job_path):
+                self.job = np.memmap(job_path, dtype=np.int64, mode="r", shape=(count,))
+        else:
+            self.fp = np.empty(0, dtype=np.uint64)
+            self.epc = np.empty((0, width), dtype=np.uint8)
+
+    def jobs(self, start, stop):
+        if self.job is None:
+            return np.full(stop - start, NO_JOB, dtype=np.int64)
+        return np.asarray(self.job[start:stop])
+
+    def confirm(self, fps, epcs):
+        """(mask of query rows whose exact EPC is in this segment, owning job of each found row);
+        fps should be sorted, for locality"""
+        found = np.zeros(len(fps), dtype=bool)
+        owners = np.full(len(fps), NO_JOB, dtype=np.int64)
+        if not self.count or not len(fps):
+            return found, owners
+        left = np.minimum(np.searchsorted(self.fp, fps), self.count - 1)
+        rows = np.flatnonzero(self.fp[left] == fps)
+        found[rows] = (self.epc[left[rows]] == epcs[rows]).all(axis=1)
+        if self.job is not None:
+            owners[rows] = self.job[left[rows]]
+        # 64-bit fingerprint collisions are rare; walk the equal run for those rows
+        following = left[rows] + 1
+        has_run = following < self.count
+        has_run[has_run] = self.fp[following[has_run]] == fps[rows[has_run]]
+        for row in rows[has_run]:
+            if not found[row]:
+                right = np.searchsorted(self.fp, fps[row], side="right")
+                match = np.flatnonzero((self.epc[left[row]:right] == epcs[row]).all(axis=1))
+                if len(match):
+                    found[row] = True
+                    owners[row] = self.jobs(left[row] + match[0], left[row] + match[0] + 1)[0]
+        return found, owners
+
+
+class _SegmentWriter:
+    """Appends sorted (fp, epc, job) rows to a new segment's .tmp files; commit() renames them into place"""
+    def __init__(self, directory, name):
+        self.paths = [os.path.join(directory, name + suffix) for suffix in (".fp", ".epc", ".job")]
+        self.handles = [open(path + ".tmp", "wb") for path in self.paths]
+        self.count = 0
+
+    def write(self, fps, epcs, jobs):
+        for handle, data in zip(self.handles, (fps, epcs, jobs)):
+            np.ascontiguousarray(data).tofile(handle)
+        self.count += len(fps)
+
+    def commit(self):
+        for handle, path in zip(self.handles, self.paths):
+            handle.flush()
+            os.fsync(handle.fileno())
+            handle.close()
+            os.replace(path + ".tmp", path)
+        return self.count
+
+    def abort(self):
+        for handle, path in zip(self.handles, self.paths):
+            handle.close()
+            os.remove(path + ".tmp")
+
+
+class EpcGuard:
+    def __init__(self, directory=None, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE,
+                 width=EPC96_BYTES):
+        self.directory = directory or os.path.dirname(config.data_path("epc_guard", "guard.json"))
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._meta_path = os.path.join(self.directory, "guard.json")
+        self._lock_path = os.path.join(self.directory, "guard.lock")
+        self._meta_stamp = None
+        self.segments = []
+        with _file_lock(self._lock_path):
+            if not os.path.exists(self._meta_path):
+                bits, hashes = bloom_parameters(capacity, error_rate)
+                self.meta = {"bits": bits, "hashes": hashes, "width": width, "capacity": capacity,
+                             "next_segment": 1, "segments": []}
+                self._save_meta()
+            self._refresh()
+            self.bloom = BloomFilter(os.path.join(self.directory, "bloom.bin"), self.meta["bits"], self.meta["hashes"])
+        self.width = self.meta["width"]
+
+    def __len__(self):
+        return sum(segment.count for segment in self.segments)
+
+    def _refresh(self):
+        """Pick up segments added or merged by another process (call with the file lock held)"""
+        stat = os.stat(self._meta_path)
+        stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if stamp == self._meta_stamp:
+            return
+        with open(self._meta_path) as handle:
+            self.meta = json.load(handle)
+        known = {segment.name: segment for segment in self.segments}
+        self.segments = [known.get(s["name"]) or _Segment(self.directory, s["name"], s["count"], self.meta["width"])
+                         for s in self.meta["segments"]]
+        self._meta_stamp = stamp
+
+    def _hashes(self, epcs):
+        return fingerprint(epcs, 0), fingerprint(epcs, 1)
+
+    def check(self, epcs, job_id=None):
+        """Indices of EPCs already issued (`issued`, with their owning job in `owners`) and of repeats within
+        this batch (`repeated`). EPCs owned by `job_id` itself are not reported as issued."""
+        epcs = as_epc_array(epcs, self.width)
+        with self._lock, _file_lock(self._lock_path, shared=True):
+            self._refresh()
+            return self._check(epcs, job_id)
+
+    def _check(self, epcs, job_id=None, hashes=None):
+        h1, h2 = hashes if hashes is not None else self._hashes(epcs)
+        # Work in fingerprint order: segment probes walk the memory maps front to back
+        # and in-batch repeats end up adjacent
+        order = np.argsort(h1, kind="stable")
+        h1, h2 = h1[order], h2[order]
+        candidates = np.flatnonzero(self.bloom.might_contain(h1, h2))
+        candidate_epcs = epcs[order[candidates]]
+        issued = np.zeros(len(candidates), dtype=bool)
+        owners = np.full(len(candidates), NO_JOB, dtype=np.int64)
+        for segment in self.segments:
+            pending = np.flatnonzero(~issued)
+            found, found_owners = segment.confirm(h1[candidates[pending]], candidate_epcs[pending])
+            issued[pending] = found
+            owners[pending] = found_owners
+        if job_id is not None:
+            issued &= owners != job_id
+        repeated = np.zeros(0, dtype=np.intp)
+        same_fp = np.flatnonzero(h1[1:] == h1[:-1]) + 1
+        if len(same_fp):
+            same = (epcs[order[same_fp]] == epcs[order[same_fp - 1]]).all(axis=1)
+            repeated = np.sort(order[same_fp[same]])
+        issued_rows = order[candidates[issued]]
+        by_row = np.argsort(issued_rows, kind="stable")
+        return GuardResult(issued_rows[by_row], repeated, owners[issued][by_row])
+
+    def __contains__(self, epc):
+        return len(self.check([epc]).issued) > 0
+
+    def check_job(self, job_id, epcs, chunk_size=CHECK_CHUNK):
+        """Raise DuplicateEpcError unless every EPC of a job (e.g. a data file's `epcs`) is unissued or
+        already its own. Large jobs are checked chunk by chunk."""
+        with self._lock, _file_lock(self._lock_path, shared=True):
+            self._refresh()
+            self._check_job(job_id, epcs, chunk_size)
+
+    def _check_job(self, job_id, epcs, chunk_size):
+        """Rows of `epcs` not recorded yet; raises DuplicateEpcError on any EPC owned by another job or
+        repeated anywhere in the job. The fingerprints of earlier chunks are carried along (sorted, with
+        their rows) so a repeat in a later chunk is caught too."""
+        collisions, owners, unrecorded, repeated = [], [], [], 0
+        seen_fps, seen_rows = np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+        for start in range(0, len(epcs), chunk_size):
+            chunk = as_epc_array(np.asarray(epcs[start:start + chunk_size]), self.width)
+            hashes = self._hashes(chunk)
+            result = self._check(chunk, hashes=hashes)
+            foreign = result.owners != job_id
+            collisions.append(chunk[result.issued[foreign]])
+            owners.append(result.owners[foreign])
+            repeats = self._seen_before(epcs, chunk, hashes[0], seen_fps, seen_rows)
+            repeats[result.repeated] = True
+            repeated += int(repeats.sum())
+            new = ~repeats
+            new[result.issued] = False
+            unrecorded.append(np.flatnonzero(new) + start)
+            if start + chunk_size < len(epcs):
+                fps = np.concatenate([seen_fps, hashes[0]])
+                rows = np.concatenate([seen_rows, np.arange(start, start + len(chunk), dtype=np.int64)])
+                order = np.argsort(fps, kind="stable")  # two sorted runs: merged in linear time
+                seen_fps, seen_rows = fps[order], rows[order]
+        if any(len(found) for found in collisions) or repeated:
+            raise DuplicateEpcError(job_id, np.concatenate(collisions), np.concatenate(owners), repeated)
+        return np.concatenate(unrecorded) if unrecorded else np.zeros(0, dtype=np.intp)
+
+    def _seen_before(self, epcs, chunk, fps, seen_fps, seen_rows):
+        """Mask of `chunk` rows whose exact EPC is at one of `seen_rows` of `epcs` (`seen_fps` sorted)"""
+        seen = np.zeros(len(chunk), dtype=bool)
+        if not len(seen_fps):
+            return seen
+        left = np.searchsorted(seen_fps, fps)
+        right = np.searchsorted(seen_fps, fps, side="right")
+        rows = np.flatnonzero(right > left)
+        if not len(rows):
+            return seen
+        earlier = as_epc_array(np.asarray(epcs)[seen_rows[left[rows]]], self.width)
+        seen[rows] = (earlier == chunk[rows]).all(axis=1)
+        # 64-bit fingerprint collisions are rare; check the rest of the equal run for those rows
+        for row in rows[(right[rows] - left[rows] > 1) & ~seen[rows]]:
+            earlier = as_epc_array(np.asarray(epcs)[seen_rows[left[row]:right[row]]], self.width)
+            seen[row] = (earlier == chunk[row]).all(axis=1).any()
+        return seen
+
+    def claim(self, job_id, epcs, chunk_size=CHECK_CHUNK):
+        """check_job() then record the job's new EPCs as one step, so two processes cannot claim the same
+        EPCs for different jobs. Returns the number of EPCs recorded (0 when the job was claimed before)."""
+        with self._lock, _file_lock(self._lock_path):
+            self._refresh()
+            rows = self._check_job(job_id, epcs, chunk_size)
+            if not len(rows):
+                return 0
+            return self._record(as_epc_array(np.asarray(epcs)[rows], self.width), job_id)
+
+    def add(self, epcs, job_id=NO_JOB):
+        """Record EPCs as issued to `job_id` (call when a job's data is committed). Already-known EPCs are skipped."""
+        epcs = as_epc_array(epcs, self.width)
+        with self._lock, _file_lock(self._lock_path):
+            self._refresh()
+            result = self._check(epcs)
+            keep = np.ones(len(epcs), dtype=bool)
+            keep[result.issued] = False
+            keep[result.repeated] = False
+            epcs = epcs[keep]
+            return self._record(epcs, job_id) if len(epcs) else 0
+
+    def _record(self, epcs, job_id):
+        """Write unrecorded, distinct EPCs as a new segment"""
+        h1, h2 = self._hashes(epcs)
+        name = self._next_segment_name()
+        order = np.argsort(h1, kind="stable")
+        writer = _SegmentWriter(self.directory, name)
+        writer.write(h1[order], epcs[order], np.full(len(epcs), job_id, dtype=np.int64))
+        writer.commit()
+        self.bloom.add(h1, h2)
+        self.bloom.flush()
+        self.segments.append(_Segment(self.directory, name, len(epcs), self.width))
+        if len(self.segments) > MAX_SEGMENTS:
+            self._merge_smallest()
+        self._save_meta()
+        return len(epcs)
+
+    def _next_segment_name(self):
+        name = f"seg-{self.meta['next_segment']:06d}"
+        self.meta["next_segment"] += 1
+        return name
+
+    def _merge_smallest(self):
+        # Size-tiered: merge the smaller half of the segments into one. The victims are already
+        # sorted, so they are merged a slice at a time: every row up to the smallest
+        # "fingerprint at the end of the next MERGE_CHUNK rows" across victims goes out next.
+        by_size = sorted(self.segments, key=lambda segment: segment.count)
+        victims = by_size[:max(2, len(by_size) // 2)]
+        name = self._next_segment_name()
+        writer = _SegmentWriter(self.directory, name)
+        positions = [0] * len(victims)
+        try:
+            while True:
+                live = [i for i, segment in enumerate(victims) if positions[i] < segment.count]
+                if not live:
+                    break
+                pivot = min(victims[i].fp[min(positions[i] + MERGE_CHUNK, victims[i].count) - 1] for i in live)
+                slices = []
+                for i in live:
+                    segment, start = victims[i], positions[i]
+                    stop = start + int(np.searchsorted(segment.fp[start:], pivot, side="right"))
+                    slices.append((segment, start, stop))
+                    positions[i] = stop
+                fps = np.concatenate([segment.fp[start:stop] for segment, start, stop in slices])
+                order = np.argsort(fps, kind="stable")
+                writer.write(fps[order],
+                             np.concatenate([segment.epc[start:stop] for segment, start, stop in slices])[order],
+                             np.concatenate([segment.jobs(start, stop) for segment, start, stop in slices])[order])
+        except BaseException:
+            writer.abort()
+            raise
+        count = writer.commit()
+        self.segments = [s for s in self.segments if s not in victims]
+        self.segments.append(_Segment(self.directory, name, count, self.width))
+        self._save_meta()
+        for segment in victims:
+            segment.fp = segment.epc = segment.job = None
+            for suffix in (".fp", ".epc", ".job"):
+                try:
+                    os.remove(os.path.join(self.directory, segment.name + suffix))
+                except OSError:
+                    pass  # already gone, or still mapped by another process (Windows); harmless leftover
+
+    def _save_meta(self):
+        self.meta["segments"] = [{"name": s.name, "count": s.count} for s in self.segments]
+        tmp_path = self._meta_path + ".tmp"
+        with open(tmp_path, "w") as handle:
+            json.dump(self.meta, handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, self._meta_path)
+        stat = os.stat(self._meta_path)
+        self._meta_stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+if __name__ == '__main__':
+    # python -m core.epc_guard [history] [job_size]
+    import sys
+    import tempfile
+    import time
+
+    history = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000_000
+    job_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+
+    def sgtin_batch(start, count, item=4711):
+        # 0x30 header, filter 1, partition 5, company 0614141, item `item`, serial start..start+count
+        epcs = np.zeros((count, EPC96_BYTES), dtype=np.uint8)
+        prefix = (0x30 << 56) | (1 << 53) | (5 << 50) | (614141 << 26) | (item << 6)
+        serials = np.arange(start, start + count, dtype=np.uint64)
+        hi = np.uint64(prefix) | (serials >> np.uint64(32))
+        lo = (serials & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+        epcs[:, :8] = hi.astype(">u8").view(np.uint8).reshape(-1, 8)
+        epcs[:, 8:] = lo.astype(">u4").view(np.uint8).reshape(-1, 4)
+        return epcs
+
+    guard = EpcGuard(tempfile.mkdtemp(prefix="erp-guard-"), capacity=max(history * 2, 10_000_000))
+    started = time.perf_counter()
+    step = 5_000_000
+    for offset in range(0, history, step):
+        guard.add(sgtin_batch(offset, min(step, history - offset)), job_id=offset // step * 100 + 100)
+    print(f"recorded {len(guard):,} EPCs in {time.perf_counter() - started:.1f}s "
+          f"({len(guard.segments)} segments, bloom {guard.meta['bits'] / 8 / 2**20:.0f} MiB, k={guard.meta['hashes']})")
+
+    fresh = sgtin_batch(history + 10, job_size)
+    started = time.perf_counter()
+    result = guard.check(fresh)
+    print(f"check {job_size:,} new EPCs:        {time.perf_counter() - started:6.2f}s  "
+          f"issued={len(result.issued)} repeated={len(result.repeated)}")
+
+    reencode = sgtin_batch(history - job_size // 2, job_size)
+    started = time.perf_counter()
+    result = guard.check(reencode)
+    print(f"check {job_size:,} (half re-encoded): {time.perf_counter() - started:6.2f}s  "
+          f"issued={len(result.issued):,} repeated={len(result.repeated)} owners={sorted(set(result.owners.tolist()))}")
+
+    started = time.perf_counter()
+    guard.claim(9900, fresh)
+    print(f"claim completed job:               {time.perf_counter() - started:6.2f}s")
+    assert guard.claim(9900, fresh) == 0, "a job's own EPCs must not refuse it"
+    try:
+        guard.claim(9999, reencode)
+        raise AssertionError("duplicate EPCs were not refused")
+    except DuplicateEpcError as error:
+        print(f"re-encode as another job:          {error}")
+
+    # Size-tiered merges stream the victims; everything recorded must still be found
+    started = time.perf_counter()
+    small = 200_000
+    for index in range(MAX_SEGMENTS + 4):
+        guard.add(sgtin_batch(history * 2 + index * small, small, item=4712), job_id=20_000 + index * 100)
+    print(f"{MAX_SEGMENTS + 4} small jobs with merges:     {time.perf_counter() - started:6.2f}s  "
+          f"({len(guard.segments)} segments)")
+    reopened = EpcGuard(guard.directory)
+    everything = np.concatenate([sgtin_batch(0, 1000), fresh[-1000:],
+                                 sgtin_batch(history * 2, small * (MAX_SEGMENTS + 4), item=4712)[::997]])
+    assert len(reopened.check(everything).issued) == len(everything), "EPCs lost in a merge"
+    own = sgtin_batch(history * 2, small, item=4712)
+    assert len(reopened.check(own, job_id=20_000).issued) == 0, "job ownership lost in a merge"
+    print(f"reopened: {len(reopened):,} EPCs in {len(reopened.segments)} segments, all found")
@@ -0,0 +1,312 @@
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from core import config
+
+# Offline-first write-behind queue for tracking-system (ERP) updates.
+#
+# enqueue() is a local SQLite insert and never touches the network, so the GUI
+# thread never waits on the link. A worker thread drains the outbox in batches
+# (many updates per request) and retries with capped exponential backoff while
+# the link is down. Rows are deleted only after the ERP acknowledged them; each
+# update carries its outbox id so the receiver can drop duplicates after a
+# retry whose response was lost. When the ERP rejects a batch (4xx), the batch is
+# bisected so only the rejected updates are marked dead.
+#
+# watch(store) follows the job store's change feed instead of building updates
+# in the change callback: the callback (which runs on whatever thread wrote,
+# often the GUI thread) only wakes the worker, and the worker reads this
+# station's new changes - bulk imports and batch saves included - looks up the
+# jobs, and inserts the updates together with its feed position in one
+# transaction, so nothing is lost or queued twice across a restart.
+
+log = logging.getLogger(__name__)
+
+# Checklist step 7 ("Job Completion") fields that produce tracking-system updates
+STEP7_UPDATES = {
+    "tracking_system_entered": "job_details",
+    "start_stop_email_sent": "start_stop",
+}
+
+
+class ErpOutbox:
+    def __init__(self, path=None, endpoint=None, batch_size=200, base_backoff=1.0, max_backoff=300.0):
+        self.endpoint = endpoint or config.TRACKING_URL
+        self.batch_size = batch_size
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.last_error = None
+        self.posted = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or config.data_path("erp_outbox.db"), check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL, job_id INTEGER, payload TEXT, created REAL,
+                attempts INTEGER DEFAULT 0, dead INTEGER DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS outbox_state (name TEXT PRIMARY KEY, value INTEGER);
+        """)
+        self._store = None
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # -- producer side (any thread, no network) ----------------------------
+
+    def enqueue(self, kind, job_id, payload):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO outbox (kind, job_id, payload, created) VALUES (?, ?, ?, ?)",
+                (kind, job_id, json.dumps(payload, default=str, separators=(",", ":")), time.time()))
+        self._wake_event.set()
+
+    def enqueue_many(self, updates, feed_seq=None):
+        """updates: iterable of (kind, job_id, payload), written in one transaction (with the feed position)"""
+        now = time.time()
+        rows = [(kind, job_id, json.dumps(payload, default=str, separators=(",", ":")), now)
+                for kind, job_id, payload in updates]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("INSERT INTO outbox (kind, job_id, payload, created) VALUES (?, ?, ?, ?)",
+                                       rows)
+                if feed_seq is not None:
+                    self._conn.execute("INSERT OR REPLACE INTO outbox_state (name, value) VALUES ('feed_seq', ?)",
+                                       (feed_seq,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if rows:
+            self._wake_event.set()
+
+    def watch(self, store):
+        """Queue step 7 updates recorded on this station from now on (and any missed while the app was closed)"""
+        with self._lock:
+            if self._feed_seq() is None:
+                self._conn.execute("INSERT INTO outbox_state (name, value) VALUES ('feed_seq', ?)",
+                                   (store.last_seq(),))
+        self._store = store
+        store.register_for_changes(self._on_store_changes)
+        self._wake_event.set()
+
+    def _feed_seq(self):
+        row = self._conn.execute("SELECT value FROM outbox_state WHERE name = 'feed_seq'").fetchone()
+        return row[0] if row else None
+
+    def _on_store_changes(self, changes):
+        # Runs on the writing thread: no lookups here, the worker reads the changes from the feed
+        station_id = self._store.station_id
+        if any(change.entity == "bulk" or (change.entity == "step" and change.origin == station_id)
+               for change in changes):
+            self._wake_event.set()
+
+    def collect(self):
+        """Queue updates for this station's step 7 changes not seen yet (worker thread); returns how many"""
+        store = self._store
+        if store is None:
+            return 0
+        with self._lock:
+            seq = self._feed_seq()
+        queued = 0
+        while True:
+            # Only this station posts its own edits; the other stations see them through sync
+            changes = store.changes_since(seq, 1000, origin=store.station_id)
+            if not changes:
+                return queued
+            updates = []
+            for change in changes:
+                if change.entity != "step" or not change.data:
+                    continue
+                job_id, step, field = change.key.split(":", 2)
+                kind = STEP7_UPDATES.get(field) if step == "7" else None
+                if kind is None:
+                    continue
+                job = store.get_job(int(job_id))
+                payload = {"field": field, "value": change.data}
+                if job is not None:
+                    payload["job"] = job.as_dict()
+                updates.append((kind, int(job_id), payload))
+            seq = changes[-1].seq
+            self.enqueue_many(updates, feed_seq=seq)
+            queued += len(updates)
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE dead = 0").fetchone()[0]
+
+    def dead_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE dead = 1").fetchone()[0]
+
+    # -- worker side -------------------------------------------------------
+
+    def start(self):
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="erp-outbox", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        if self._store is not None:
+            self._store.unregister_for_changes(self._on_store_changes)
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _next_batch(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, kind, job_id, payload, created FROM outbox WHERE dead = 0 ORDER BY id LIMIT ?",
+                (self.batch_size,)).fetchall()
+
+    def _post(self, batch):
+        body = json.dumps({"updates": [
+            {"id": row_id, "kind": kind, "job_id": job_id, "payload": json.loads(payload), "created": created}
+            for row_id, kind, job_id, payload, created in batch
+        ]}, separators=(",", ":")).encode("utf-8")
+        request = urllib.request.Request(self.endpoint, data=body, method="POST", headers={
+            "Content-Type": "application/json",
+            "Idempotency-Key": f"{config.STATION_ID}:{batch[0][0]}-{batch[-1][0]}",
+        })
+        with urllib.request.urlopen(request, timeout=15) as response:
+            response.read()
+
+    def _finish(self, batch, dead=False):
+        ids = [(row[0],) for row in batch]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            if dead:
+                self._conn.executemany("UPDATE outbox SET dead = 1, attempts = attempts + 1 WHERE id = ?", ids)
+            else:
+                self._conn.executemany("DELETE FROM outbox WHERE id = ?", ids)
+            self._conn.execute("COMMIT")
+
+    def flush_once(self):
+        """Post one batch. Returns the number of updates handled - acknowledged or marked dead - (0 when the
+        outbox is empty); raises URLError / OSError while the link is down or the ERP fails (5xx)."""
+        batch = self._next_batch()
+        if not batch:
+            return 0
+        self._deliver(batch)
+        return len(batch)
+
+    def _deliver(self, batch):
+        try:
+            self._post(batch)
+        except urllib.error.HTTPError as error:
+            if not 400 <= error.code < 500 or error.code in (408, 429):
+                raise
+            # The ERP rejected the content; retrying won't help. Bisect so that only the rejected
+            # updates are kept (dead, for inspection) and the rest still go through.
+            if len(batch) == 1:
+                log.error("erp outbox: update %d rejected (%s), marked dead", batch[0][0], error)
+                self._finish(batch, dead=True)
+                return
+            middle = len(batch) // 2
+            self._deliver(batch[:middle])
+            self._deliver(batch[middle:])
+            return
+        self._finish(batch)
+        self.posted += len(batch)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.collect()
+                if self.flush_once():
+                    if self.failures:
+                        log.info("erp outbox: link restored after %d failed attempts", self.failures)
+                    self.failures = 0
+                    self.last_error = None
+                    continue
+                self._wake_event.wait(30.0)
+                self._wake_event.clear()
+            except Exception as error:
+                self.failures += 1
+                self.last_error = error
+                if not isinstance(error, (urllib.error.URLError, OSError)):
+                    # Not the link (a bug, bad data in the feed): keep the worker alive and retry after the back-off
+                    log.exception("erp outbox: unexpected error, retrying")
+                elif self.failures == 1:
+                    log.warning("erp outbox: link down (%s), %d updates queued", error, self.pending_count())
+                delay = min(self.max_backoff, self.base_backoff * 2 ** min(self.failures - 1, 16))
+                self._stop_event.wait(delay * random.uniform(0.5, 1.0))
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == '__main__':
+    # Throughput of batched vs single-update posting against a local HTTP stand-in:
+    #   python -m core.erp_outbox [updates] [latency_ms]
+    import os
+    import sys
+    import tempfile
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    n_updates = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 20.0) / 1000.0
+    received = set()
+
+    class StandInErp(BaseHTTPRequestHandler):
+        def do_POST(self):
+            time.sleep(latency)  # WAN round trip + ERP processing
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            received.update(update["id"] for update in body["updates"])
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    def run(batch_size, start_offline=False):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StandInErp)
+        endpoint = f"http://127.0.0.1:{server.server_address[1]}/tracking/updates"
+        if start_offline:
+            server.server_close()
+        path = os.path.join(tempfile.mkdtemp(prefix="erp-outbox-"), "outbox.db")
+        outbox = ErpOutbox(path, endpoint, batch_size=batch_size, base_backoff=0.05)
+        received.clear()
+
+        started = time.perf_counter()
+        for i in range(n_updates):
+            outbox.enqueue("start_stop", 100 + i, {"field": "start_stop_email_sent", "value": True})
+        enqueue_time = time.perf_counter() - started
+
+        if start_offline:
+            outbox.start()
+            time.sleep(0.5)
+            print(f"  offline: {outbox.pending_count()} queued after {outbox.failures} failed attempts")
+            server = ThreadingHTTPServer(server.server_address, StandInErp)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        started = time.perf_counter()
+        outbox.start()
+        while outbox.pending_count():
+            time.sleep(0.01)
+        drain_time = time.perf_counter() - started
+        outbox.close()
+        server.shutdown()
+        print(f"  batch {batch_size:>4}: enqueue {enqueue_time / n_updates * 1e6:6.1f} us/update, "
+              f"drained {len(received)} in {drain_time:6.2f}s ({len(received) / drain_time:8.0f} updates/s)")
+
+    print(f"{n_updates} updates, {latency * 1000:.0f} ms per request")
+    run(1)
+    run(200)
+    run(200, start_offline=True)
@@ -0,0 +1,250 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+
+# App-wide event bus.
+#
+# Engines and worker threads publish(topic, key, payload) from any thread; the
+# event only lands in a pending map keyed by (topic, key), where a repeat of the
+# same topic and key is merged into the waiting event instead of queued behind
+# it (latest value wins, counts add up, lists are concatenated - per topic).
+# drain() swaps the map out and hands every subscriber of a topic one list of
+# merged events. In the app the FrameDispatcher drains on the GUI thread at most
+# once per frame, so a view sees one update per frame however fast events
+# arrive; without a dispatcher (CLI, scripts) events are delivered as they are
+# published.
+#
+# set_tracer() hooks in a tracer (instrumentation.TRACER in the app) that gets a
+# span around every subscriber call, so a slow subscriber shows up by name in
+# the trace and in stall reports rather than as one long drain.
+#
+# Topics are declared once, with the payload type and the merge rule:
+#   JOBS_CHANGED      key None      list of JobStore changes (concatenated)
+#   PRODUCTION        key printer   number of new events (summed)
+#   ALERT             key alert     message, or None once cleared (latest)
+#   TASK_PROGRESS     key task      (done, total) (latest)
+#   THEME_CHANGED     key None      theme name (latest)
+
+log = logging.getLogger(__name__)
+
+Event = namedtuple("Event", "topic key payload count")  # count: published events merged into this one
+
+
+class Topic:
+    """A declared event type: payloads must be `payload_type`; merge is 'latest', 'sum', 'extend' or merge(old, new)"""
+    __slots__ = ("name", "payload_type", "merge")
+
+    def __init__(self, name, payload_type=object, merge="latest"):
+        if not callable(merge) and merge not in ("latest", "sum", "extend"):
+            raise ValueError(f"unknown merge rule {merge!r} for topic {name!r}")
+        self.name = name
+        self.payload_type = payload_type
+        self.merge = merge
+
+    def __repr__(self):
+        return f"Topic({self.name!r})"
+
+
+JOBS_CHANGED = Topic("jobs_changed", list, "extend")
+PRODUCTION = Topic("production", int, "sum")
+ALERT = Topic("alert", (str, type(None)))
+TASK_PROGRESS = Topic("task_progress", tuple)
+THEME_CHANGED = Topic("theme_changed", str)
+
+
+class EventBus:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}  # (topic, key) -> [payload, count]
+        self._subscribers = {}  # topic -> [(callback, with_events)]
+        self._wakeup = None
+        self._waiting = False  # a drain is already scheduled
+        self._tracer = None
+        self.published = 0
+        self.delivered = 0
+
+    # -- subscribers (GUI thread) -------------------------------------------
+
+    def subscribe(self, topic, callback, with_events=True):
+        """callback(events) once per drain with the merged events of `topic`; with_events=False calls
+        callback() instead, once per drain even if it is subscribed to several topics that fired"""
+        subscribers = self._subscribers.setdefault(topic, [])
+        if all(existing is not callback for existing, _ in subscribers):
+            # Copy on write: a drain in progress keeps iterating the old list
+            self._subscribers[topic] = subscribers + [(callback, with_events)]
+
+    def unsubscribe(self, topic, callback):
+        subscribers = self._subscribers.get(topic, [])
+        self._subscribers[topic] = [entry for entry in subscribers if entry[0] is not callback]
+
+    def set_wakeup(self, wakeup):
+        """wakeup() is called (from the publishing thread) when events are waiting and no drain is scheduled;
+        None delivers every event synchronously as it is published"""
+        with self._lock:
+            self._wakeup = wakeup
+            self._waiting = False
+            pending = bool(self._pending)
+        if pending:
+            wakeup() if wakeup is not None else self.drain()
+
+    def set_tracer(self, tracer):
+        """tracer.span(name, category, **args) wraps each subscriber call in drain(); None turns spans off"""
+        self._tracer = tracer
+
+    # -- publishers (any thread) --------------------------------------------
+
+    def publish(self, topic, key=None, payload=None):
+        self.publish_many(topic, ((key, payload),))
+
+    def publish_many(self, topic, items):
+        """items: iterable of (key, payload), merged as if published one by one (one lock round trip)"""
+        payload_type, merge = topic.payload_type, topic.merge
+        with self._lock:
+            pending = self._pending
+            for key, payload in items:
+                if not isinstance(payload, payload_type):
+                    raise TypeError(f"{topic.name} payload must be {payload_type}, not {type(payload).__name__}")
+                self.published += 1
+                slot = pending.get((topic, key))
+                if slot is None:
+                    pending[topic, key] = [list(payload) if merge == "extend" else payload, 1]
+                    continue
+                if merge == "latest":
+                    slot[0] = payload
+                elif merge == "sum":
+                    slot[0] += payload
+                elif merge == "extend":
+                    slot[0].extend(payload)
+                else:
+                    slot[0] = merge(slot[0], payload)
+                slot[1] += 1
+            wakeup = self._wakeup
+            wake = bool(pending) and not self._waiting
+            if wake and wakeup is not None:
+                self._waiting = True
+        if wake:
+            wakeup() if wakeup is not None else self.drain()
+
+    # -- delivery ------------------------------------------------------------
+
+    def has_pending(self):
+        return bool(self._pending)
+
+    def drain(self):
+        """Deliver everything published so far; returns the number of merged events delivered"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._waiting = False
+        if not pending:
+            return 0
+        by_topic = {}
+        for (topic, key), (payload, count) in pending.items():
+            by_topic.setdefault(topic, []).append(Event(topic, key, payload, count))
+        notified = set()  # argument-less callbacks run once per drain, however many of their topics fired
+        tracer = self._tracer
+        for topic, events in by_topic.items():
+            for callback, with_events in self._subscribers.get(topic, ()):
+                if not with_events:
+                    if callback in notified:
+                        continue
+                    notified.add(callback)
+                try:
+                    if tracer is None:
+                        callback(events) if with_events else callback()
+                    else:
+                        with tracer.span("event_bus.callback", "events", topic=topic.name, callback=callback,
+                                         events=len(events)):
+                            callback(events) if with_events else callback()
+                except Exception:
+                    log.exception("%s subscriber %r failed", topic.name, callback)
+        self.delivered += len(pending)
+        return len(pending)
+
+
+# The app-wide bus
+EVENT_BUS = EventBus()
+
+
+if __name__ == '__main__':
+    # Stress: publishers at a fixed total rate, a 60 Hz "GUI thread" draining
+    #   python -m core.event_bus [events_per_second] [seconds] [publisher_threads] [keys] [events_per_call]
+    import statistics
+    import sys
+
+    rate = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    keys = int(sys.argv[4]) if len(sys.argv) > 4 else 200
+    group_size = int(sys.argv[5]) if len(sys.argv) > 5 else 64
+    frame = 1 / 60
+
+    bus = EventBus()
+    wakeups = []
+    bus.set_wakeup(lambda: wakeups.append(time.perf_counter()))
+    received = {"production": 0, "alert": 0, "callbacks": 0, "events": 0}
+    latest_seen = {}
+
+    def on_production(events):
+        received["callbacks"] += 1
+        received["events"] += len(events)
+        received["production"] += sum(event.payload for event in events)
+
+    def on_progress(events):
+        received["callbacks"] += 1
+        received["events"] += len(events)
+        for event in events:
+            latest_seen[event.key] = event.payload
+
+    bus.subscribe(PRODUCTION, on_production)
+    bus.subscribe(TASK_PROGRESS, on_progress)
+
+    def publisher(index, count):
+        # Bursty like the production log: groups of events per call (the last one is a progress update)
+        interval = group_size / (rate / threads)
+        next_at = time.perf_counter()
+        sent = 0
+        while sent < count:
+            group = min(group_size, count - sent)
+            if index == 0:
+                bus.publish_many(PRODUCTION, ((f"ZT411-{(sent + i) % keys}", 1) for i in range(group - 1)))
+                bus.publish(TASK_PROGRESS, "export", (sent + group, count))
+            else:
+                bus.publish_many(PRODUCTION, ((f"ZT411-{(sent + i) % keys}", 1) for i in range(group)))
+            sent += group
+            next_at += interval
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    per_thread = int(rate * seconds) // threads
+    workers = [threading.Thread(target=publisher, args=(i, per_thread)) for i in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    drains, drain_times, frames = [], [], 0
+    while any(worker.is_alive() for worker in workers) or bus.has_pending():
+        frame_start = time.perf_counter()
+        drain_started = time.perf_counter()
+        delivered = bus.drain()
+        if delivered:
+            drains.append(delivered)
+            drain_times.append(time.perf_counter() - drain_started)
+        frames += 1
+        time.sleep(max(0.0, frame - (time.perf_counter() - frame_start)))
+    elapsed = time.perf_counter() - started
+
+    published = bus.published
+    drain_times.sort()
+    print(f"published {published:,} events in {elapsed:.2f}s ({published / elapsed:,.0f}/s) from {threads} threads")
+    print(f"delivered in {len(drains)} drains over {frames} frames: {received['events']:,} merged events, "
+          f"{received['callbacks']:,} subscriber calls ({received['callbacks'] / elapsed:,.0f}/s instead of "
+          f"{published / elapsed:,.0f}/s)")
+    print(f"merged events per drain: median {statistics.median(drains):,.0f}, max {max(drains):,}")
+    print(f"drain time (GUI thread): median {statistics.median(drain_times) * 1e3:.2f} ms, "
+          f"p99 {drain_times[int(len(drain_times) * 0.99)] * 1e3:.2f} ms")
+    print(f"wakeups: {len(wakeups):,} (one per frame with pending events at most)")
+    progress_events = -(-per_thread // group_size)
+    assert received["production"] == published - progress_events, "events lost"
+    assert latest_seen["export"] == (per_thread, per_thread), "stale progress delivered last"
+    print(f"production count delivered: {received['production']:,}; last progress seen {latest_seen['export']}")
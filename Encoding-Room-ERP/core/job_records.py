@@ -0,0 +1,411 @@
+import bisect
+from array import array
+from datetime import date
+
+# In-memory job records. A single job is a JobRecord (__slots__, no per-instance
+# dict); the full job history lives in a JobTable, which keeps one compact column
+# per field instead of one Python object per job. Nothing here imports Qt.
+
+JOB_STATUSES = ("Pending", "In Progress", "On Hold", "Completed", "Cancelled")
+ACTIVE_STATUSES = ("In Progress",)
+
+# Field name -> column kind.
+#   "category": repeated values, stored as small integer codes into an interned value list
+#   "text":     mostly unique strings, packed into one UTF-8 buffer
+#   "int":      32-bit integers (ids, quantities, roll counts)
+#   "serial":   64-bit integers (SGTIN serials run to 38 bits)
+#   "flag":     0/1
+#   "date":     date ordinals, 0 when unset
+JOB_FIELDS = {
+    "job_id": "int",
+    "job_ticket": "text",
+    "customer": "category",
+    "customer_po": "text",
+    "part_number": "text",
+    "item": "text",
+    "upc": "text",
+    "inlay_type": "category",
+    "label_size": "category",
+    "label_type": "category",
+    "ribbon": "category",
+    "printer": "category",
+    "encoding": "category",
+    "status": "category",
+    "qty": "int",
+    "overage": "int",
+    "lpr": "int",
+    "rolls": "int",
+    "start_serial": "serial",
+    "end_serial": "serial",
+    "lock": "flag",
+    "created_date": "date",
+    "due_date": "date",
+    "completed_date": "date",
+}
+
+_DEFAULTS = {"category": "", "text": "", "int": 0, "serial": 0, "flag": 0, "date": None}
+
+
+class CategoryColumn:
+    """Interned strings: one code per row, each distinct value stored once"""
+    __slots__ = ("codes", "values", "_lookup")
+
+    def __init__(self):
+        self.codes = array("B")
+        self.values = [""]
+        self._lookup = {"": 0}
+
+    def code_for(self, value):
+        value = value or ""
+        code = self._lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self._lookup[value] = code
+            # Widen the code array when the number of categories outgrows it
+            if code == 256 and self.codes.typecode == "B":
+                self.codes = array("H", self.codes)
+            elif code == 65536 and self.codes.typecode == "H":
+                self.codes = array("I", self.codes)
+        return code
+
+    def append(self, value):
+        code = self.code_for(value)  # may widen self.codes, so look it up afterwards
+        self.codes.append(code)
+
+    def extend(self, values):
+        lookup = self._lookup
+        codes = [lookup.get(value) if value else 0 for value in values]
+        if None in codes:
+            codes = [self.code_for(value) for value in values]
+        self.codes.extend(codes)
+
+    def get(self, row):
+        return self.values[self.codes[row]]
+
+    def set(self, row, value):
+        code = self.code_for(value)
+        self.codes[row] = code
+
+    def count(self, value):
+        code = self._lookup.get(value or "")
+        return self.codes.count(code) if code is not None else 0
+
+    def counts(self):
+        totals = [0] * len(self.values)
+        for code in self.codes:
+            totals[code] += 1
+        return {self.values[code]: n for code, n in enumerate(totals) if n}
+
+    def rows_equal(self, value):
+        code = self._lookup.get(value or "")
+        if code is None:
+            return []
+        return [row for row, c in enumerate(self.codes) if c == code]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def nbytes(self):
+        return self.codes.itemsize * len(self.codes) + sum(len(v) for v in self.values)
+
+
+class TextColumn:
+    """Mostly-unique strings packed into a single UTF-8 buffer"""
+    __slots__ = ("data", "ends", "edits")
+
+    COMPACT_MIN_EDITS = 1024  # edits are folded back into the buffer past this many (and 1/8 of the rows)
+
+    def __init__(self):
+        self.data = bytearray()
+        self.ends = array("I", [0])  # row i spans data[ends[i]:ends[i + 1]]
+        self.edits = {}              # rows changed after loading; folded back in by compact()
+
+    def append(self, value):
+        if value:
+            self.data += str(value).encode("utf-8")
+        self.ends.append(len(self.data))
+
+    def extend(self, values):
+        data = self.data
+        ends = self.ends
+        for value in values:
+            if value:
+                data += str(value).encode("utf-8")
+            ends.append(len(data))
+
+    def get(self, row):
+        if self.edits and row in self.edits:
+            return self.edits[row]
+        return self.data[self.ends[row]:self.ends[row + 1]].decode("utf-8")
+
+    def set(self, row, value):
+        self.edits[row] = str(value) if value else ""
+        if len(self.edits) > max(self.COMPACT_MIN_EDITS, len(self) // 8):
+            self.compact()
+
+    def compact(self):
+        """Rewrite the buffer with the edits folded in (rebuilding costs O(rows), so it runs once edits pile up)"""
+        if not self.edits:
+            return
+        values = [self.get(row) for row in range(len(self))]
+        self.data = bytearray()
+        self.ends = array("I", [0])
+        self.edits = {}
+        self.extend(values)
+
+    def count(self, value):
+        value = str(value) if value else ""
+        return sum(1 for row in range(len(self)) if self.get(row) == value)
+
+    def __len__(self):
+        return len(self.ends) - 1
+
+    def nbytes(self):
+        return len(self.data) + self.ends.itemsize * len(self.ends)
+
+
+class IntColumn:
+    __slots__ = ("values",)
+
+    def __init__(self, typecode="i"):
+        self.values = array(typecode)
+
+    def append(self, value):
+        self.values.append(int(value or 0))
+
+    def extend(self, values):
+        self.values.extend([int(value or 0) for value in values])
+
+    def get(self, row):
+        return self.values[row]
+
+    def set(self, row, value):
+        self.values[row] = int(value or 0)
+
+    def count(self, value):
+        return self.values.count(int(value or 0))
+
+    def total(self):
+        return sum(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def nbytes(self):
+        return self.values.itemsize * len(self.values)
+
+
+class DateColumn(IntColumn):
+    """Dates as proleptic Gregorian ordinals (0 = no date)"""
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__("i")
+
+    def append(self, value):
+        self.values.append(to_ordinal(value))
+
+    def extend(self, values):
+        self.values.extend([to_ordinal(value) for value in values])
+
+    def get(self, row):
+        ordinal = self.values[row]
+        return date.fromordinal(ordinal) if ordinal else None
+
+    def set(self, row, value):
+        self.values[row] = to_ordinal(value)
+
+    def count(self, value):
+        return self.values.count(to_ordinal(value))
+
+
+def to_ordinal(value):
+    if not value:
+        return 0
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.toordinal()
+
+
+_COLUMN_TYPES = {
+    "category": CategoryColumn,
+    "text": TextColumn,
+    "int": lambda: IntColumn("i"),
+    "serial": lambda: IntColumn("q"),
+    "flag": lambda: IntColumn("b"),
+    "date": DateColumn,
+}
+
+
+class JobRecord:
+    """A single job; used for edits, forms and anything that handles jobs one at a time"""
+    __slots__ = tuple(JOB_FIELDS)
+
+    def __init__(self, **fields):
+        for name, kind in JOB_FIELDS.items():
+            setattr(self, name, fields.get(name, _DEFAULTS[kind]))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data[name] for name in JOB_FIELDS if name in data})
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in JOB_FIELDS}
+
+    def __repr__(self):
+        return f"JobRecord(job_id={self.job_id}, job_ticket={self.job_ticket!r}, customer={self.customer!r})"
+
+
+class JobTable:
+    """Columnar store for the job history; table models and aggregations read the columns directly"""
+    def __init__(self):
+        self.columns = {name: _COLUMN_TYPES[kind]() for name, kind in JOB_FIELDS.items()}
+        self._ids_sorted = True
+
+    def __len__(self):
+        return len(self.columns["job_id"])
+
+    def column(self, name):
+        return self.columns[name]
+
+    def append(self, job):
+        if not isinstance(job, dict):
+            job = job.as_dict()
+        ids = self.columns["job_id"].values
+        job_id = int(job.get("job_id") or 0)
+        if ids and job_id <= ids[-1]:
+            self._ids_sorted = False
+        for name, column in self.columns.items():
+            column.append(job.get(name, _DEFAULTS[JOB_FIELDS[name]]))
+
+    def extend(self, jobs):
+        """Append many jobs (dicts or JobRecords) column by column"""
+        jobs = [job if isinstance(job, dict) else job.as_dict() for job in jobs]
+        if not jobs:
+            return
+        ids = self.columns["job_id"].values
+        new_ids = [int(job.get("job_id") or 0) for job in jobs]
+        if (ids and new_ids[0] <= ids[-1]) or any(a >= b for a, b in zip(new_ids, new_ids[1:])):
+            self._ids_sorted = False
+        for name, column in self.columns.items():
+            default = _DEFAULTS[JOB_FIELDS[name]]
+            column.extend([job.get(name, default) for job in jobs])
+
+    def extend_rows(self, field_names, rows):
+        """Bulk load: rows are tuples in field_names order (e.g. straight from a database cursor)"""
+        if not rows:
+            return
+        ids = self.columns["job_id"].values
+        for name, values in zip(field_names, zip(*rows)):
+            if name == "job_id":
+                values = [int(value or 0) for value in values]
+                if (ids and values[0] <= ids[-1]) or any(a >= b for a, b in zip(values, values[1:])):
+                    self._ids_sorted = False
+            self.columns[name].extend(values)
+        for name in self.columns.keys() - set(field_names):
+            self.columns[name].extend([_DEFAULTS[JOB_FIELDS[name]]] * len(rows))
+
+    def value(self, row, name):
+        return self.columns[name].get(row)
+
+    def set_value(self, row, name, value):
+        self.columns[name].set(row, value)
+
+    def record(self, row):
+        return JobRecord(**{name: column.get(row) for name, column in self.columns.items()})
+
+    def update(self, row, job):
+        if not isinstance(job, dict):
+            job = job.as_dict()
+        for name, value in job.items():
+            if name in self.columns and name != "job_id":
+                self.columns[name].set(row, value)
+
+    def row_of(self, job_id):
+        ids = self.columns["job_id"].values
+        if self._ids_sorted:
+            row = bisect.bisect_left(ids, job_id)
+            return row if row < len(ids) and ids[row] == job_id else -1
+        try:
+            return ids.index(job_id)
+        except ValueError:
+            return -1
+
+    def count_where(self, name, value):
+        return self.columns[name].count(value)
+
+    def count_by(self, name):
+        return self.columns[name].counts()
+
+    def rows_where(self, name, value):
+        return self.columns[name].rows_equal(value)
+
+    def total(self, name):
+        return self.columns[name].total()
+
+    def nbytes(self):
+        return sum(column.nbytes() for column in self.columns.values())
+
+
+if __name__ == '__main__':
+    # Memory/access benchmark: python -m core.job_records [jobs]
+    import sys
+    import time
+    import tracemalloc
+
+    n_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    customers = [f"Customer {i}" for i in range(400)]
+    inlays = ["AD-383u8", "AD-229r6", "Dogbone M730", "Belt M781", "Web U9"]
+    sizes = ["4x2", "4x6", "2x1", "3x1.5", "1.5x0.75"]
+    printers = [f"ZT411-{i}" for i in range(1, 9)]
+    today = date.today().toordinal()
+
+    def synthetic_job(i):
+        return {
+            "job_id": i + 1, "job_ticket": f"JT-{100000 + i}", "customer": customers[i % len(customers)],
+            "customer_po": f"PO{7000000 + i * 7}", "part_number": f"PN-{i % 5000:05d}", "item": f"ITEM{i % 20000}",
+            "upc": f"{(i * 7919) % 10**12:012d}", "inlay_type": inlays[i % len(inlays)],
+            "label_size": sizes[i % len(sizes)], "label_type": "Thermal Transfer", "ribbon": "Wax/Resin 110mm",
+            "printer": printers[i % len(printers)], "encoding": "HEX" if i % 3 else "ASCII",
+            "status": JOB_STATUSES[i % len(JOB_STATUSES)], "qty": 1000 + i % 50000, "overage": 2,
+            "lpr": 1000, "rolls": 1 + i % 50, "start_serial": i * 100000, "end_serial": i * 100000 + 99999,
+            "lock": i % 2, "created_date": today - i % 3650, "due_date": today - i % 3650 + 7,
+            "completed_date": today - i % 3650 + 3 if i % 5 == 3 else 0,
+        }
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    table = JobTable()
+    for i in range(n_jobs):
+        table.append(synthetic_job(i))
+    build_time = time.perf_counter() - started
+    columnar_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    sample = min(n_jobs, 100_000)
+    tracemalloc.start()
+    as_dicts = [synthetic_job(i) for i in range(sample)]
+    dict_bytes = tracemalloc.get_traced_memory()[0] * n_jobs / sample
+    tracemalloc.stop()
+    del as_dicts
+
+    print(f"{n_jobs:,} jobs")
+    print(f"  columnar table:  {columnar_bytes / 2**20:8.1f} MiB (built in {build_time:.1f}s)")
+    print(f"  list of dicts:   {dict_bytes / 2**20:8.1f} MiB (extrapolated from {sample:,})")
+
+    def timed(label, func, repeat=1):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            result = func()
+        print(f"  {label:<28} {(time.perf_counter() - started) / repeat * 1000:9.3f} ms")
+        return result
+
+    timed("count status=In Progress", lambda: table.count_where("status", "In Progress"), 10)
+    timed("count_by customer", lambda: table.count_by("customer"), 3)
+    timed("total qty", lambda: table.total("qty"), 10)
+    timed("row_of (bisect)", lambda: table.row_of(n_jobs // 2), 10000)
+    timed("record(row)", lambda: table.record(n_jobs // 2), 10000)
+    timed("display cell (customer)", lambda: table.value(n_jobs // 2, "customer"), 100000)
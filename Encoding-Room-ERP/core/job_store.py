@@ -0,0 +1,313 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from core import config
+from core.job_records import JOB_FIELDS, JobTable, to_ordinal
+
+# Persistent job store (SQLite). Every local write is also appended to the
+# `changes` table, a monotonically sequenced feed of field-level deltas that the
+# sync subsystem ships between stations and that listeners use to update views.
+
+JOB_ID_STRIDE = 100  # job ids are allocated as counter * stride + station number
+
+# A change is a partial update of one entity:
+#   entity "job":  key = job_id,                 data = {field: value, ...}
+#   entity "step": key = "job_id:step:field",    data = value
+#   entity "bulk": key = "first_seq:last_seq",   data = number of changes (notifications only, never stored)
+Change = namedtuple("Change", "seq origin origin_seq entity key data")
+
+_SQL_TYPES = {"category": "TEXT", "text": "TEXT", "int": "INTEGER", "serial": "INTEGER",
+              "flag": "INTEGER", "date": "INTEGER"}
+
+
+def normalize_job_fields(fields):
+    """Coerce job field values to their stored form (dates become ordinals)"""
+    clean = {}
+    for name, value in fields.items():
+        kind = JOB_FIELDS.get(name)
+        if kind is None:
+            continue
+        if kind == "date":
+            value = to_ordinal(value)
+        elif kind in ("int", "serial", "flag"):
+            value = int(value or 0)
+        else:
+            value = "" if value is None else str(value)
+        clean[name] = value
+    return clean
+
+
+def step_key(job_id, step, field):
+    return f"{job_id}:{step}:{field}"
+
+
+class JobStore:
+    def __init__(self, path=None, station_id=None, station_number=None):
+        self.path = path or config.data_path("jobs.db")
+        self.station_id = station_id or config.STATION_ID
+        self.station_number = config.STATION_NUMBER if station_number is None else station_number
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+        self._last_job_counter = None
+        self._local = threading.local()
+        self.change_callbacks = []
+
+    def _create_schema(self):
+        columns = ", ".join(f"{name} {_SQL_TYPES[kind]}" for name, kind in JOB_FIELDS.items() if name != "job_id")
+        self._conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS jobs (job_id INTEGER PRIMARY KEY, {columns});
+            CREATE TABLE IF NOT EXISTS checklist_steps (
+                job_id INTEGER, step INTEGER, field TEXT, value TEXT,
+                PRIMARY KEY (job_id, step, field)
+            );
+            CREATE TABLE IF NOT EXISTS changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                origin TEXT NOT NULL, origin_seq INTEGER,
+                entity TEXT NOT NULL, key TEXT NOT NULL, data TEXT, ts REAL
+            );
+            CREATE INDEX IF NOT EXISTS changes_by_origin ON changes (origin, seq);
+            CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, value INTEGER);
+        """)
+
+    # -- listeners ---------------------------------------------------------
+
+    def register_for_changes(self, callback):
+        """callback(list of Change) runs after each committed write, on the writing thread"""
+        if callback not in self.change_callbacks:
+            self.change_callbacks.append(callback)
+
+    def unregister_for_changes(self, callback):
+        if callback in self.change_callbacks:
+            self.change_callbacks.remove(callback)
+
+    def _notify(self, changes):
+        if not changes:
+            return
+        deferred = getattr(self._local, "deferred", None)
+        if deferred is not None:
+            # Only the seq range is kept, so a bulk write holds no per-row state in memory
+            deferred[0] = min(deferred[0], changes[0].seq)
+            deferred[1] = max(deferred[1], changes[-1].seq)
+            return
+        for callback in list(self.change_callbacks):
+            callback(changes)
+
+    @contextmanager
+    def batched_notifications(self):
+        """Collapse the change callbacks for writes made on this thread into one "bulk" change
+
+        The bulk change's key is "first_seq:last_seq"; listeners that need the
+        individual changes stream them with iter_changes().
+        """
+        if getattr(self._local, "deferred", None) is not None:
+            yield
+            return
+        self._local.deferred = [float("inf"), 0]
+        try:
+            yield
+        finally:
+            (first, last), self._local.deferred = self._local.deferred, None
+            if last:
+                self._notify([Change(last, self.station_id, last, "bulk", f"{first}:{last}", last - first + 1)])
+
+    # -- writes ------------------------------------------------------------
+
+    def _record(self, cursor, origin, origin_seq, entity, key, data):
+        cursor.execute(
+            "INSERT INTO changes (origin, origin_seq, entity, key, data, ts) VALUES (?, ?, ?, ?, ?, ?)",
+            (origin, origin_seq, entity, str(key), json.dumps(data, separators=(",", ":")), time.time()))
+        seq = cursor.lastrowid
+        # Local changes leave origin_seq NULL and use their own seq (see changes_since); the hub
+        # dedupes retried pushes on (origin, origin_seq)
+        return Change(seq, origin, seq if origin_seq is None else origin_seq, entity, str(key), data)
+
+    def _write_job(self, cursor, job_id, fields):
+        if not fields:
+            return
+        names = list(fields)
+        cursor.execute(
+            f"INSERT INTO jobs (job_id, {', '.join(names)}) VALUES (?{', ?' * len(names)}) "
+            f"ON CONFLICT(job_id) DO UPDATE SET {', '.join(f'{n} = excluded.{n}' for n in names)}",
+            [job_id] + [fields[n] for n in names])
+
+    def _write_step(self, cursor, key, value):
+        job_id, step, field = key.split(":", 2)
+        cursor.execute(
+            "INSERT INTO checklist_steps (job_id, step, field, value) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(job_id, step, field) DO UPDATE SET value = excluded.value",
+            (int(job_id), int(step), field, json.dumps(value)))
+
+    def _allocate_job_id(self):
+        # Scans once per session, then counts up; only this station hands out ids ending in its number
+        if self._last_job_counter is None:
+            row = self._conn.execute(
+                "SELECT MAX(job_id) FROM jobs WHERE job_id % ? = ?", (JOB_ID_STRIDE, self.station_number)).fetchone()
+            self._last_job_counter = (row[0] or 0) // JOB_ID_STRIDE
+        self._last_job_counter += 1
+        return self._last_job_counter * JOB_ID_STRIDE + self.station_number
+
+    def save_jobs(self, jobs):
+        """Insert or update many jobs (dicts or JobRecords) in one transaction; returns their job ids"""
+        changes = []
+        job_ids = []
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                for job in jobs:
+                    fields = normalize_job_fields(job if isinstance(job, dict) else job.as_dict())
+                    job_id = fields.pop("job_id", 0) or self._allocate_job_id()
+                    self._write_job(cursor, job_id, fields)
+                    changes.append(self._record(cursor, self.station_id, None, "job", job_id, fields))
+                    job_ids.append(job_id)
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+        self._notify(changes)
+        return job_ids
+
+    def save_job(self, job):
+        return self.save_jobs([job])[0]
+
+    def set_job_fields(self, job_id, **fields):
+        return self.save_jobs([dict(fields, job_id=job_id)])[0]
+
+    def set_step(self, job_id, step, field, value):
+        """Record one checklist field (step 1-7), e.g. set_step(42, 7, "start_stop_email_sent", True)"""
+        key = step_key(job_id, step, field)
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                self._write_step(cursor, key, value)
+                change = self._record(cursor, self.station_id, None, "step", key, value)
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+        self._notify([change])
+
+    def apply_remote_changes(self, changes, skip=None):
+        """Apply changes pulled from another station; `skip` holds (entity, key, field) triples to leave alone"""
+        applied = []
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                for origin, origin_seq, entity, key, data in changes:
+                    if entity == "job":
+                        if skip:
+                            data = {f: v for f, v in data.items() if ("job", key, f) not in skip}
+                        if data:
+                            self._write_job(cursor, int(key), data)
+                            applied.append(self._record(cursor, origin, origin_seq, entity, key, data))
+                    elif entity == "step":
+                        if not skip or ("step", key, None) not in skip:
+                            self._write_step(cursor, key, data)
+                            applied.append(self._record(cursor, origin, origin_seq, entity, key, data))
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+        self._notify(applied)
+        return applied
+
+    # -- reads -------------------------------------------------------------
+
+    def get_job(self, job_id):
+        with self._lock:
+            cursor = self._conn.execute(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE job_id = ?", (job_id,))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        table = JobTable()
+        table.extend_rows(list(JOB_FIELDS), [row])
+        return table.record(0)
+
+    def get_steps(self, job_id):
+        """Checklist values for a job as {step: {field: value}}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT step, field, value FROM checklist_steps WHERE job_id = ? ORDER BY step", (job_id,)).fetchall()
+        steps = {}
+        for step, field, value in rows:
+            steps.setdefault(step, {})[field] = json.loads(value)
+        return steps
+
+    def load_table(self, where="", params=(), batch_size=50000):
+        """Load jobs into a columnar JobTable, streaming rows in batches"""
+        table = JobTable()
+        names = list(JOB_FIELDS)
+        with self._lock:
+            cursor = self._conn.execute(f"SELECT {', '.join(names)} FROM jobs {where} ORDER BY job_id", params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                table.extend_rows(names, rows)
+        return table
+
+    def count_jobs(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def count_jobs_by(self, field, where="", params=()):
+        """{value: job count} for one job field, counted by SQLite"""
+        if field not in JOB_FIELDS:
+            raise ValueError(f"unknown job field {field!r}")
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {field}, COUNT(*) FROM jobs {where} GROUP BY {field} ORDER BY {field}", params).fetchall()
+        return dict(rows)
+
+    # -- change feed -------------------------------------------------------
+
+    def last_seq(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def changes_since(self, seq, limit=1000, origin=None):
+        """Changes after `seq` in feed order, optionally only those from one origin"""
+        query = "SELECT seq, origin, COALESCE(origin_seq, seq), entity, key, data FROM changes WHERE seq > ?"
+        params = [seq]
+        if origin is not None:
+            query += " AND origin = ?"
+            params.append(origin)
+        query += " ORDER BY seq LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [Change(s, o, os_, e, k, json.loads(d)) for s, o, os_, e, k, d in rows]
+
+    def iter_changes(self, first, last, batch_size=5000):
+        """Stream the changes with first <= seq <= last in batches (expands a "bulk" notification)"""
+        seq = first - 1
+        while seq < last:
+            batch = [change for change in self.changes_since(seq, batch_size) if change.seq <= last]
+            if not batch:
+                return
+            yield batch
+            seq = batch[-1].seq
+
+    def get_sync_state(self, name, default=0):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_state WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def set_sync_state(self, name, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sync_state (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = excluded.value", (name, value))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,232 @@
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from core.event_bus import ALERT, EVENT_BUS
+from core.job_records import ACTIVE_STATUSES
+from core.production_log import ENCODED, VOIDED, read_events
+
+# Incremental dashboard counters.
+#
+# Instead of counting over the job store / production log on every refresh, the
+# aggregator listens to job changes (JobStore) and committed production events
+# (ProductionLog) and updates its counters in O(1) per event; the Dashboard
+# reads a snapshot. Per-job state is only kept for the jobs that are active or
+# were completed today (status Completed with today's completed_date), never for
+# the whole history. Day counters reset at local midnight; tags per hour are
+# per-minute buckets over the last 60 minutes.
+
+MetricsSnapshot = namedtuple(
+    "MetricsSnapshot",
+    "active_jobs completed_today labels_today voided_today alerts tags_per_hour")
+
+BUCKETS = 60  # one per minute
+
+
+class _RateWindow:
+    """Events per printer over the last hour, in per-minute buckets"""
+    __slots__ = ("counts", "minutes")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.minutes = [-1] * BUCKETS
+
+    def add(self, minute, count=1):
+        slot = minute % BUCKETS
+        if self.minutes[slot] != minute:
+            if minute < self.minutes[slot]:
+                return  # older than the window
+            self.minutes[slot] = minute
+            self.counts[slot] = 0
+        self.counts[slot] += count
+
+    def total(self, now_minute):
+        return sum(count for count, minute in zip(self.counts, self.minutes) if now_minute - minute < BUCKETS)
+
+
+class DashboardMetrics:
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._store = None
+        self._production_log = None
+        self._active = set()
+        self._completed_today = set()
+        self._labels_today = 0
+        self._voided_today = 0
+        self._alerts = {}
+        self._rates = {}
+        self._start_day(clock())
+
+    def _start_day(self, ts):
+        day = datetime.fromtimestamp(ts).date()
+        self._day = day.toordinal()
+        self._day_start = datetime.combine(day, datetime.min.time()).timestamp()
+        self._day_end = datetime.combine(day + timedelta(days=1), datetime.min.time()).timestamp()
+        self._completed_today.clear()
+        self._labels_today = 0
+        self._voided_today = 0
+
+    def _roll_day(self, ts):
+        if ts >= self._day_end:
+            self._start_day(ts)
+
+    # -- sources ---------------------------------------------------------------
+
+    def seed(self, table):
+        """Initial state from the in-memory job history (one columnar pass at startup)"""
+        job_ids = table.column("job_id")
+        with self._lock:
+            for status in ACTIVE_STATUSES:
+                self._active.update(job_ids.get(row) for row in table.rows_where("status", status))
+            completed_dates = table.column("completed_date").values
+            self._completed_today.update(job_ids.get(row) for row in table.rows_where("status", "Completed")
+                                         if completed_dates[row] == self._day)
+
+    def seed_production(self, directory=None):
+        """Today's committed production events (so a restart doesn't zero the day counters)"""
+        batch = []
+        for event in read_events(directory, since=self._day_start):
+            batch.append(event)
+            if len(batch) == 4096:
+                self.on_production_events(batch)
+                batch = []
+        self.on_production_events(batch)
+
+    def watch(self, store=None, production_log=None):
+        if store is not None:
+            self._store = store
+            store.register_for_changes(self.on_job_changes)
+        if production_log is not None:
+            self._production_log = production_log
+            production_log.register_for_events(self.on_production_events)
+
+    def unwatch(self):
+        if self._store is not None:
+            self._store.unregister_for_changes(self.on_job_changes)
+        if self._production_log is not None:
+            self._production_log.unregister_for_events(self.on_production_events)
+
+    def on_job_changes(self, changes):
+        for change in changes:
+            if change.entity == "bulk" and self._store is not None:
+                first, last = map(int, change.key.split(":"))
+                for batch in self._store.iter_changes(first, last):
+                    self._apply_job_changes(batch)
+        self._apply_job_changes(changes)
+
+    def _apply_job_changes(self, changes):
+        # A change carries only the fields it wrote. A job counts as completed today when its status is
+        # Completed and its completed_date is today; when a change could make that true but carries only
+        # one of the two, the other is read from the store (rare: both are normally saved together).
+        today = datetime.fromtimestamp(self.clock()).date().toordinal()
+        current = {}
+        if self._store is not None:
+            for change in changes:
+                if change.entity == "job" and change.key not in current and (
+                        change.data.get("status") == "Completed" and "completed_date" not in change.data or
+                        change.data.get("completed_date") == today and "status" not in change.data):
+                    current[change.key] = self._store.get_job(int(change.key))
+        with self._lock:
+            self._roll_day(self.clock())
+            for change in changes:
+                data = change.data
+                if change.entity != "job" or ("status" not in data and "completed_date" not in data):
+                    continue
+                job_id = int(change.key)
+                if "status" in data:
+                    if data["status"] in ACTIVE_STATUSES:
+                        self._active.add(job_id)
+                    else:
+                        self._active.discard(job_id)
+                record = current.get(change.key)
+                if record is not None:
+                    completed = record.completed_date
+                    status = data.get("status", record.status)
+                    completed_on = data.get("completed_date", completed.toordinal() if completed else None)
+                else:
+                    status, completed_on = data.get("status"), data.get("completed_date")
+                if status == "Completed" and completed_on == self._day:
+                    self._completed_today.add(job_id)
+                elif status is not None or completed_on != self._day:
+                    self._completed_today.discard(job_id)
+
+    def on_production_events(self, events):
+        with self._lock:
+            rates = self._rates
+            for event in events:
+                if event.ts >= self._day_end:
+                    self._start_day(event.ts)
+                if event.kind == ENCODED:
+                    self._labels_today += 1
+                    window = rates.get(event.printer)
+                    if window is None:
+                        window = rates[event.printer] = _RateWindow()
+                    window.add(int(event.ts // 60))
+                elif event.kind == VOIDED:
+                    self._voided_today += 1
+
+    def raise_alert(self, key, message):
+        with self._lock:
+            changed = self._alerts.get(key) != message
+            self._alerts[key] = message
+        if changed:
+            EVENT_BUS.publish(ALERT, key, message)
+
+    def clear_alert(self, key):
+        with self._lock:
+            changed = self._alerts.pop(key, None) is not None
+        if changed:
+            EVENT_BUS.publish(ALERT, key, None)
+
+    # -- reader ----------------------------------------------------------------
+
+    def snapshot(self):
+        now = self.clock()
+        with self._lock:
+            self._roll_day(now)
+            now_minute = int(now // 60)
+            return MetricsSnapshot(
+                len(self._active), len(self._completed_today), self._labels_today, self._voided_today,
+                dict(self._alerts),
+                {printer: window.total(now_minute) for printer, window in sorted(self._rates.items())})
+
+
+if __name__ == '__main__':
+    # Per-event cost of the aggregator vs. counting on refresh: python -m core.metrics [events]
+    import sys
+
+    from core.job_records import JOB_STATUSES, JobTable
+    from core.job_store import Change
+    from core.production_log import ProductionEvent
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    metrics = DashboardMetrics()
+    now = time.time()
+    events = [ProductionEvent(now - 3600 + i * 3600 / n, ENCODED if i % 97 else VOIDED, f"ZT411-{i % 8 + 1}",
+                              1000 + i // 5000, i, b"") for i in range(n)]
+    started = time.perf_counter()
+    for first in range(0, n, 4096):
+        metrics.on_production_events(events[first:first + 4096])
+    elapsed = time.perf_counter() - started
+    print(f"{n:,} production events: {elapsed / n * 1e9:.0f} ns/event")
+
+    changes = [Change(i, "bench", None, "job", str(100 + i % 50_000),
+                      {"status": JOB_STATUSES[i % len(JOB_STATUSES)], "completed_date": date.today().toordinal()})
+               for i in range(200_000)]
+    started = time.perf_counter()
+    metrics.on_job_changes(changes)
+    elapsed = time.perf_counter() - started
+    print(f"{len(changes):,} job changes:      {elapsed / len(changes) * 1e9:.0f} ns/change")
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        snapshot = metrics.snapshot()
+    print(f"snapshot: {(time.perf_counter() - started) * 1000:.1f} us   {snapshot}")
+
+    table = JobTable()
+    table.extend({"job_id": i, "status": JOB_STATUSES[i % len(JOB_STATUSES)]} for i in range(1_000_000))
+    started = time.perf_counter()
+    table.count_where("status", "In Progress")
+    print(f"for comparison, counting 1M jobs on refresh: {(time.perf_counter() - started) * 1000:.1f} ms")
@@ -0,0 +1,247 @@
+import logging
+import math
+import threading
+from collections import namedtuple
+
+from core.production_log import ENCODED, RETRIED, VOIDED
+
+# Sliding-window printer analytics (void rate, labels per minute, retries) over
+# the production event stream, with alerts for calibration problems.
+#
+# Each printer keeps a fixed ring of time buckets plus running sums for a long
+# and a short window, so an event costs O(1) and memory per printer is constant.
+# Time is the events' own timestamps, not the wall clock: a recorded stream can
+# be replayed as fast as it can be read and produces the same alerts.
+#
+# Alerts (per printer, with hysteresis so they don't flap):
+#   void rate over the long window above VOID_RATE_ALERT
+#   void-rate trend: the last minute has significantly more voids than the rest of
+#                    the long window predicts (binomial z-score), e.g. a bad roll
+#   retry rate over the long window above RETRY_RATE_ALERT
+
+log = logging.getLogger(__name__)
+
+BUCKET_SECONDS = 5
+LONG_WINDOW_S = 600
+SHORT_WINDOW_S = 60
+MIN_LABELS = 100           # no rate alerts until the long window has seen this many labels
+VOID_RATE_ALERT = 0.05
+VOID_RATE_CLEAR = 0.03
+TREND_Z_ALERT = 5.0
+TREND_Z_CLEAR = 2.0
+TREND_MIN_VOIDS = 8
+TREND_MIN_RATE = 0.05      # short-window void rate below this never counts as a trend
+BASELINE_MIN_RATE = 0.005
+RETRY_RATE_ALERT = 0.10
+RETRY_RATE_CLEAR = 0.06
+
+PrinterWindowStats = namedtuple(
+    "PrinterWindowStats",
+    "printer labels voided retried void_rate short_void_rate void_trend_z labels_per_minute retry_rate")
+
+
+class PrinterWindow:
+    """Fixed-size bucket ring for one printer; counts are (encoded, voided, retried)"""
+    __slots__ = ("printer", "buckets", "current", "long", "short", "alerts")
+
+    SLOTS = LONG_WINDOW_S // BUCKET_SECONDS
+    SHORT_SLOTS = SHORT_WINDOW_S // BUCKET_SECONDS
+
+    def __init__(self, printer):
+        self.printer = printer
+        self.buckets = [[0, 0, 0] for _ in range(self.SLOTS)]
+        self.current = None  # absolute bucket number of the newest bucket
+        self.long = [0, 0, 0]
+        self.short = [0, 0, 0]
+        self.alerts = set()
+
+    def _advance(self, bucket):
+        if self.current is None:
+            self.current = bucket
+            return
+        steps = bucket - self.current
+        if steps >= self.SLOTS:
+            # Idle longer than the whole window: start over
+            for counts in self.buckets:
+                counts[:] = (0, 0, 0)
+            self.long = [0, 0, 0]
+            self.short = [0, 0, 0]
+            self.current = bucket
+            return
+        for _ in range(steps):
+            self.current += 1
+            # The bucket leaving the short window stays in the long one
+            leaving_short = self.buckets[(self.current - self.SHORT_SLOTS) % self.SLOTS]
+            reused = self.buckets[self.current % self.SLOTS]
+            for kind in range(3):
+                self.short[kind] -= leaving_short[kind]
+                self.long[kind] -= reused[kind]
+                reused[kind] = 0
+
+    def add(self, ts, kind):
+        bucket = int(ts // BUCKET_SECONDS)
+        self._advance(bucket)
+        if bucket <= self.current - self.SLOTS:
+            return  # older than the window
+        counts = self.buckets[bucket % self.SLOTS]
+        counts[kind] += 1
+        self.long[kind] += 1
+        if bucket > self.current - self.SHORT_SLOTS:
+            self.short[kind] += 1
+
+    def trend_z(self):
+        """How unusual the short window's voids are given the rest of the long window"""
+        short_labels = self.short[0] + self.short[1]
+        baseline_labels = self.long[0] + self.long[1] - short_labels
+        if not short_labels or not baseline_labels:
+            return 0.0
+        p = max(BASELINE_MIN_RATE, (self.long[1] - self.short[1]) / baseline_labels)
+        return (self.short[1] - short_labels * p) / math.sqrt(short_labels * p * (1 - p))
+
+    def stats(self):
+        encoded, voided, retried = self.long
+        labels = encoded + voided
+        short_labels = self.short[0] + self.short[1]
+        return PrinterWindowStats(
+            self.printer, labels, voided, retried,
+            voided / labels if labels else 0.0,
+            self.short[1] / short_labels if short_labels else 0.0,
+            self.trend_z(),
+            labels * 60.0 / LONG_WINDOW_S,
+            retried / labels if labels else 0.0)
+
+
+_KIND_INDEX = {ENCODED: 0, VOIDED: 1, RETRIED: 2}
+
+
+class PrinterStats:
+    def __init__(self, alerts=None):
+        """alerts: anything with raise_alert(key, message) / clear_alert(key), e.g. DashboardMetrics"""
+        self.alerts = alerts
+        self.windows = {}
+        self._lock = threading.Lock()
+        self._production_log = None
+
+    def watch(self, production_log):
+        self._production_log = production_log
+        production_log.register_for_events(self.on_production_events)
+
+    def unwatch(self):
+        if self._production_log is not None:
+            self._production_log.unregister_for_events(self.on_production_events)
+
+    def on_production_events(self, events):
+        touched = set()
+        with self._lock:
+            windows = self.windows
+            for event in events:
+                kind = _KIND_INDEX.get(event.kind)
+                if kind is None:
+                    continue
+                window = windows.get(event.printer)
+                if window is None:
+                    window = windows[event.printer] = PrinterWindow(event.printer)
+                window.add(event.ts, kind)
+                touched.add(window)
+            # Thresholds are checked once per committed group, not per label
+            for window in touched:
+                self._check(window)
+
+    def _check(self, window):
+        stats = window.stats()
+        enough = stats.labels >= MIN_LABELS
+        self._set_alert(window, "void_rate",
+                        enough and stats.void_rate > VOID_RATE_ALERT,
+                        not enough or stats.void_rate < VOID_RATE_CLEAR,
+                        f"{window.printer}: void rate {stats.void_rate:.1%} over the last "
+                        f"{LONG_WINDOW_S // 60} min - check calibration")
+        trending = (enough and window.short[1] >= TREND_MIN_VOIDS and stats.short_void_rate >= TREND_MIN_RATE
+                    and stats.void_trend_z > TREND_Z_ALERT)
+        self._set_alert(window, "void_trend", trending, stats.void_trend_z < TREND_Z_CLEAR,
+                        f"{window.printer}: voids rising ({stats.short_void_rate:.1%} in the last minute "
+                        f"vs {stats.void_rate:.1%}) - possible bad roll or calibration drift")
+        self._set_alert(window, "retry_rate",
+                        enough and stats.retry_rate > RETRY_RATE_ALERT,
+                        not enough or stats.retry_rate < RETRY_RATE_CLEAR,
+                        f"{window.printer}: {stats.retry_rate:.1%} of labels needed an encode retry")
+
+    def _set_alert(self, window, name, raise_it, clear_it, message):
+        key = f"printer:{window.printer}:{name}"
+        if raise_it and name not in window.alerts:
+            window.alerts.add(name)
+            log.warning("printer alert: %s", message)
+            if self.alerts is not None:
+                self.alerts.raise_alert(key, message)
+        elif clear_it and name in window.alerts:
+            window.alerts.discard(name)
+            if self.alerts is not None:
+                self.alerts.clear_alert(key)
+
+    def snapshot(self):
+        with self._lock:
+            return {printer: window.stats() for printer, window in sorted(self.windows.items())}
+
+
+if __name__ == '__main__':
+    # Replay a production event stream faster than real time and print the alerts it raises:
+    #   python -m core.printer_stats                   synthetic 8-printer shift, ZT411-3 drifting out of calibration
+    #   python -m core.printer_stats PRODUCTION_DIR    a recorded production log
+    import sys
+    import time
+
+    from core.production_log import ProductionEvent, read_events
+
+    class PrintingAlerts:
+        def __init__(self):
+            self.active = {}
+            self.event_ts = 0.0
+
+        def raise_alert(self, key, message):
+            self.active[key] = message
+            print(f"  +{self.event_ts - start_ts:7.0f}s  ALERT  {message}")
+
+        def clear_alert(self, key):
+            print(f"  +{self.event_ts - start_ts:7.0f}s  clear  {self.active.pop(key)}")
+
+    def synthetic_shift(hours=2.0, rate_per_printer=1.5):
+        # Each printer labels ~1.5/s with ~1% voids. ZT411-3 drifts out of calibration from 40 min until it is
+        # recalibrated at 75 min, ZT411-5 runs a bad roll (20% voids) for 3 minutes at 60 min and ZT411-6
+        # needs many encode retries from 80 min
+        import random
+        rng = random.Random(3)
+        t0 = 1_700_000_000.0
+        step = 1.0 / (rate_per_printer * 8)
+        for i in range(int(hours * 3600 / step)):
+            ts = t0 + i * step
+            printer = f"ZT411-{i % 8 + 1}"
+            minutes = (ts - t0) / 60
+            void_p = 0.01
+            if printer == "ZT411-3" and minutes > 40:
+                void_p = min(0.25, 0.01 + (minutes - 40) * 0.004)
+            if printer == "ZT411-3" and minutes > 75:
+                void_p = 0.01
+            if printer == "ZT411-5" and 60 < minutes < 63:
+                void_p = 0.2
+            if printer == "ZT411-6" and minutes > 80 and rng.random() < 0.2:
+                yield ProductionEvent(ts, RETRIED, printer, 1, i, b"")
+            yield ProductionEvent(ts, VOIDED if rng.random() < void_p else ENCODED, printer, 1, i, b"")
+
+    logging.disable(logging.WARNING)  # alerts are printed below
+    events = list(read_events(sys.argv[1])) if len(sys.argv) > 1 else list(synthetic_shift())
+    if not events:
+        sys.exit("no events")
+    start_ts = events[0].ts
+    sink = PrintingAlerts()
+    stats = PrinterStats(sink)
+    print(f"replaying {len(events):,} events spanning {(events[-1].ts - start_ts) / 3600:.1f} h")
+    started = time.perf_counter()
+    for first in range(0, len(events), 256):
+        group = events[first:first + 256]  # ~ one group commit
+        sink.event_ts = group[-1].ts
+        stats.on_production_events(group)
+    elapsed = time.perf_counter() - started
+    print(f"replayed in {elapsed:.2f}s ({(events[-1].ts - start_ts) / elapsed:,.0f}x real time, "
+          f"{elapsed / len(events) * 1e9:.0f} ns/event)")
+    for printer_stats in stats.snapshot().values():
+        print(f"  {printer_stats.printer:<10} {printer_stats.labels_per_minute:6.1f} labels/min  "
+              f"void {printer_stats.void_rate:5.1%}  retries {printer_stats.retry_rate:5.1%}")
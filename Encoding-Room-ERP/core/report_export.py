@@ -0,0 +1,373 @@
+import logging
+import os
+import time
+from collections import namedtuple
+from datetime import datetime, time as dt_time, timedelta
+
+import numpy as np
+
+from core.checklist import completed_job_ids
+from core.epc_data_file import StaleDataError, job_data_path, open_job_data
+from core.production_log import EVENT_KINDS, read_segment, segment_paths
+
+# Streaming report extracts (one row per tag / per production event) for finance
+# and customers, written as Parquet (zstd, dictionary-encoded) or XLSX.
+#
+#   tags        every tag of the selected jobs, read from their memory-mapped
+#               EPC data files (fully vectorized)
+#   production  every production event (encoded / voided / retried) in a period,
+#               from the production log
+#
+# Sources yield Arrow record batches of at most `batch_rows` rows; sinks write
+# each batch and drop it, so memory stays constant whatever the row count.
+# XLSX goes through xlsxwriter's constant_memory mode and continues on a new
+# sheet every 1,048,575 rows. Files are written to PATH.tmp and renamed when
+# complete. pyarrow (and xlsxwriter for XLSX) are only imported by exports.
+
+log = logging.getLogger(__name__)
+
+REPORT_KINDS = ("tags", "production")
+REPORT_FORMATS = ("parquet", "xlsx")
+DEFAULT_BATCH_ROWS = 131072
+XLSX_SHEET_ROWS = 1_048_575  # data rows per sheet, under the header
+XLSX_SLICE_ROWS = 4096
+
+_EVENT_FRAME_BYTES = 6 + 22  # production_log frame + fixed event fields
+
+JOB_COLUMNS = ("job_ticket", "customer", "customer_po", "part_number")
+
+ReportResult = namedtuple("ReportResult", "path rows elapsed skipped")
+
+
+def _arrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("report export needs pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+def report_schema(kind):
+    pa = _arrow()
+    job_fields = [pa.field(name, pa.dictionary(pa.int32(), pa.string())) for name in JOB_COLUMNS]
+    if kind == "tags":
+        return pa.schema([pa.field("job_id", pa.int64())] + job_fields + [
+            pa.field("tag", pa.int64()), pa.field("roll", pa.int32()), pa.field("epc", pa.string())])
+    if kind == "production":
+        return pa.schema([pa.field("ts", pa.timestamp("ms", tz="UTC")),
+                          pa.field("event", pa.dictionary(pa.int8(), pa.string())),
+                          pa.field("printer", pa.dictionary(pa.int32(), pa.string())),
+                          pa.field("job_id", pa.int64())] + job_fields + [
+                          pa.field("tag", pa.int64()), pa.field("epc", pa.string())])
+    raise ValueError(f"unknown report {kind!r} (expected one of {', '.join(REPORT_KINDS)})")
+
+
+def _hex_strings(epcs, lengths=None):
+    """(N, W) uint8, or EPCs of any length concatenated (bytes) with their `lengths` -> Arrow string array of
+    uppercase hex, without a Python string per row"""
+    pa = _arrow()
+    if lengths is None:
+        epcs = np.ascontiguousarray(epcs)
+        lengths = np.full(epcs.shape[0], epcs.shape[1], dtype=np.int64)
+        epcs = epcs.tobytes()
+    lengths = np.asarray(lengths, dtype=np.int64)
+    text = bytes(epcs).hex().upper().encode("ascii")
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths * 2, out=offsets[1:])
+    return pa.StringArray.from_buffers(len(lengths), pa.py_buffer(offsets.astype(np.int32)), pa.py_buffer(text))
+
+
+def _dictionary(indices, values, index_type=np.int32):
+    pa = _arrow()
+    return pa.DictionaryArray.from_arrays(pa.array(np.asarray(indices, dtype=index_type)),
+                                          pa.array(values, type=pa.string()))
+
+
+def _job_fields(store, job_ids):
+    """{job_id: (job_ticket, customer, customer_po, part_number)}; unknown jobs get blanks"""
+    fields = {}
+    for job_id in job_ids:
+        job = store.get_job(int(job_id))
+        fields[int(job_id)] = tuple((getattr(job, name) or "") if job else "" for name in JOB_COLUMNS)
+    return fields
+
+
+# -- sources -------------------------------------------------------------------
+
+class TagSource:
+    """One row per tag of each selected job that has an EPC data file
+
+    Data files are opened one at a time while batches() streams them and closed again when the job is done,
+    the export fails or is cancelled; until then only the job records are loaded.
+    """
+
+    def __init__(self, store, job_ids, batch_rows=DEFAULT_BATCH_ROWS):
+        self.store = store
+        self.batch_rows = batch_rows
+        self.jobs = []
+        self.skipped = []
+        for job_id in job_ids:
+            job = store.get_job(int(job_id))
+            if job is None or not os.path.exists(job_data_path(job.job_id)):
+                self.skipped.append(job_id)
+            else:
+                self.jobs.append(job)
+        # A current data file has one tag per serial; stale ones turn up (and are skipped) while streaming
+        self.total_rows = sum(max(0, job.end_serial - job.start_serial + 1) for job in self.jobs)
+
+    def batches(self):
+        pa = _arrow()
+        schema = report_schema("tags")
+        for job in self.jobs:
+            try:
+                data_file = open_job_data(job)
+            except StaleDataError as error:
+                log.warning("job %s skipped: %s", job.job_id, error)
+                data_file = None
+            if data_file is None:
+                self.skipped.append(job.job_id)
+                continue
+            fields = tuple(getattr(job, name) or "" for name in JOB_COLUMNS)
+            try:
+                for start in range(0, len(data_file), self.batch_rows):
+                    stop = min(start + self.batch_rows, len(data_file))
+                    n = stop - start
+                    tags = np.arange(start, stop, dtype=np.int64)
+                    rolls = np.searchsorted(data_file.offsets, tags, side="right").astype(np.int32)
+                    constant = np.zeros(n, dtype=np.int32)
+                    yield pa.record_batch(
+                        [pa.array(np.full(n, data_file.job_id, dtype=np.int64))]
+                        + [_dictionary(constant, [value]) for value in fields]
+                        + [pa.array(tags + 1), pa.array(rolls), _hex_strings(data_file.epcs[start:stop])],
+                        schema=schema), stop - start
+            finally:
+                data_file.close()
+
+    def progress(self, rows):
+        return rows / self.total_rows if self.total_rows else 1.0
+
+
+class ProductionSource:
+    """One row per production event with since <= ts < until, optionally only for some jobs"""
+
+    def __init__(self, store, since=None, until=None, job_ids=None, directory=None, batch_rows=DEFAULT_BATCH_ROWS):
+        self.store = store
+        self.since = since
+        self.until = until
+        self.job_ids = set(job_ids) if job_ids else None
+        self.batch_rows = batch_rows
+        self.paths = segment_paths(directory, since)
+        self.segment_bytes = [os.path.getsize(path) for path in self.paths]
+        self.skipped = []
+        self._bytes_done = 0
+        self._total_bytes = sum(self.segment_bytes)
+
+    def _events(self):
+        since, until, job_ids = self.since, self.until, self.job_ids
+        done = 0
+        for path, size in zip(self.paths, self.segment_bytes):
+            for event in read_segment(path):
+                # Approximate position inside the segment: frame header + event header + EPC
+                self._bytes_done += _EVENT_FRAME_BYTES + len(event.epc)
+                if (since is None or event.ts >= since) and (until is None or event.ts < until) and \
+                        (job_ids is None or event.job_id in job_ids):
+                    yield event
+            done += size
+            self._bytes_done = done
+
+    def batches(self):
+        pending = []
+        for event in self._events():
+            pending.append(event)
+            if len(pending) >= self.batch_rows:
+                yield self._batch(pending), len(pending)
+                pending = []
+        if pending:
+            yield self._batch(pending), len(pending)
+
+    def _batch(self, events):
+        pa = _arrow()
+        ts, kinds, printers, job_ids, tags, epcs = zip(*events)
+        job_ids = np.asarray(job_ids, dtype=np.int64)
+        unique_jobs, job_index = np.unique(job_ids, return_inverse=True)
+        jobs = _job_fields(self.store, unique_jobs)
+        printer_names, printer_index = np.unique(np.asarray(printers, dtype=object), return_inverse=True)
+        kind_codes = sorted(EVENT_KINDS)
+        return pa.record_batch(
+            [pa.array((np.asarray(ts) * 1000).astype(np.int64), type=pa.timestamp("ms", tz="UTC")),
+             _dictionary(np.searchsorted(kind_codes, kinds), [EVENT_KINDS[code] for code in kind_codes], np.int8),
+             _dictionary(printer_index, list(printer_names)),
+             pa.array(job_ids)]
+            + [_dictionary(job_index, [jobs[int(job_id)][column] for job_id in unique_jobs])
+               for column in range(len(JOB_COLUMNS))]
+            + [pa.array(np.asarray(tags, dtype=np.int64) + 1),
+               _hex_strings(b"".join(epcs), [len(epc) for epc in epcs])],
+            schema=report_schema("production"))
+
+    def progress(self, rows):
+        return min(1.0, self._bytes_done / self._total_bytes) if self._total_bytes else 1.0
+
+
+# -- sinks ---------------------------------------------------------------------
+
+class ParquetSink:
+    def __init__(self, path, schema, compression="zstd"):
+        import pyarrow.parquet as pq
+        self.path = path
+        self._writer = pq.ParquetWriter(path + ".tmp", schema, compression=compression, use_dictionary=True)
+
+    def write(self, batch):
+        self._writer.write_batch(batch)
+
+    def close(self):
+        self._writer.close()
+        os.replace(self.path + ".tmp", self.path)
+
+    def abort(self):
+        self._writer.close()
+        os.remove(self.path + ".tmp")
+
+
+class XlsxSink:
+    def __init__(self, path, schema):
+        try:
+            import xlsxwriter
+        except ImportError:
+            raise ImportError("XLSX export needs xlsxwriter (pip install xlsxwriter)") from None
+        self.path = path
+        self.schema = schema
+        self._workbook = xlsxwriter.Workbook(path + ".tmp", {
+            "constant_memory": True, "default_date_format": "yyyy-mm-dd hh:mm:ss", "strings_to_numbers": False})
+        self._header_format = self._workbook.add_format({"bold": True})
+        self._timestamps = [i for i, field in enumerate(schema) if str(field.type).startswith("timestamp")]
+        self._sheet = None
+        self._row = XLSX_SHEET_ROWS
+
+    def _new_sheet(self):
+        self._sheet = self._workbook.add_worksheet(f"Report {len(self._workbook.worksheets()) + 1}")
+        self._sheet.write_row(0, 0, self.schema.names, self._header_format)
+        self._sheet.freeze_panes(1, 0)
+        self._row = 0
+
+    def write(self, batch):
+        # Rows only exist as Python objects one slice at a time
+        for offset in range(0, batch.num_rows, XLSX_SLICE_ROWS):
+            columns = [column.to_pylist() for column in batch.slice(offset, XLSX_SLICE_ROWS).columns]
+            for index in self._timestamps:
+                # Excel has no time zones: write local wall-clock time
+                columns[index] = [datetime.fromtimestamp(value.timestamp()) if value else None
+                                  for value in columns[index]]
+            write_row = self._sheet.write_row if self._sheet is not None else None
+            for row in zip(*columns):
+                if self._row >= XLSX_SHEET_ROWS:
+                    self._new_sheet()
+                    write_row = self._sheet.write_row
+                self._row += 1
+                write_row(self._row, 0, row)
+
+    def close(self):
+        if self._sheet is None:
+            self._new_sheet()
+        self._workbook.close()
+        os.replace(self.path + ".tmp", self.path)
+
+    def abort(self):
+        self._workbook.close()
+        os.remove(self.path + ".tmp")
+
+
+def report_source(store, kind, first_day=None, last_day=None, job_ids=None, batch_rows=DEFAULT_BATCH_ROWS):
+    """Source for a report over a date range (inclusive, local days) and/or a list of jobs;
+    a tag report without job ids covers the jobs completed in the range"""
+    if kind == "tags":
+        if not job_ids:
+            if first_day is None or last_day is None:
+                raise ValueError("a tag report needs job ids or a date range")
+            job_ids = completed_job_ids(store, first_day, last_day)
+        return TagSource(store, job_ids, batch_rows)
+    if kind == "production":
+        since = _day_start(first_day) if first_day is not None else None
+        until = _day_start(last_day + timedelta(days=1)) if last_day is not None else None
+        return ProductionSource(store, since, until, job_ids, batch_rows=batch_rows)
+    raise ValueError(f"unknown report {kind!r} (expected one of {', '.join(REPORT_KINDS)})")
+
+
+def _day_start(day):
+    return datetime.combine(day, dt_time()).timestamp()
+
+
+def export_report(source, path, fmt="parquet", kind=None, progress=None, cancelled=None):
+    """Stream `source` (TagSource / ProductionSource) into `path`; progress(rows, fraction) after every batch"""
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"unknown report format {fmt!r} (expected one of {', '.join(REPORT_FORMATS)})")
+    kind = kind or ("tags" if isinstance(source, TagSource) else "production")
+    schema = report_schema(kind)
+    started = time.perf_counter()
+    sink = ParquetSink(path, schema) if fmt == "parquet" else XlsxSink(path, schema)
+    rows = 0
+    batches = source.batches()
+    try:
+        for batch, count in batches:
+            if cancelled is not None and cancelled():
+                raise InterruptedError("export cancelled")
+            sink.write(batch)
+            rows += count
+            if progress is not None:
+                progress(rows, min(1.0, source.progress(rows)))
+    except BaseException:
+        sink.abort()
+        raise
+    finally:
+        batches.close()  # closes whatever the source still has open
+    sink.close()
+    return ReportResult(path, rows, time.perf_counter() - started, source.skipped)
+
+
+if __name__ == '__main__':
+    # Throughput and peak memory of both formats: python -m core.report_export [tags] [events]
+    import resource
+    import sys
+    import tempfile
+
+    from core import config
+    from core.epc_data_file import generate_job_data
+    from core.job_records import JobRecord
+    from core.production_log import ENCODED, VOIDED, ProductionLog
+
+    class _Store:
+        def __init__(self, jobs):
+            self.jobs = {job.job_id: job for job in jobs}
+
+        def get_job(self, job_id):
+            return self.jobs.get(job_id)
+
+    tags = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+    workdir = tempfile.mkdtemp(prefix="erp-report-")
+    config.DATA_DIR = workdir
+
+    job_ids = [100 * (i + 1) for i in range(4)]
+    store = _Store(JobRecord(job_id=job_id, job_ticket=f"JT-{job_id}", customer="Acme Apparel",
+                             customer_po=f"PO-{job_id // 100}", part_number="RF-4x2", upc="614141812345",
+                             start_serial=job_id * 10_000_000,
+                             end_serial=job_id * 10_000_000 + tags // len(job_ids) - 1, lpr=2000)
+                   for job_id in job_ids)
+    for job_id in job_ids:
+        generate_job_data(store.get_job(job_id))
+    production = ProductionLog(os.path.join(workdir, "production"))
+    epc = bytes.fromhex("3034257BF7194E4000001A85")
+    for first in range(0, events, 10_000):
+        production.append_many([(VOIDED if i % 97 == 0 else ENCODED, f"ZT411-{i % 6 + 1}", job_ids[i % 4], i, epc,
+                                  1_700_000_000 + i * 0.05) for i in range(first, min(events, first + 10_000))])
+    production.close()
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    for name, source_factory, formats in (
+            ("tags", lambda: TagSource(store, job_ids), ("parquet",)),
+            ("production", lambda: ProductionSource(store, directory=production.directory), ("parquet", "xlsx"))):
+        for fmt in formats:
+            path = os.path.join(workdir, f"{name}.{fmt}")
+            result = export_report(source_factory(), path, fmt)
+            print(f"{name:<10} {fmt:<8} {result.rows:>12,} rows in {result.elapsed:6.1f}s "
+                  f"({result.rows / result.elapsed:>10,.0f} rows/s), {os.path.getsize(path) / 2**20:7.1f} MiB")
+    print(f"peak RSS growth during the exports: {(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024:.0f} MiB")
@@ -0,0 +1,482 @@
+import json
+import math
+import time
+from collections import namedtuple
+from datetime import date
+
+from core import config
+from core.job_records import to_ordinal
+
+# Job-to-printer scheduling.
+#
+# Objective: minimize total weighted completion time (sum of weight x finish time,
+# in minutes from now) over all open jobs; urgent jobs get a larger weight so they
+# are pulled forward. A job's time on a printer is its labels at the printer's
+# speed plus roll changes, plus a sequence-dependent changeover when the label
+# stock (size / inlay) or ribbon differs from what is loaded before it.
+#
+# plan() builds a schedule with weighted-shortest-processing-time list scheduling
+# (each job goes where it finishes first) and then improves it by local search:
+# every job is taken out and re-inserted at its best position on any printer.
+# Insertion cost is O(1) per position from each printer's finish times and
+# suffix weights (cached per printer until its sequence changes), so a full pass
+# is O(n^2) and 200 jobs x 10 printers plan in ~0.3 s (~0.4 s with roll
+# splitting). add_job / remove_job / printer_down / printer_up re-plan
+# incrementally from the current schedule instead of starting over.
+#
+# Jobs are split at roll boundaries: split() moves some of a job's rolls to
+# another printer when that lowers the total cost (a large job finishes sooner on
+# two printers). A split job is done when its last part is, so its parts are
+# costed exactly (the latest finish among them) and the O(1) insertion cost
+# counts each part at its job's full weight, an upper bound that keeps the job
+# moves of improve() from ever raising the cost. Split jobs are not moved by
+# improve(); plan() and the re-plans alternate the two searches.
+
+SchedJob = namedtuple("SchedJob", "job_id labels rolls label_size inlay_type ribbon weight")
+Assignment = namedtuple("Assignment", "printer job_id start end changeover first_roll rolls")
+
+STOCK_CHANGE_MIN = 15.0    # label size or inlay type differs
+RIBBON_CHANGE_MIN = 5.0
+ROLL_CHANGE_MIN = 1.5
+URGENT_WEIGHT = 5.0
+IMPROVE_ROUNDS = 10
+SPLIT_MIN_GAIN = 0.001  # split passes stop once a pass lowers the cost by less than this fraction
+
+
+class Printer:
+    """A printer's capabilities and the stock currently loaded"""
+    __slots__ = ("name", "labels_per_minute", "label_sizes", "label_size", "inlay_type", "ribbon",
+                 "roll_change_min", "up")
+
+    def __init__(self, name, labels_per_minute, label_sizes=None, label_size="", inlay_type="", ribbon="",
+                 roll_change_min=ROLL_CHANGE_MIN, up=True):
+        self.name = name
+        self.labels_per_minute = labels_per_minute
+        self.label_sizes = set(label_sizes) if label_sizes else None  # None: any size
+        self.label_size = label_size
+        self.inlay_type = inlay_type
+        self.ribbon = ribbon
+        self.roll_change_min = roll_change_min
+        self.up = up
+
+    def can_print(self, job):
+        return self.up and (self.label_sizes is None or job.label_size in self.label_sizes)
+
+    def run_minutes(self, job):
+        return job.labels / self.labels_per_minute + job.rolls * self.roll_change_min
+
+
+def changeover(before, job):
+    """Minutes to go from `before` (a SchedJob or the Printer's loaded stock) to `job`"""
+    minutes = 0.0
+    if before.label_size != job.label_size or before.inlay_type != job.inlay_type:
+        minutes += STOCK_CHANGE_MIN
+    if before.ribbon != job.ribbon:
+        minutes += RIBBON_CHANGE_MIN
+    return minutes
+
+
+def load_printers(path=None):
+    """Printer setup from printers.json: [{"name": ..., "labels_per_minute": ..., "label_sizes": [...], ...}]"""
+    with open(path or config.data_path("printers.json")) as handle:
+        return [Printer(**entry) for entry in json.load(handle)]
+
+
+def jobs_from_records(records, today=None, urgent_days=1, urgent_weight=URGENT_WEIGHT):
+    """SchedJobs for open JobRecords; jobs due within `urgent_days` are urgent"""
+    today = (today or date.today()).toordinal()
+    jobs = []
+    for record in records:
+        labels = record.qty + record.qty * record.overage // 100
+        rolls = record.rolls or (math.ceil(labels / record.lpr) if record.lpr else 1)
+        due = to_ordinal(record.due_date)
+        weight = urgent_weight if due and due - today <= urgent_days else 1.0
+        jobs.append(SchedJob(record.job_id, labels, rolls, record.label_size, record.inlay_type, record.ribbon,
+                             weight))
+    return jobs
+
+
+class Scheduler:
+    """Assigns jobs, or parts of them at roll boundaries, to printers and orders each printer's queue"""
+    def __init__(self, printers, jobs=()):
+        self.printers = {printer.name: printer for printer in printers}
+        self.jobs = {job.job_id: job for job in jobs}
+        self.sequences = {name: [] for name in self.printers}
+        self.shares = {}  # job_id -> {printer: rolls} for jobs split across printers, in roll order
+        self.pinned = {}  # job_id -> printers it is already running on (kept first there)
+        self.unassigned = []  # jobs no printer that is up can print
+        self._timelines = {}
+
+    # -- cost model --------------------------------------------------------
+
+    def _part(self, job_id, name):
+        """The job, or for a split job the share of its rolls (and labels) on printer `name`"""
+        job = self.jobs[job_id]
+        shares = self.shares.get(job_id)
+        if shares is None:
+            return job
+        rolls = shares[name]
+        return job._replace(labels=job.labels * rolls / job.rolls, rolls=rolls)
+
+    def _pinned_on(self, job_id, name):
+        return name in self.pinned.get(job_id, ())
+
+    def _timeline(self, name):
+        """Finish times and suffix weight sums for a printer's sequence (cached until the sequence changes).
+        The cost covers whole jobs only; `ends` holds the finish of each split job's part here."""
+        timeline = self._timelines.get(name)
+        if timeline is not None:
+            return timeline
+        printer = self.printers[name]
+        shares = self.shares
+        jobs = [self._part(job_id, name) if job_id in shares else self.jobs[job_id]
+                for job_id in self.sequences[name]]
+        finish, before, now = [], printer, 0.0
+        for job in jobs:
+            now += changeover(before, job) + printer.run_minutes(job)
+            finish.append(now)
+            before = job
+        suffix = [0.0] * (len(jobs) + 1)
+        for index in range(len(jobs) - 1, -1, -1):
+            suffix[index] = suffix[index + 1] + jobs[index].weight
+        cost, ends = 0.0, {}
+        for job, end in zip(jobs, finish):
+            if job.job_id in shares:
+                ends[job.job_id] = end
+            else:
+                cost += job.weight * end
+        timeline = self._timelines[name] = (jobs, finish, suffix, cost, ends)
+        return timeline
+
+    def _changed(self, name):
+        self._timelines.pop(name, None)
+
+    def cost(self):
+        """Total weighted completion time (minutes); a split job completes with its last part"""
+        return sum(self._timeline(name)[3] for name in self.printers) + self._split_terms(self.shares)
+
+    def makespan(self):
+        return max((self._timeline(name)[1][-1] for name in self.printers if self.sequences[name]), default=0.0)
+
+    def _best_insertion(self, job, names=None):
+        """(extra cost, printer, position) of the cheapest place for `job`, on any printer or one of `names`"""
+        best = (math.inf, None, None)
+        for name in names or self.printers:
+            printer = self.printers[name]
+            if not printer.can_print(job):
+                continue
+            jobs, finish, suffix, _, _ = self._timeline(name)
+            run = printer.run_minutes(job)
+            first = 1 if jobs and self._pinned_on(jobs[0].job_id, name) else 0
+            before, start = (jobs[first - 1], finish[first - 1]) if first else (printer, 0.0)
+            for position in range(first, len(jobs) + 1):
+                into = changeover(before, job)
+                added = into + run
+                if position < len(jobs):
+                    following = jobs[position]
+                    added += changeover(job, following) - changeover(before, following)
+                delta = job.weight * (start + into + run) + added * suffix[position]
+                if delta < best[0]:
+                    best = (delta, name, position)
+                if position < len(jobs):
+                    before, start = jobs[position], finish[position]
+        return best
+
+    def _insert(self, job):
+        delta, name, position = self._best_insertion(job)
+        if name is None:
+            self.unassigned.append(job.job_id)
+            return None
+        self.sequences[name].insert(position, job.job_id)
+        self._changed(name)
+        return name
+
+    # -- planning ----------------------------------------------------------
+
+    def plan(self, rounds=IMPROVE_ROUNDS, split=True):
+        """Full plan from scratch (running jobs stay where they are); split=False keeps every job whole"""
+        self.shares = {job_id: shares for job_id, shares in self.shares.items() if job_id in self.pinned}
+        self.sequences = {name: [job_id for job_id, names in self.pinned.items() if name in names]
+                          for name in self.printers}
+        self._timelines = {}
+        self.unassigned = []
+        speed = sum(printer.labels_per_minute for printer in self.printers.values()) / max(1, len(self.printers))
+        pending = [job for job in self.jobs.values() if job.job_id not in self.pinned]
+        pending.sort(key=lambda job: (job.labels / speed) / job.weight)  # WSPT
+        for job in pending:
+            self._insert(job)
+        self.improve(rounds)
+        if split:
+            self.split(rounds)
+        return self.schedule()
+
+    def improve(self, rounds=IMPROVE_ROUNDS):
+        """Local search: move single (whole) jobs to their best position while that lowers the cost"""
+        for _ in range(rounds):
+            moved = False
+            for name in list(self.printers):
+                for job_id in list(self.sequences[name]):
+                    if job_id in self.pinned or job_id in self.shares or job_id not in self.sequences[name]:
+                        continue
+                    position = self.sequences[name].index(job_id)
+                    before_timeline = self._timeline(name)
+                    self.sequences[name].pop(position)
+                    self._changed(name)
+                    gain = before_timeline[3] - self._timeline(name)[3]
+                    delta, best_name, best_position = self._best_insertion(self.jobs[job_id])
+                    if best_name is not None and delta < gain - 1e-6:
+                        self.sequences[best_name].insert(best_position, job_id)
+                        self._changed(best_name)
+                        moved = True
+                    else:
+                        self.sequences[name].insert(position, job_id)
+                        self._timelines[name] = before_timeline
+            if not moved:
+                break
+
+    def split(self, rounds=IMPROVE_ROUNDS):
+        """Local search over rolls: move some of a job's rolls to another printer while that lowers the cost,
+        then re-run improve() for the whole jobs if anything was split"""
+        cost = self.cost()
+        moved = False
+        for _ in range(rounds):
+            before = cost
+            where = {job_id: name for name, sequence in self.sequences.items() for job_id in sequence}
+            for job_id, name in where.items():
+                if job_id not in self.pinned and (job_id in self.shares or self.jobs[job_id].rolls > 1):
+                    cost = self._split_job(job_id, name, cost)
+            moved = moved or cost < before
+            if before - cost <= before * SPLIT_MIN_GAIN:
+                break
+        if moved:
+            self.improve(rounds)
+
+    def _split_job(self, job_id, name, cost):
+        """Apply the best split of one of the job's parts (the job is on printer `name`) onto a printer that
+        has none of it, if any lowers `cost` (the current one); returns the new cost. Per target printer the
+        new part goes where half of the part would, and takes the rolls that make both parts finish together."""
+        job = self.jobs[job_id]
+        holders = list(self.shares.get(job_id) or [name])
+        best_cost, best = cost - 1e-6, None
+        for source in holders:
+            part = self._part(job_id, source)
+            if part.rolls < 2:
+                continue
+            source_printer = self.printers[source]
+            source_end = self._timeline(source)[1][self.sequences[source].index(job_id)]
+            source_roll = part.labels / part.rolls / source_printer.labels_per_minute + source_printer.roll_change_min
+            half = part._replace(labels=part.labels / 2, rolls=part.rolls / 2)
+            for target, printer in self.printers.items():
+                if target in holders or not printer.can_print(job):
+                    continue
+                target_roll = part.labels / part.rolls / printer.labels_per_minute + printer.roll_change_min
+                if source_end < source_roll + target_roll:
+                    continue  # even at the front of the target, no roll would finish before the source's
+                _, _, position = self._best_insertion(half, [target])
+                jobs, finish, _, _, _ = self._timeline(target)
+                before, start = (jobs[position - 1], finish[position - 1]) if position else (printer, 0.0)
+                start += changeover(before, job)
+                balanced = (source_end - start) / (source_roll + target_roll)
+                if balanced < 0.5:
+                    continue
+                rolls = min(part.rolls - 1, max(1, round(balanced)))
+                candidate = self._split_cost(job_id, source, target, rolls, position, cost)
+                if candidate < best_cost:
+                    best_cost, best = candidate, (source, target, rolls, position)
+        if best is None:
+            return cost
+        self._move_rolls(job_id, *best)
+        return best_cost
+
+    def _move_rolls(self, job_id, source, target, rolls, position):
+        """Move `rolls` of the job's part on `source` to a new part at `position` on `target`"""
+        shares = self.shares.setdefault(job_id, {source: self.jobs[job_id].rolls})
+        shares[source] -= rolls
+        shares[target] = rolls
+        self.sequences[target].insert(position, job_id)
+        self._changed(source)
+        self._changed(target)
+
+    def _split_cost(self, job_id, source, target, rolls, position, cost):
+        """cost() after _move_rolls(...), from the current `cost` and the two printers' timelines only,
+        leaving the schedule as it was"""
+        saved = {name: self._timelines.get(name) for name in (source, target)}
+        old = [self._timeline(name) for name in (source, target)]
+        affected = {job_id}.union(old[0][4], old[1][4])
+        was_split = job_id in self.shares
+        cost -= old[0][3] + old[1][3] + self._split_terms(affected)
+        self._move_rolls(job_id, source, target, rolls, position)
+        try:
+            return cost + self._timeline(source)[3] + self._timeline(target)[3] + self._split_terms(affected)
+        finally:
+            self.sequences[target].pop(position)
+            shares = self.shares[job_id]
+            shares[source] += shares.pop(target)
+            if not was_split:
+                del self.shares[job_id]
+            for name, timeline in saved.items():
+                if timeline is None:
+                    self._changed(name)
+                else:
+                    self._timelines[name] = timeline
+
+    def _split_terms(self, job_ids):
+        """The part of cost() owed to those of `job_ids` that are split"""
+        return sum(self.jobs[job_id].weight * max(self._timeline(name)[4][job_id] for name in self.shares[job_id])
+                   for job_id in job_ids if job_id in self.shares)
+
+    def add_job(self, job):
+        self.jobs[job.job_id] = job
+        return self._insert(job)
+
+    def remove_job(self, job_id):
+        """A job finished or was cancelled"""
+        self.jobs.pop(job_id, None)
+        self.pinned.pop(job_id, None)
+        self.shares.pop(job_id, None)
+        for name, sequence in self.sequences.items():
+            if job_id in sequence:
+                sequence.remove(job_id)
+                self._changed(name)
+        if job_id in self.unassigned:
+            self.unassigned.remove(job_id)
+
+    def start_job(self, job_id):
+        """The job started on its planned printer (every printer with a part of it); it stays there.
+        Returns the printer of its first rolls."""
+        started = []
+        for name, sequence in self.sequences.items():
+            if job_id in sequence:
+                sequence.remove(job_id)
+                first = 1 if sequence and self._pinned_on(sequence[0], name) else 0
+                sequence.insert(first, job_id)
+                self._changed(name)
+                self.pinned.setdefault(job_id, set()).add(name)
+                started.append(name)
+        if not started:
+            return None
+        return next(iter(self.shares[job_id])) if job_id in self.shares else started[0]
+
+    def printer_down(self, name, rounds=2):
+        printer = self.printers[name]
+        printer.up = False
+        displaced = []
+        for job_id in self.sequences[name]:
+            shares = self.shares.get(job_id)
+            if shares is None:
+                displaced.append(self.jobs[job_id])
+                self.pinned.pop(job_id, None)
+                continue
+            # A split job's rolls on this printer go to its next part
+            rolls = shares.pop(name)
+            shares[next(iter(shares))] += rolls
+            if len(shares) == 1:
+                del self.shares[job_id]
+            for holder in shares:
+                self._changed(holder)
+            if job_id in self.pinned:
+                self.pinned[job_id].discard(name)
+        self.sequences[name] = []
+        self._changed(name)
+        for job in sorted(displaced, key=lambda job: job.labels / job.weight):
+            self._insert(job)
+        self.improve(rounds)
+        self.split(rounds)
+
+    def printer_up(self, name, rounds=2):
+        self.printers[name].up = True
+        waiting, self.unassigned = [self.jobs[job_id] for job_id in self.unassigned], []
+        for job in waiting:
+            self._insert(job)
+        self.improve(rounds)
+        self.split(rounds)
+
+    def schedule(self):
+        """Assignments in printer order; first_roll (1-based) and rolls say which of the job's rolls each
+        part prints"""
+        first_rolls = {}
+        for job_id, shares in self.shares.items():
+            first = 1
+            for name, rolls in shares.items():
+                first_rolls[job_id, name] = first
+                first += rolls
+        assignments = []
+        for name, sequence in self.sequences.items():
+            printer = self.printers[name]
+            before, now = printer, 0.0
+            for job_id in sequence:
+                job = self._part(job_id, name)
+                change = changeover(before, job)
+                end = now + change + printer.run_minutes(job)
+                assignments.append(Assignment(name, job_id, now, end, change, first_rolls.get((job_id, name), 1),
+                                              job.rolls))
+                before, now = job, end
+        return assignments
+
+
+if __name__ == '__main__':
+    # python -m core.scheduler [jobs] [printers]
+    import random
+    import sys
+
+    n_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    n_printers = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    rng = random.Random(11)
+    sizes = ["4x2", "4x6", "2x1", "3x1.5"]
+    inlays = ["AD-383u8", "Dogbone M730", "Belt M781"]
+    ribbons = ["Wax 110mm", "Wax/Resin 110mm"]
+
+    def make_printers():
+        return [Printer(f"ZT411-{i + 1}", rng.choice([100, 150, 200]),
+                        label_sizes=None if i % 3 else ["4x2", "4x6"],
+                        label_size=rng.choice(sizes), inlay_type=rng.choice(inlays), ribbon=rng.choice(ribbons))
+                for i in range(n_printers)]
+
+    def make_job(job_id):
+        labels = rng.choice([500, 1000, 2000, 5000, 10000, 25000])
+        return SchedJob(job_id, labels, math.ceil(labels / 1000), rng.choice(sizes), rng.choice(inlays),
+                        rng.choice(ribbons), URGENT_WEIGHT if rng.random() < 0.1 else 1.0)
+
+    printers = make_printers()
+    jobs = [make_job(100 + i) for i in range(n_jobs)]
+
+    # Baseline: jobs in arrival order to the first free printer that can print them
+    baseline = Scheduler(printers, jobs)
+    free = {printer.name: 0.0 for printer in printers}
+    for job in jobs:
+        name = min((p.name for p in printers if p.can_print(job)), key=lambda n: free[n])
+        baseline.sequences[name].append(job.job_id)
+        baseline._changed(name)
+        free[name] = baseline._timeline(name)[1][-1]
+
+    scheduler = Scheduler(printers, jobs)
+    started = time.perf_counter()
+    scheduler.plan(rounds=0)
+    greedy_time = time.perf_counter() - started
+    greedy_cost = scheduler.cost()
+    started = time.perf_counter()
+    scheduler.plan(split=False)
+    whole_time = time.perf_counter() - started
+    whole_cost, whole_makespan = scheduler.cost(), scheduler.makespan()
+    started = time.perf_counter()
+    scheduler.plan()
+    plan_time = time.perf_counter() - started
+
+    print(f"{n_jobs} jobs on {n_printers} printers")
+    print(f"  first-free baseline:   weighted completion {baseline.cost():12,.0f} min, makespan "
+          f"{baseline.makespan():6.0f} min")
+    print(f"  WSPT list scheduling:  weighted completion {greedy_cost:12,.0f} min   ({greedy_time * 1000:.1f} ms)")
+    print(f"  + local search:        weighted completion {whole_cost:12,.0f} min, makespan "
+          f"{whole_makespan:6.0f} min   ({whole_time * 1000:.1f} ms)")
+    print(f"  + roll splitting:      weighted completion {scheduler.cost():12,.0f} min, makespan "
+          f"{scheduler.makespan():6.0f} min   ({plan_time * 1000:.1f} ms, {len(scheduler.shares)} jobs split)")
+
+    for job_id in [assignment.job_id for assignment in scheduler.schedule() if assignment.start == 0][:5]:
+        scheduler.start_job(job_id)
+    started = time.perf_counter()
+    scheduler.add_job(make_job(10_000))
+    print(f"  add one job:           {(time.perf_counter() - started) * 1000:.2f} ms")
+    started = time.perf_counter()
+    scheduler.printer_down(printers[0].name)
+    print(f"  {printers[0].name} goes down:     {(time.perf_counter() - started) * 1000:.1f} ms, "
+          f"weighted completion {scheduler.cost():12,.0f} min")
@@ -0,0 +1,308 @@
+import json
+import logging
+import sqlite3
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core import config
+
+# Multi-station job-state sync. Each station's JobStore keeps a local change feed;
+# the hub merges every station's feed into one globally sequenced feed. A station
+# pulls only the hub changes after the last hub seq it has seen and pushes only
+# its own changes after the last local seq it has pushed, so both traffic and CPU
+# follow the rate of change rather than the size of the job database.
+#
+# Wire format: zlib-compressed compact JSON in both directions.
+
+log = logging.getLogger(__name__)
+
+PULL_BATCH_SIZE = 2000
+PUSH_BATCH_SIZE = 2000
+
+
+def _pack(payload):
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def _unpack(body):
+    return json.loads(zlib.decompress(body).decode("utf-8")) if body else {}
+
+
+class SyncHub:
+    """The shared, globally sequenced feed (run one per site, see `python -m core.sync hub`)"""
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS feed (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                origin TEXT NOT NULL, origin_seq INTEGER NOT NULL,
+                entity TEXT NOT NULL, key TEXT NOT NULL, data TEXT,
+                UNIQUE (origin, origin_seq)
+            );
+        """)
+
+    def push(self, origin, changes):
+        """Append a station's changes ([origin_seq, entity, key, data], ...); retried pushes are ignored"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO feed (origin, origin_seq, entity, key, data) VALUES (?, ?, ?, ?, ?)",
+                    [(origin, origin_seq, entity, key, json.dumps(data, separators=(",", ":")))
+                     for origin_seq, entity, key, data in changes])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM feed").fetchone()[0]
+
+    def pull(self, since, limit=PULL_BATCH_SIZE, exclude_origin=None):
+        """Changes after `since`; `next` is the seq to ask from next time even if everything was filtered"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, origin, origin_seq, entity, key, data FROM feed WHERE seq > ? ORDER BY seq LIMIT ?",
+                (since, limit)).fetchall()
+        changes = [[origin, origin_seq, entity, key, json.loads(data)]
+                   for seq, origin, origin_seq, entity, key, data in rows if origin != exclude_origin]
+        return {"changes": changes, "next": rows[-1][0] if rows else since, "more": len(rows) == limit}
+
+
+class _HubRequestHandler(BaseHTTPRequestHandler):
+    hub = None
+
+    def _reply(self, payload):
+        body = _pack(payload)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path != "/pull":
+            self.send_error(404)
+            return
+        query = urllib.parse.parse_qs(url.query)
+        self._reply(self.hub.pull(
+            int(query.get("since", ["0"])[0]),
+            min(int(query.get("limit", [str(PULL_BATCH_SIZE)])[0]), PULL_BATCH_SIZE),
+            query.get("station", [None])[0]))
+
+    def do_POST(self):
+        if self.path != "/push":
+            self.send_error(404)
+            return
+        payload = _unpack(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        self._reply({"head": self.hub.push(payload["station"], payload["changes"])})
+
+    def log_message(self, format, *args):
+        log.debug("hub: " + format, *args)
+
+
+def serve_hub(path, host="0.0.0.0", port=8765):
+    handler = type("HubRequestHandler", (_HubRequestHandler,), {"hub": SyncHub(path)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+class SyncClient:
+    """Keeps one station's JobStore in step with the hub from a background thread"""
+    def __init__(self, store, hub_url=None, interval=None):
+        self.store = store
+        self.hub_url = (hub_url or config.SYNC_HUB_URL).rstrip("/")
+        self.interval = config.SYNC_INTERVAL_S if interval is None else interval
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.last_error = None
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread = None
+        self._sync_lock = threading.Lock()
+
+    def start(self):
+        if self._thread is None:
+            self.store.register_for_changes(self._on_store_changes)
+            self._thread = threading.Thread(target=self._run, name="job-sync", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self.store.unregister_for_changes(self._on_store_changes)
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _on_store_changes(self, changes):
+        # Push local edits promptly; changes we just pulled don't need another round trip
+        if any(change.origin == self.store.station_id for change in changes):
+            self._wake_event.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.sync_once()
+                if self.last_error:
+                    log.info("sync: hub reachable again")
+                self.last_error = None
+            except (urllib.error.URLError, OSError) as error:
+                # Offline is a normal state for a station; keep working locally and retry
+                if self.last_error is None:
+                    log.warning("sync: hub unreachable (%s), will retry", error)
+                self.last_error = error
+            self._wake_event.wait(self.interval)
+            self._wake_event.clear()
+
+    def _request(self, path, body=None):
+        request = urllib.request.Request(self.hub_url + path, data=body, method="POST" if body else "GET")
+        with urllib.request.urlopen(request, timeout=10) as response:
+            payload = response.read()
+        self.bytes_received += len(payload)
+        return _unpack(payload)
+
+    def _pending_local_keys(self, pushed_seq):
+        # Fields with local edits not yet on the hub; these win over older remote values because the
+        # hub will sequence them after anything pulled now
+        pending = set()
+        seq = pushed_seq
+        while True:
+            changes = self.store.changes_since(seq, PUSH_BATCH_SIZE, origin=self.store.station_id)
+            if not changes:
+                return pending
+            for change in changes:
+                if change.entity == "job":
+                    pending.update(("job", change.key, field) for field in change.data)
+                else:
+                    pending.add((change.entity, change.key, None))
+            seq = changes[-1].seq
+
+    def sync_once(self):
+        """Pull remote deltas, then push local ones. Returns (pulled, pushed) change counts."""
+        with self._sync_lock:
+            station = self.store.station_id
+            pulled = pushed = 0
+
+            hub_seq = self.store.get_sync_state("hub_seq")
+            pushed_seq = self.store.get_sync_state("pushed_seq")
+            skip = None
+            while True:
+                query = urllib.parse.urlencode({"since": hub_seq, "limit": PULL_BATCH_SIZE, "station": station})
+                response = self._request(f"/pull?{query}")
+                if response["changes"]:
+                    if skip is None:
+                        skip = self._pending_local_keys(pushed_seq)
+                    self.store.apply_remote_changes(response["changes"], skip)
+                    pulled += len(response["changes"])
+                if response["next"] != hub_seq:
+                    hub_seq = response["next"]
+                    self.store.set_sync_state("hub_seq", hub_seq)
+                if not response["more"]:
+                    break
+
+            while True:
+                changes = self.store.changes_since(pushed_seq, PUSH_BATCH_SIZE, origin=station)
+                if not changes:
+                    break
+                body = _pack({"station": station,
+                              "changes": [[c.origin_seq, c.entity, c.key, c.data] for c in changes]})
+                self.bytes_sent += len(body)
+                self._request("/push", body)
+                pushed_seq = changes[-1].seq
+                self.store.set_sync_state("pushed_seq", pushed_seq)
+                pushed += len(changes)
+            return pulled, pushed
+
+
+if __name__ == '__main__':
+    # python -m core.sync hub [--port 8765] [--db hub.db]   run a hub
+    # python -m core.sync demo [jobs]                       two stations against a local stand-in hub process
+    import argparse
+    import os
+    import socket
+    import subprocess
+    import sys
+    import tempfile
+    import time
+
+    parser = argparse.ArgumentParser(description="Job-state sync hub")
+    sub = parser.add_subparsers(dest="command", required=True)
+    hub_parser = sub.add_parser("hub")
+    hub_parser.add_argument("--host", default="0.0.0.0")
+    hub_parser.add_argument("--port", type=int, default=8765)
+    hub_parser.add_argument("--db", default=None)
+    demo_parser = sub.add_parser("demo")
+    demo_parser.add_argument("jobs", type=int, nargs="?", default=20000)
+    args = parser.parse_args()
+
+    if args.command == "hub":
+        logging.basicConfig(level=logging.INFO)
+        server = serve_hub(args.db or config.data_path("sync_hub.db"), args.host, args.port)
+        log.info("sync hub listening on %s:%s", args.host, args.port)
+        server.serve_forever()
+        sys.exit(0)
+
+    from core.job_store import JobStore
+
+    workdir = tempfile.mkdtemp(prefix="erp-sync-demo-")
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    hub_process = subprocess.Popen(
+        [sys.executable, "-m", "core.sync", "hub", "--host", "127.0.0.1", "--port", str(port),
+         "--db", os.path.join(workdir, "hub.db")],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        hub_url = f"http://127.0.0.1:{port}"
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(f"{hub_url}/pull?since=0&limit=1", timeout=1).read()
+                break
+            except OSError:
+                time.sleep(0.05)
+
+        station_a = JobStore(os.path.join(workdir, "a.db"), "station-a", 1)
+        station_b = JobStore(os.path.join(workdir, "b.db"), "station-b", 2)
+        client_a = SyncClient(station_a, hub_url)
+        client_b = SyncClient(station_b, hub_url)
+
+        def measured(label, client):
+            sent, received = client.bytes_sent, client.bytes_received
+            started = time.perf_counter()
+            pulled, pushed = client.sync_once()
+            print(f"  {label:<36} pulled {pulled:>6} pushed {pushed:>6}  "
+                  f"{client.bytes_sent - sent + client.bytes_received - received:>9,} bytes  "
+                  f"{(time.perf_counter() - started) * 1000:8.1f} ms")
+
+        print(f"{args.jobs:,} jobs created on station A")
+        station_a.save_jobs({"job_ticket": f"JT-{i}", "customer": f"Customer {i % 300}", "qty": 1000 + i,
+                             "status": "Pending", "inlay_type": "AD-383u8", "label_size": "4x2"}
+                            for i in range(args.jobs))
+        measured("A: initial push", client_a)
+        measured("B: initial pull", client_b)
+        measured("B: idle sync", client_b)
+
+        job_ids = [c.key for c in station_a.changes_since(0, 5)]
+        for job_id in job_ids:
+            station_a.set_job_fields(int(job_id), status="In Progress", printer="ZT411-3")
+        station_a.set_step(int(job_ids[0]), 7, "tracking_system_entered", True)
+        measured("A: push 5 job edits + 1 step", client_a)
+        measured("B: pull them", client_b)
+
+        # Conflicting edits: B edits offline, A's older edit arrives later; B's pending value wins
+        station_a.set_job_fields(int(job_ids[0]), status="On Hold")
+        client_a.sync_once()
+        station_b.set_job_fields(int(job_ids[0]), status="Completed")
+        client_b.sync_once()
+        client_a.sync_once()
+        print("  converged status:", station_a.get_job(int(job_ids[0])).status,
+              station_b.get_job(int(job_ids[0])).status)
+        print("  jobs on B:", station_b.count_jobs(), " step on B:", station_b.get_steps(int(job_ids[0])))
+    finally:
+        hub_process.terminate()
+        hub_process.wait()
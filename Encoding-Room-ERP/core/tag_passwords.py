@@ -0,0 +1,219 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from core import config
+
+# Per-tag Gen2 access / kill passwords for jobs whose tags are memory-locked.
+#
+# Nothing is stored: every password is recomputed from the station's master key,
+# the job id and the EPC, so a re-encode or a read-back check regenerates
+# exactly the passwords that went to the printer.
+#
+#   job secret     BLAKE2b-256(key=master key, person="ERPJobSecret", data="job:<job_id>")
+#   access || kill BLAKE2b-64 (key=job secret, person="ERPTagPassword", data=EPC bytes)
+#
+# Each 64-bit digest splits into the 32-bit access password (first 4 bytes,
+# big-endian) and kill password (last 4). A password of 0 means "none" to a tag,
+# so a tag whose digest has a zero half is re-hashed with a counter byte appended
+# to the EPC (1, 2, ...) until both halves are non-zero.
+#
+# Every station that encodes or verifies the same jobs must use the same master
+# key: ERP_TAG_PASSWORD_KEY (hex) or, when unset, the key file created once with
+# `cli.py passwords --new-key` and copied to the other stations. Nothing is
+# generated implicitly - a key of its own on one station would give every tag it
+# locks passwords no other station can derive - so without a key, locked jobs
+# fail with TagKeyError. Bulk derivation costs about a microsecond per tag, so
+# large jobs are split into chunks across a process pool.
+
+KEY_BYTES = 32
+DEFAULT_CHUNK_SIZE = 250_000
+
+_JOB_PERSON = b"ERPJobSecret"
+_TAG_PERSON = b"ERPTagPassword"
+
+
+class TagKeyError(ValueError):
+    """No usable master key for tag passwords"""
+
+
+def key_path():
+    return config.data_path("keys", "tag-passwords.key")
+
+
+def master_key():
+    """ERP_TAG_PASSWORD_KEY, else the station's key file; raises TagKeyError when neither holds a key"""
+    if config.TAG_PASSWORD_KEY:
+        try:
+            key = bytes.fromhex(config.TAG_PASSWORD_KEY)
+        except ValueError:
+            key = b""
+        return _checked_key(key, "ERP_TAG_PASSWORD_KEY")
+    path = key_path()
+    try:
+        with open(path, "rb") as handle:
+            key = handle.read()
+    except FileNotFoundError:
+        raise TagKeyError("no tag password key: locked jobs need the key shared by every station; set "
+                          f"ERP_TAG_PASSWORD_KEY ({2 * KEY_BYTES} hex digits) or create one with "
+                          "`cli.py passwords --new-key` and copy it to the other stations") from None
+    return _checked_key(key, path)
+
+
+def _checked_key(key, source):
+    if len(key) != KEY_BYTES:
+        raise TagKeyError(f"{source}: a tag password key is {KEY_BYTES} bytes ({2 * KEY_BYTES} hex digits)")
+    return key
+
+
+def create_master_key():
+    """Create the station's key file (once; copy it, or its hex as ERP_TAG_PASSWORD_KEY, to every station)"""
+    path = key_path()
+    if config.TAG_PASSWORD_KEY or os.path.exists(path):
+        source = "ERP_TAG_PASSWORD_KEY" if config.TAG_PASSWORD_KEY else path
+        raise TagKeyError(f"a tag password key is already configured ({source})")
+    key = os.urandom(KEY_BYTES)
+    # Written aside and renamed: another process reading the key never sees a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as handle:
+        handle.write(key)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+    return key
+
+
+def job_secret(job_id, key=None):
+    return hashlib.blake2b(f"job:{int(job_id)}".encode("ascii"), key=key if key is not None else master_key(),
+                           digest_size=32, person=_JOB_PERSON).digest()
+
+
+def derive_passwords(secret, epcs):
+    """(N, W) uint8 EPCs -> (access, kill) uint32 arrays"""
+    epcs = np.ascontiguousarray(epcs, dtype=np.uint8)
+    n, width = epcs.shape
+    base = hashlib.blake2b(key=secret, digest_size=8, person=_TAG_PERSON)
+    data = memoryview(epcs.tobytes())
+    digests = []
+    append, copy = digests.append, base.copy
+    for offset in range(0, n * width, width):
+        # copy() of the keyed state skips re-keying: about half the cost of a fresh hash per tag
+        h = copy()
+        h.update(data[offset:offset + width])
+        append(h.digest())
+    words = np.frombuffer(b"".join(digests), dtype=">u4").reshape(n, 2).astype(np.uint32)
+    counter = 0
+    zero = np.flatnonzero((words == 0).any(axis=1))
+    while len(zero):
+        counter += 1
+        for i in zero:
+            h = base.copy()
+            h.update(data[i * width:(i + 1) * width])
+            h.update(bytes((counter,)))
+            words[i] = np.frombuffer(h.digest(), dtype=">u4")
+        zero = zero[(words[zero] == 0).any(axis=1)]
+    return words[:, 0].copy(), words[:, 1].copy()
+
+
+def tag_passwords(secret, epc):
+    """Passwords of one tag (EPC as bytes or hex), as 8-digit hex strings"""
+    epc = bytes.fromhex(epc) if isinstance(epc, str) else bytes(epc)
+    access, kill = derive_passwords(secret, np.frombuffer(epc, dtype=np.uint8).reshape(1, -1))
+    return f"{int(access[0]):08X}", f"{int(kill[0]):08X}"
+
+
+def to_hex(passwords):
+    """uint32 array -> list of 8-digit uppercase hex strings"""
+    text = np.asarray(passwords, dtype=">u4").tobytes().hex().upper()
+    return [text[i:i + 8] for i in range(0, len(text), 8)]
+
+
+def _derive_range(path, secret, start, stop):
+    from core.epc_data_file import EpcDataFile  # opened per chunk: a memory map is cheap and not picklable
+    data_file = EpcDataFile(path)
+    try:
+        return derive_passwords(secret, data_file.epcs[start:stop])
+    finally:
+        data_file.close()
+
+
+def job_passwords(data_file, secret, ranges=None, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """(access, kill) for each (start, stop) tag range of a data file, in order (default: the whole job in chunks)
+
+    Ranges over `chunk_size` are split so the pool stays busy; with more than one
+    worker, chunks run ahead in a process pool while the caller consumes results.
+    """
+    if ranges is None:
+        ranges = [(0, len(data_file))]
+    pieces = []  # (range index, start, stop)
+    for index, (start, stop) in enumerate(ranges):
+        for first in range(start, stop, chunk_size):
+            pieces.append((index, first, min(first + chunk_size, stop)))
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 1) - 1)
+
+    def joined(results):
+        current, parts = 0, []
+        for (index, _, _), result in zip(pieces, results):
+            if index != current:
+                yield _concatenate(parts)
+                for _ in range(current + 1, index):
+                    yield np.empty(0, np.uint32), np.empty(0, np.uint32)
+                current, parts = index, []
+            parts.append(result)
+        if ranges:
+            yield _concatenate(parts)
+            for _ in range(current + 1, len(ranges)):
+                yield np.empty(0, np.uint32), np.empty(0, np.uint32)
+
+    if workers <= 1 or len(pieces) <= 1:
+        yield from joined(derive_passwords(secret, data_file.epcs[start:stop]) for _, start, stop in pieces)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() submits every chunk up front and yields results in order
+        yield from joined(pool.map(_derive_range, *zip(*[(data_file.path, secret, start, stop)
+                                                          for _, start, stop in pieces])))
+
+
+def _concatenate(parts):
+    if not parts:
+        return np.empty(0, np.uint32), np.empty(0, np.uint32)
+    if len(parts) == 1:
+        return parts[0]
+    return np.concatenate([access for access, _ in parts]), np.concatenate([kill for _, kill in parts])
+
+
+if __name__ == '__main__':
+    # Bulk derivation throughput: python -m core.tag_passwords [tags] [workers]
+    import sys
+    import tempfile
+    import time
+
+    from core.epc_data_file import generate_job_data
+    from core.job_records import JobRecord
+
+    tags = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    path = os.path.join(tempfile.mkdtemp(prefix="erp-passwords-"), "job-4242.epc")
+    data_file = generate_job_data(JobRecord.from_dict({"job_id": 4242, "upc": "614141812345",
+                                                       "start_serial": 1_000_000,
+                                                       "end_serial": 1_000_000 + tags - 1, "lpr": 2000}), path=path)
+    secret = job_secret(4242, key=bytes(range(KEY_BYTES)))
+
+    for count in sorted({1, workers}):
+        started = time.perf_counter()
+        access, kill = next(job_passwords(data_file, secret, workers=count))
+        elapsed = time.perf_counter() - started
+        print(f"{tags:,} tags, {count} worker{'s' if count != 1 else ''}: {elapsed:.2f}s "
+              f"({elapsed / tags * 1e9:,.0f} ns/tag)")
+
+    # Reproducible: any tag regenerates on its own, and ranges agree with the bulk result
+    for tag in (0, tags // 2, tags - 1):
+        assert tag_passwords(secret, data_file.epc(tag)) == (f"{int(access[tag]):08X}", f"{int(kill[tag]):08X}")
+    ranges = [(0, 10), (10, 10), (tags - 5, tags)]
+    for (start, stop), (a, k) in zip(ranges, job_passwords(data_file, secret, ranges, workers=1, chunk_size=4)):
+        assert (a == access[start:stop]).all() and (k == kill[start:stop]).all()
+    assert (access != 0).all() and (kill != 0).all()
+    print(f"tag 1: EPC {data_file.hex(0)} access {int(access[0]):08X} kill {int(kill[0]):08X}")
@@ -0,0 +1,38 @@
+import time
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from instrumentation import TRACER
+from core.event_bus import EVENT_BUS
+
+FRAME_MS = 16
+
+class FrameDispatcher(QObject):
+    """Drains an EventBus on the GUI thread, at most once per frame and only while events are waiting"""
+    wake = pyqtSignal()  # emitted from publishing threads; queued onto the GUI thread
+
+    def __init__(self, bus=EVENT_BUS, frame_ms=FRAME_MS, parent=None):
+        super().__init__(parent)
+        self.bus = bus
+        self.frame_ms = frame_ms
+        self.last_drain = 0.0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.drain)
+        self.wake.connect(self.schedule)
+        bus.set_tracer(TRACER)
+        bus.set_wakeup(self.wake.emit)
+
+    def schedule(self):
+        if not self.timer.isActive():
+            # Never more than one drain per frame: wait out the rest of the current one
+            since_last = (time.perf_counter() - self.last_drain) * 1000
+            self.timer.start(max(0, int(self.frame_ms - since_last)))
+
+    def drain(self):
+        self.last_drain = time.perf_counter()
+        with TRACER.span("event_bus.drain", "events"):
+            self.bus.drain()
+
+    def stop(self):
+        self.timer.stop()
+        self.bus.set_wakeup(None)
+        self.bus.set_tracer(None)
@@ -0,0 +1,270 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+
+# Opt-in tracing for the GUI thread. Nothing here imports Qt so the same spans
+# can be used from the engines and worker threads.
+#
+# Enable with the ERP_TRACE environment variable (a file path, or "1" for the
+# default path) or by calling TRACER.enable(). The output is a Chrome trace
+# (JSON array format) that opens in chrome://tracing or ui.perfetto.dev.
+
+DEFAULT_TRACE_PATH = "erp_trace.json"
+DEFAULT_STALL_THRESHOLD_MS = 200
+HEARTBEAT_INTERVAL_MS = 50
+
+
+class _NullSpan:
+    """Shared no-op span handed out while tracing is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "category", "args", "start_ns")
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.complete(self.name, self.start_ns, time.perf_counter_ns(), self.category, self.args)
+        return False
+
+
+def _describe(value):
+    # json.dumps fallback: callbacks show up by qualified name, everything else by repr
+    name = getattr(value, "__qualname__", None)
+    if name:
+        owner = getattr(value, "__self__", None)
+        return f"{type(owner).__name__}.{value.__name__}" if owner is not None else name
+    return repr(value)
+
+
+class TraceWriter:
+    """Rotating Chrome trace file writer; every file is a standalone JSON array"""
+    def __init__(self, path, max_bytes=20 * 1024 * 1024, backup_count=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self._first = True
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write("[\n")
+        self._size = 2
+        self._first = True
+
+    def _close_file(self):
+        if self._file:
+            self._file.write("\n]\n")
+            self._file.close()
+            self._file = None
+
+    def _rotate(self):
+        self._close_file()
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        self._open()
+
+    def write(self, event):
+        line = json.dumps(event, default=_describe, separators=(",", ":"))
+        with self._lock:
+            if self._file is None:
+                self._open()
+            elif self._size + len(line) > self.max_bytes and not self._first:
+                self._rotate()
+            if not self._first:
+                self._file.write(",\n")
+                self._size += 2
+            self._file.write(line)
+            self._size += len(line)
+            self._first = False
+
+    def flush(self):
+        with self._lock:
+            if self._file:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._close_file()
+
+
+class StallWatchdog(threading.Thread):
+    """Watches a thread's heartbeat and captures its stack when it stops beating"""
+    def __init__(self, tracer, thread_id, threshold_ms=DEFAULT_STALL_THRESHOLD_MS):
+        super().__init__(name="gui-stall-watchdog", daemon=True)
+        self.tracer = tracer
+        self.thread_id = thread_id
+        self.threshold_s = threshold_ms / 1000.0
+        self.poll_s = min(self.threshold_s / 4, 0.05)
+        self.last_beat = time.perf_counter()
+        self._stop_event = threading.Event()
+
+    def beat(self):
+        # Called from the watched thread; a plain attribute store is all it costs
+        self.last_beat = time.perf_counter()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        stall_beat = None
+        stall_stack = None
+        last_flush = time.perf_counter()
+        while not self._stop_event.wait(self.poll_s):
+            now = time.perf_counter()
+            beat = self.last_beat
+            if stall_beat is None and now - beat >= self.threshold_s:
+                stall_beat = beat
+                frame = sys._current_frames().get(self.thread_id)
+                stall_stack = "".join(traceback.format_stack(frame)) if frame else ""
+                del frame
+                self.tracer.instant("gui_stall_detected", "stall", {
+                    "lag_ms": round((now - beat) * 1000, 1),
+                    "stack": stall_stack,
+                }, tid=self.thread_id)
+                self.tracer.flush()
+            elif stall_beat is not None and beat != stall_beat:
+                # The thread is beating again: record the whole stall as one slice
+                self.tracer.complete("gui_stall", int(stall_beat * 1e9), int(beat * 1e9), "stall",
+                                     {"stack": stall_stack}, tid=self.thread_id)
+                stall_beat = None
+                stall_stack = None
+            if now - last_flush >= 1.0:
+                self.tracer.flush()
+                last_flush = now
+
+
+class Tracer:
+    _instance = None
+    enabled = False
+    writer = None
+    watchdog = None
+    pid = None
+    stall_threshold_ms = DEFAULT_STALL_THRESHOLD_MS
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(Tracer, cls).__new__(cls)
+        return cls._instance
+
+    def enable(self, path=DEFAULT_TRACE_PATH, stall_threshold_ms=DEFAULT_STALL_THRESHOLD_MS,
+               max_bytes=20 * 1024 * 1024, backup_count=3):
+        if self.enabled:
+            return
+        self.writer = TraceWriter(path, max_bytes, backup_count)
+        self.stall_threshold_ms = stall_threshold_ms
+        self.pid = os.getpid()
+        self.enabled = True
+        atexit.register(self.disable)
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        if self.watchdog:
+            self.watchdog.stop()
+            self.watchdog.join(timeout=1.0)
+            self.watchdog = None
+        self.writer.close()
+
+    def span(self, name, category="app", **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, category, args)
+
+    def traced(self, name=None, category="app"):
+        """Decorator form of span(); the disabled path is one attribute check"""
+        def decorator(func):
+            span_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, span_name, category, {}):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def complete(self, name, start_ns, end_ns, category="app", args=None, tid=None):
+        if not self.enabled:
+            return
+        self.writer.write({
+            "name": name, "cat": category, "ph": "X",
+            "ts": start_ns / 1000.0, "dur": (end_ns - start_ns) / 1000.0,
+            "pid": self.pid, "tid": tid if tid is not None else threading.get_ident(),
+            "args": args or {},
+        })
+
+    def instant(self, name, category="app", args=None, tid=None):
+        if not self.enabled:
+            return
+        self.writer.write({
+            "name": name, "cat": category, "ph": "i", "s": "t",
+            "ts": time.perf_counter_ns() / 1000.0,
+            "pid": self.pid, "tid": tid if tid is not None else threading.get_ident(),
+            "args": args or {},
+        })
+
+    def flush(self):
+        if self.writer:
+            self.writer.flush()
+
+    def watch_current_thread(self):
+        """Start the stall watchdog for the calling (GUI) thread"""
+        if not self.enabled or self.watchdog:
+            return
+        thread = threading.current_thread()
+        self.writer.write({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": thread.ident,
+                           "args": {"name": "GUI"}})
+        self.watchdog = StallWatchdog(self, thread.ident, self.stall_threshold_ms)
+        self.watchdog.start()
+
+    def heartbeat(self):
+        if self.watchdog:
+            self.watchdog.beat()
+
+
+# Initialize a singleton instance
+TRACER = Tracer()
+
+_trace_env = os.environ.get("ERP_TRACE")
+if _trace_env:
+    TRACER.enable(
+        DEFAULT_TRACE_PATH if _trace_env == "1" else _trace_env,
+        stall_threshold_ms=int(os.environ.get("ERP_TRACE_STALL_MS", DEFAULT_STALL_THRESHOLD_MS)),
+    )
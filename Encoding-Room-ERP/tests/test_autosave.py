@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from core.autosave import MAX_RECORD_BYTES, Autosave, _journal_generations
+
+
+def _journal(autosave):
+    return autosave._journal_path(_journal_generations(autosave.directory)[-1])
+
+
+@pytest.mark.parametrize("tail", [b"\x40\x00\x12\x34\x56\x78{\"set\"", b"\x00" * 4096, b"\x10"],
+                         ids=["torn-record", "zero-filled", "torn-header"])
+def test_recovery_stops_at_a_torn_or_zero_filled_tail(tmp_path, tail):
+    autosave = Autosave(str(tmp_path))
+    autosave.set("checklist:1", "initials", "AB")
+    autosave.set("checklist:1", "calibration", 3)
+    autosave.close()
+    with open(_journal(autosave), "ab") as handle:
+        handle.write(tail)
+
+    recovered = Autosave(str(tmp_path))
+    assert recovered.recovered == {"checklist:1": {"initials": "AB", "calibration": 3}}
+    # The next session starts from a clean snapshot: the tail is not replayed again after new edits
+    recovered.set("checklist:1", "initials", "CD")
+    recovered.close()
+    again = Autosave(str(tmp_path))
+    assert again.drafts() == {"checklist:1": {"initials": "CD", "calibration": 3}}
+    again.close()
+
+
+def test_crash_between_new_journal_and_snapshot_rename_loses_nothing(tmp_path, monkeypatch):
+    autosave = Autosave(str(tmp_path))
+    autosave.set("checklist:1", "initials", "AB")
+
+    def crash(generation, drafts):
+        with open(autosave._path("snapshot.json.tmp"), "w") as handle:
+            handle.write('{"generation": 9')  # half-written, never renamed
+        raise OSError("power lost")
+
+    monkeypatch.setattr(autosave, "_write_snapshot", crash)
+    with pytest.raises(OSError):
+        autosave.compact()
+    autosave.set("checklist:1", "calibration", 3)  # goes to the new journal
+    autosave.set("checklist:2", "initials", "EF")
+    autosave.close()
+    assert len(_journal_generations(str(tmp_path))) == 2
+
+    recovered = Autosave(str(tmp_path))
+    assert recovered.recovered == {"checklist:1": {"initials": "AB", "calibration": 3},
+                                   "checklist:2": {"initials": "EF"}}
+    assert len(_journal_generations(str(tmp_path))) == 1
+    recovered.close()
+
+
+def test_discard_survives_recovery_and_compaction(tmp_path):
+    autosave = Autosave(str(tmp_path))
+    autosave.set("checklist:1", "initials", "AB")
+    autosave.set("checklist:2", "initials", "CD")
+    autosave.compact()
+    autosave.discard("checklist:1")
+    autosave.close()
+
+    recovered = Autosave(str(tmp_path))
+    assert recovered.drafts() == {"checklist:2": {"initials": "CD"}}
+    recovered.discard("checklist:2")
+    recovered.close()
+    again = Autosave(str(tmp_path))
+    assert again.drafts() == {} and again.recovered == {}
+    again.close()
+
+
+def test_oversized_value_is_refused_without_touching_the_journal(tmp_path):
+    autosave = Autosave(str(tmp_path))
+    autosave.set("checklist:1", "initials", "AB")
+    size = os.path.getsize(_journal(autosave))
+    with pytest.raises(ValueError):
+        autosave.set("checklist:1", "notes", "x" * MAX_RECORD_BYTES)
+    assert os.path.getsize(_journal(autosave)) == size
+    assert autosave.draft("checklist:1") == {"initials": "AB"}
+    autosave.close()
@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from core.epc_data_file import generate_job_data
+from core.job_store import JobStore
+from core.tag_passwords import create_master_key
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs cli.py with PyQt6 blocked: any import of it (direct or through a view module) fails the command
+NO_QT = ("import runpy, sys\n"
+         "sys.modules['PyQt6'] = None\n"
+         "sys.argv = sys.argv[1:]\n"
+         "runpy.run_path(sys.argv[0], run_name='__main__')\n")
+
+
+@pytest.fixture
+def station(data_dir):
+    """One open job with its EPC data, a master key, a reads file and an order file"""
+    store = JobStore()
+    try:
+        job_id = store.save_job({"customer": "ACME", "upc": "614141812345", "start_serial": 1000,
+                                 "end_serial": 1249, "lpr": 100, "status": "Pending", "lock": 1})
+        data_file = generate_job_data(store.get_job(job_id))
+    finally:
+        store.close()
+    with open(data_dir / "reads.txt", "w") as handle:
+        handle.writelines(f"{epc}\n" for epc in data_file.hex_range(0, len(data_file)))
+    data_file.close()
+    create_master_key()
+    with open(data_dir / "orders.csv", "w", newline="") as handle:
+        handle.write("Customer,Job Ticket #,UPC,QTY,Overage,LPR,ROLLS,START,STOP,Due Date\r\n"
+                     "ACME,T-1,00614141123452,100,0,100,1,5000,5099,2026-11-30\r\n")
+    with open(data_dir / "printers.json", "w") as handle:
+        json.dump([{"name": "ZT411-1", "labels_per_minute": 150}], handle)
+    return job_id
+
+
+def _cli(data_dir, *args, qt=False):
+    env = dict(os.environ, ERP_DATA_DIR=str(data_dir), QT_QPA_PLATFORM="offscreen")
+    env.pop("ERP_TAG_PASSWORD_KEY", None)
+    command = [sys.executable, "cli.py", *args] if qt else [sys.executable, "-c", NO_QT, "cli.py", *args]
+    return subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+
+
+COMMANDS = [
+    (["generate", "{job}", "--force"], 0, "250 tags"),
+    (["export", "{job}", "--format", "zpl", "--out", "{data}/out"], 0, "250 labels"),
+    (["passwords", "{job}", "--tags", "1-3"], 0, "Tag,EPC,AccessPwd,KillPwd"),
+    (["verify", "{job}:{data}/reads.txt"], 0, "OK - 250/250 tags read"),
+    (["import", "{data}/orders.csv"], 0, ""),
+    (["report", "--json"], 0, '"jobs_by_status"'),
+    (["schedule", "--printers", "{data}/printers.json"], 0, "open jobs on 1 printers"),
+    (["extract", "production", "--out", "{data}/production.parquet"], 0, "rows to"),
+]
+
+
+@pytest.mark.parametrize("args, status, expected", COMMANDS, ids=[args[0] for args, _, _ in COMMANDS])
+def test_commands_run_without_qt(station, data_dir, args, status, expected):
+    result = _cli(data_dir, *(arg.format(job=station, data=data_dir) for arg in args))
+    assert result.returncode == status, result.stderr
+    assert expected in result.stdout + result.stderr
+
+
+def test_schedule_without_printer_setup_names_the_file(station, data_dir):
+    os.remove(data_dir / "printers.json")
+    result = _cli(data_dir, "schedule")
+    assert result.returncode == 1
+    assert "printers.json not found" in result.stderr and "Traceback" not in result.stderr
+
+
+def test_checklists_render_with_qt_offscreen(station, data_dir):
+    result = _cli(data_dir, "checklists", str(station), "--out", str(data_dir / "checklists"), "--workers", "1",
+                  qt=True)
+    assert result.returncode == 0, result.stderr
+    assert os.listdir(data_dir / "checklists")
@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pytest
+
+from core.epc_data_file import (_HEADER_V1, MAGIC, EpcDataFile, StaleDataError, ensure_job_data, generate_job_data,
+                                job_data_path, job_source, open_job_data, sgtin_chunks, split_gtin,
+                                write_data_file)
+from core.job_records import JobRecord
+
+
+def _job(start_serial=1000, count=250, lpr=100, upc="614141812345", job_id=42):
+    return JobRecord.from_dict({"job_id": job_id, "upc": upc, "start_serial": start_serial,
+                                "end_serial": start_serial + count - 1, "lpr": lpr})
+
+
+def _leftovers():
+    return [name for name in os.listdir(os.path.dirname(job_data_path(0))) if name.endswith(".tmp")]
+
+
+def test_generate_then_open_round_trips(data_dir):
+    job = _job(count=250, lpr=100)
+    generate_job_data(job).close()
+
+    data_file = open_job_data(job)
+    partition, company_prefix, item_reference = split_gtin(job.upc, job_source(job).company_digits)
+    expected = np.concatenate(list(sgtin_chunks(company_prefix, item_reference, partition, 1000, 250,
+                                                chunk_size=64)))
+    assert len(data_file) == 250 and data_file.job_id == 42 and data_file.scheme == "SGTIN-96"
+    assert np.array_equal(data_file.epcs, expected)
+    assert data_file.source == job_source(job)
+    assert data_file.roll_count == 3 and data_file.roll_range(2) == (200, 250) and data_file.roll_of(199) == 1
+    assert data_file.hex_range(249, 250) == [expected[-1].tobytes().hex().upper()]
+    data_file.close()
+
+
+@pytest.mark.parametrize("edit", [dict(start_serial=1001, end_serial=1250), dict(upc="614141899999"),
+                                  dict(company_digits=8)], ids=["serials", "gtin", "company-digits"])
+def test_edited_job_rejects_its_stale_file(data_dir, edit):
+    job = _job()
+    generate_job_data(job).close()
+    company_digits = edit.pop("company_digits", None)
+    for name, value in edit.items():
+        setattr(job, name, value)
+
+    with pytest.raises(StaleDataError):
+        open_job_data(job, company_digits=company_digits)
+    data_file = ensure_job_data(job, company_digits=company_digits)
+    assert data_file.source == job_source(job, company_digits)
+    data_file.close()
+    open_job_data(job, company_digits=company_digits).close()
+
+
+def test_version_1_file_is_always_stale(data_dir):
+    path = job_data_path(42)
+    with open(path, "wb") as handle:
+        handle.write(_HEADER_V1.pack(MAGIC, 1, 12, 0, 42, 0, 0, 64, b"SGTIN-96"))
+        handle.write(np.zeros(1, dtype="<u8").tobytes())
+    assert EpcDataFile(path).source is None
+    with pytest.raises(StaleDataError, match="predates"):
+        open_job_data(_job())
+
+
+def test_not_a_data_file(data_dir):
+    path = job_data_path(42)
+    with open(path, "wb") as handle:
+        handle.write(b"hello")
+    with pytest.raises(ValueError, match="not an EPC data file"):
+        EpcDataFile(path)
+
+
+def test_failed_generation_leaves_no_temporary_file(data_dir):
+    job = _job()
+    generate_job_data(job).close()
+    with open(job_data_path(42), "rb") as handle:
+        before = handle.read()
+
+    # Serials past the 38-bit SGTIN-96 range: the chunk generator raises on its first chunk
+    with pytest.raises(ValueError, match="2\\^38"):
+        generate_job_data(_job(start_serial=(1 << 38) - 10, count=20))
+    chunks = [np.zeros((10, 12), dtype=np.uint8)]
+    with pytest.raises(ValueError, match="expected 20 EPCs"):
+        write_data_file(job_data_path(42), 42, 20, 10, chunks)
+
+    def refuse(epcs):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        write_data_file(job_data_path(42), 42, 10, 10, chunks, before_commit=refuse)
+    assert not _leftovers()
+    with open(job_data_path(42), "rb") as handle:
+        assert handle.read() == before
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from core import epc_guard
+from core.epc_array import EPC96_BYTES
+from core.epc_guard import MAX_SEGMENTS, DuplicateEpcError, EpcGuard
+
+
+def _epcs(start, count):
+    """`count` distinct EPCs: an SGTIN-96 header byte, then the serial in the last eight bytes"""
+    epcs = np.zeros((count, EPC96_BYTES), dtype=np.uint8)
+    epcs[:, 0] = 0x30
+    epcs[:, 4:] = np.arange(start, start + count, dtype=">u8").view(np.uint8).reshape(-1, 8)
+    return epcs
+
+
+@pytest.fixture
+def guard(tmp_path):
+    return EpcGuard(str(tmp_path / "guard"), capacity=100_000)
+
+
+def test_bloom_false_positives_are_resolved_by_the_segments(guard, monkeypatch):
+    guard.add(_epcs(0, 1000), job_id=1)
+    monkeypatch.setattr(guard.bloom, "might_contain", lambda h1, h2: np.ones(len(h1), dtype=bool))
+    result = guard.check(np.concatenate([_epcs(5000, 500), _epcs(990, 20)]))
+    assert result.issued.tolist() == list(range(500, 510))
+    assert result.owners.tolist() == [1] * 10 and len(result.repeated) == 0
+
+
+def test_fingerprint_collisions_are_told_apart_by_the_exact_epc(guard, monkeypatch):
+    hashes = guard._hashes
+    monkeypatch.setattr(guard, "_hashes", lambda epcs: tuple(h % np.uint64(7) for h in hashes(epcs)))
+    guard.add(_epcs(0, 100), job_id=1)
+    result = guard.check(np.concatenate([_epcs(1000, 50), _epcs(40, 3)]))
+    assert result.issued.tolist() == [50, 51, 52] and len(result.repeated) == 0
+    assert guard.claim(2, _epcs(1000, 50), chunk_size=8) == 50
+
+
+def test_merged_segments_keep_every_epc_and_owner(guard):
+    for index in range(MAX_SEGMENTS + 3):
+        guard.add(_epcs(index * 100, 100), job_id=index + 1)
+    assert len(guard.segments) <= MAX_SEGMENTS and len(guard) == (MAX_SEGMENTS + 3) * 100
+    result = guard.check(_epcs(0, (MAX_SEGMENTS + 3) * 100))
+    assert len(result.issued) == len(guard)
+    assert result.owners.tolist() == [row // 100 + 1 for row in range(len(guard))]
+    assert len(guard.check(_epcs(300, 100), job_id=4).issued) == 0
+
+
+def test_repeats_across_chunks_refuse_the_job(guard):
+    epcs = _epcs(0, 50)
+    epcs[37] = epcs[3]
+    with pytest.raises(DuplicateEpcError) as error:
+        guard.claim(1, epcs, chunk_size=10)
+    assert error.value.repeated == 1 and len(guard) == 0
+    with pytest.raises(DuplicateEpcError):
+        guard.check_job(1, epcs, chunk_size=10)
+    assert guard.claim(1, _epcs(0, 50), chunk_size=10) == 50
+
+
+def test_claims_survive_reopening(guard):
+    assert guard.claim(1, _epcs(0, 300), chunk_size=64) == 300
+    reopened = EpcGuard(guard.directory)
+    assert len(reopened) == 300
+    assert reopened.claim(1, _epcs(0, 300), chunk_size=64) == 0
+    with pytest.raises(DuplicateEpcError) as error:
+        reopened.claim(2, _epcs(250, 100))
+    assert len(error.value.epcs) == 50 and set(error.value.owners.tolist()) == {1}
+
+
+def test_another_instance_sees_new_claims(guard):
+    other = EpcGuard(guard.directory)
+    guard.claim(1, _epcs(0, 100))
+    assert _epcs(50, 1)[0].tobytes() in other
+    with pytest.raises(DuplicateEpcError):
+        other.claim(2, _epcs(90, 20))
+    assert epc_guard.NO_JOB not in other.check(_epcs(0, 100)).owners
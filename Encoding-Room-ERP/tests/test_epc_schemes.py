@@ -0,0 +1,36 @@
+import numpy as np
+
+from core.epc_schemes import GRAI170, SGTIN96, SGTIN198, decode
+
+# urn:epc:tag:sgtin-198:3.0614141.812345.32a%2Fb
+SGTIN198_HEX = "3674257BF7194E59B2C2BF100000000000000000000000000000"
+
+
+def test_sgtin198_round_trips_an_alphanumeric_serial():
+    epcs = SGTIN198.encode(filter=3, partition=5, company_prefix=614141, item_reference=812345,
+                           serial=[b"32a/b", b"X" * 20])
+    assert epcs.shape == (2, 26)
+    assert epcs[0].tobytes().hex().upper() == SGTIN198_HEX
+    columns = SGTIN198.decode(epcs)
+    assert list(columns["serial"]) == [b"32a/b", b"X" * 20]
+    assert columns["valid"].all()
+    assert SGTIN198.uri(columns, 0) == "urn:epc:id:sgtin:0614141.812345.32a%2Fb"
+
+
+def test_grai170_serial_and_invalid_characters():
+    epcs = GRAI170.encode(filter=0, partition=5, company_prefix=614141, asset_type=12345, serial=["5678", "ok"])
+    assert epcs.shape == (2, 22)
+    epcs[1, 10] |= 0x01  # a character after the NUL padding
+    columns = GRAI170.decode(epcs)
+    assert columns["serial"][0] == b"5678" and GRAI170.uri(columns, 0) == "urn:epc:id:grai:0614141.12345.5678"
+    assert list(columns["valid"]) == [True, False]
+
+
+def test_mixed_length_reads_are_grouped_by_header():
+    sgtin96 = SGTIN96.encode(filter=1, partition=5, company_prefix=614141, item_reference=812345,
+                             serial=np.arange(3, dtype=np.uint64))
+    reads = [SGTIN198_HEX] + [epc.tobytes() for epc in sgtin96] + ["E2801160600002"]
+    groups = decode(reads)
+    assert list(groups["SGTIN-198"][0]) == [0] and groups["SGTIN-198"][1]["serial"][0] == b"32a/b"
+    assert list(groups["SGTIN-96"][0]) == [1, 2, 3] and list(groups["SGTIN-96"][1]["serial"]) == [0, 1, 2]
+    assert list(groups["unknown"][0]) == [4]
@@ -0,0 +1,187 @@
+import json
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.erp_outbox import ErpOutbox
+from core.job_store import JobStore
+
+
+class StandInErp:
+    """Local tracking-system endpoint; `status(update)` picks the reply for a batch"""
+
+    def __init__(self):
+        self.received = []
+        self.requests = 0
+        self.status = lambda updates: 200
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                updates = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["updates"]
+                stand_in.requests += 1
+                status = stand_in.status(updates)
+                if status == 200:
+                    stand_in.received.extend(updates)
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.endpoint = f"http://127.0.0.1:{self.server.server_address[1]}/tracking/updates"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def erp():
+    stand_in = StandInErp()
+    yield stand_in
+    stand_in.stop()
+
+
+def _outbox(tmp_path, endpoint, **kwargs):
+    return ErpOutbox(str(tmp_path / "outbox.db"), endpoint, base_backoff=0.01, max_backoff=0.05, **kwargs)
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_replays_updates_queued_while_offline(tmp_path, erp):
+    address = erp.server.server_address
+    erp.server.server_close()  # the link is down
+    outbox = _outbox(tmp_path, erp.endpoint, batch_size=7)
+    for job_id in range(100, 130):
+        outbox.enqueue("start_stop", job_id, {"field": "start_stop_email_sent", "value": True})
+    outbox.start()
+    _wait_for(lambda: outbox.failures >= 2)
+    assert outbox.pending_count() == 30
+
+    erp.server = ThreadingHTTPServer(address, erp.server.RequestHandlerClass)
+    erp.start()
+    _wait_for(lambda: outbox.pending_count() == 0)
+    outbox.close()
+
+    assert [update["job_id"] for update in erp.received] == list(range(100, 130))
+    assert outbox.posted == 30 and outbox.failures == 0
+
+
+def test_server_errors_keep_the_rows_for_retry(tmp_path, erp):
+    erp.status = lambda updates: 503
+    erp.start()
+    outbox = _outbox(tmp_path, erp.endpoint)
+    outbox.enqueue("job_details", 100, {"field": "tracking_system_entered", "value": True})
+    outbox.enqueue("job_details", 200, {"field": "tracking_system_entered", "value": True})
+
+    with pytest.raises(OSError):
+        outbox.flush_once()
+    assert outbox.pending_count() == 2 and outbox.dead_count() == 0
+
+    erp.status = lambda updates: 200
+    assert outbox.flush_once() == 2
+    assert outbox.pending_count() == 0 and outbox.posted == 2
+    outbox.close()
+
+
+def test_rejected_update_is_the_only_one_marked_dead(tmp_path, erp):
+    erp.status = lambda updates: 422 if any(update["job_id"] == 105 for update in updates) else 200
+    erp.start()
+    outbox = _outbox(tmp_path, erp.endpoint)
+    for job_id in range(100, 110):
+        outbox.enqueue("start_stop", job_id, {"field": "start_stop_email_sent", "value": True})
+
+    assert outbox.flush_once() == 10
+    assert outbox.flush_once() == 0
+    assert sorted(update["job_id"] for update in erp.received) == [100, 101, 102, 103, 104, 106, 107, 108, 109]
+    assert outbox.dead_count() == 1 and outbox.pending_count() == 0
+    assert outbox.posted == 9
+    outbox.close()
+
+
+def test_watch_follows_step7_changes_including_bulk_writes(tmp_path, erp):
+    store = JobStore(str(tmp_path / "jobs.db"), station_id="station-a", station_number=1)
+    job_id = store.save_job({"customer": "ACME", "qty": 500})
+    store.set_step(job_id, 7, "start_stop_email_sent", True)  # before watch(): not posted
+
+    erp.start()
+    outbox = _outbox(tmp_path, erp.endpoint)
+    outbox.watch(store)
+    notified_on = []
+    store.register_for_changes(lambda changes: notified_on.append(threading.current_thread()))
+
+    store.set_step(job_id, 3, "darkness", "22")                  # not a step 7 update
+    store.set_step(job_id, 7, "setup_issues_noted", True)        # step 7, but not posted
+    store.set_step(job_id, 7, "tracking_system_entered", True)
+    with store.batched_notifications():
+        other_ids = store.save_jobs([{"customer": f"C{i}"} for i in range(3)])
+        for other_id in other_ids:
+            store.set_step(other_id, 7, "start_stop_email_sent", True)
+    store.apply_remote_changes([("station-b", 1, "step", f"{job_id}:7:start_stop_email_sent", True)])
+
+    # The listener only wakes the worker; the updates are built on the worker thread
+    assert outbox.pending_count() == 0
+    assert set(notified_on) == {threading.current_thread()}
+
+    outbox.start()
+    _wait_for(lambda: len(erp.received) == 4)
+    outbox.close()
+
+    assert [(u["kind"], u["job_id"]) for u in erp.received] == (
+        [("job_details", job_id)] + [("start_stop", other_id) for other_id in other_ids])
+    assert erp.received[0]["payload"]["job"]["customer"] == "ACME"
+
+    # A restart resumes after the last change it queued
+    reopened = _outbox(tmp_path, erp.endpoint)
+    reopened.watch(store)
+    assert reopened.collect() == 0
+    store.set_step(job_id, 7, "start_stop_email_sent", False)    # unchecked: nothing to post
+    store.set_step(other_ids[0], 7, "tracking_system_entered", True)
+    assert reopened.collect() == 1
+    reopened.close()
+    store.close()
+
+
+def test_unexpected_error_backs_off_instead_of_killing_the_worker(tmp_path, erp, monkeypatch):
+    erp.start()
+    outbox = _outbox(tmp_path, erp.endpoint)
+    outbox.enqueue("job_details", 100, {"field": "tracking_system_entered", "value": True})
+    flush_once, calls = outbox.flush_once, []
+
+    def flaky_flush():
+        calls.append(None)
+        if len(calls) <= 2:
+            raise KeyError("job_id")
+        return flush_once()
+
+    monkeypatch.setattr(outbox, "flush_once", flaky_flush)
+    outbox.start()
+    _wait_for(lambda: outbox.pending_count() == 0)
+    outbox.close()
+    assert len(calls) >= 3 and outbox.failures == 0 and outbox.posted == 1
+
+
+def test_failed_enqueue_is_rolled_back(tmp_path, erp):
+    outbox = _outbox(tmp_path, erp.endpoint)
+    with pytest.raises(sqlite3.Error):
+        outbox.enqueue_many([("start_stop", 100, {}), ("start_stop", [101], {})], feed_seq=5)
+    outbox.enqueue_many([("start_stop", 102, {})], feed_seq=7)
+    assert outbox.pending_count() == 1 and outbox._feed_seq() == 7
+    outbox.close()
@@ -0,0 +1,142 @@
+import contextlib
+import logging
+
+import pytest
+
+from core.event_bus import ALERT, JOBS_CHANGED, PRODUCTION, TASK_PROGRESS, EventBus, Topic
+
+
+@pytest.fixture
+def bus():
+    """A bus whose events wait for drain(), as under the app's frame dispatcher"""
+    bus = EventBus()
+    wakeups = []
+    bus.set_wakeup(lambda: wakeups.append(1))
+    bus.wakeups = wakeups
+    return bus
+
+
+def _collect(bus, topic):
+    received = []
+    bus.subscribe(topic, received.append)
+    return received
+
+
+def test_merge_rules(bus):
+    production, alerts, changes = _collect(bus, PRODUCTION), _collect(bus, ALERT), _collect(bus, JOBS_CHANGED)
+    batch = [{"job_id": 1}]
+    bus.publish_many(PRODUCTION, [("ZT411-1", 3), ("ZT411-2", 1), ("ZT411-1", 4)])
+    bus.publish(ALERT, "ribbon", "Ribbon low")
+    bus.publish(ALERT, "ribbon", None)
+    bus.publish(JOBS_CHANGED, None, batch)
+    bus.publish(JOBS_CHANGED, None, [{"job_id": 2}])
+    assert bus.wakeups == [1]
+    assert bus.drain() == 4
+
+    assert {(event.key, event.payload, event.count) for event in production[0]} == {("ZT411-1", 7, 2),
+                                                                                    ("ZT411-2", 1, 1)}
+    assert [(event.key, event.payload, event.count) for event in alerts[0]] == [("ribbon", None, 2)]
+    assert [event.payload for event in changes[0]] == [[{"job_id": 1}, {"job_id": 2}]]
+    assert batch == [{"job_id": 1}]  # the publisher's list is copied, not extended
+    assert bus.published == 7 and bus.delivered == 4
+    assert bus.drain() == 0 and len(production) == 1
+
+
+def test_custom_merge_and_payload_check(bus):
+    peak = Topic("peak", int, max)
+    received = _collect(bus, peak)
+    bus.publish_many(peak, [("line", 5), ("line", 9), ("line", 2)])
+    bus.drain()
+    assert [(event.payload, event.count) for event in received[0]] == [(9, 3)]
+
+    with pytest.raises(TypeError, match="production payload must be"):
+        bus.publish(PRODUCTION, "ZT411-1", "3")
+    with pytest.raises(ValueError, match="unknown merge rule"):
+        Topic("bad", int, "average")
+
+
+def test_argument_less_subscriber_runs_once_per_drain(bus):
+    calls = []
+
+    def refresh():
+        calls.append(1)
+
+    for topic in (PRODUCTION, ALERT, TASK_PROGRESS):
+        bus.subscribe(topic, refresh, with_events=False)
+    bus.subscribe(PRODUCTION, refresh, with_events=False)  # subscribing twice is a no-op
+    bus.publish(PRODUCTION, "ZT411-1", 1)
+    bus.publish(ALERT, "ribbon", "Ribbon low")
+    bus.drain()
+    assert calls == [1]
+    bus.publish(TASK_PROGRESS, "export", (1, 2))
+    bus.drain()
+    assert calls == [1, 1]
+
+    bus.unsubscribe(PRODUCTION, refresh)
+    bus.publish(PRODUCTION, "ZT411-1", 1)
+    bus.drain()
+    assert calls == [1, 1]
+
+
+def test_failing_subscriber_does_not_block_the_others(bus, caplog):
+    def broken(events):
+        raise RuntimeError("view gone")
+
+    before, after = [], []
+    bus.subscribe(PRODUCTION, before.append)
+    bus.subscribe(PRODUCTION, broken)
+    bus.subscribe(PRODUCTION, after.append)
+    bus.subscribe(ALERT, after.append)
+    bus.publish(PRODUCTION, "ZT411-1", 1)
+    bus.publish(ALERT, "ribbon", "Ribbon low")
+    with caplog.at_level(logging.ERROR, logger="core.event_bus"):
+        assert bus.drain() == 2
+    assert len(before) == 1 and [events[0].topic for events in after] == [PRODUCTION, ALERT]
+    assert "production subscriber" in caplog.text and "view gone" in caplog.text
+
+
+def test_without_a_wakeup_events_are_delivered_as_published(bus):
+    received = _collect(bus, PRODUCTION)
+    bus.publish(PRODUCTION, "ZT411-1", 1)
+    bus.publish(PRODUCTION, "ZT411-1", 1)
+    assert received == [] and bus.wakeups == [1]
+
+    bus.set_wakeup(None)  # flushes what is waiting, then delivers synchronously
+    assert [(event.payload, event.count) for event in received[0]] == [(2, 2)]
+    bus.publish(PRODUCTION, "ZT411-2", 5)
+    assert [event.payload for event in received[1]] == [5]
+    assert not bus.has_pending()
+
+    fresh = EventBus()  # the CLI and scripts never set a wakeup
+    alerts = _collect(fresh, ALERT)
+    fresh.publish(ALERT, "ribbon", "Ribbon low")
+    assert [event.payload for event in alerts[0]] == ["Ribbon low"]
+
+
+def test_wakeup_fires_once_until_drained(bus):
+    for _ in range(3):
+        bus.publish(PRODUCTION, "ZT411-1", 1)
+    assert bus.wakeups == [1] and bus.has_pending()
+    bus.drain()
+    bus.publish(PRODUCTION, "ZT411-1", 1)
+    assert bus.wakeups == [1, 1]
+
+
+def test_tracer_spans_each_subscriber_call(bus):
+    spans = []
+
+    class Tracer:
+        @contextlib.contextmanager
+        def span(self, name, category, **args):
+            spans.append((name, category, args))
+            yield
+
+    def on_production(events):
+        pass
+
+    bus.set_tracer(Tracer())
+    bus.subscribe(PRODUCTION, on_production)
+    bus.publish_many(PRODUCTION, [("ZT411-1", 1), ("ZT411-2", 1)])
+    bus.drain()
+    assert spans == [("event_bus.callback", "events",
+                      {"topic": "production", "callback": on_production, "events": 2})]
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+pytest.importorskip("PyQt6.QtWidgets")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication, QPlainTextEdit  # noqa: E402
+
+from core.autosave import MAX_RECORD_BYTES, Autosave  # noqa: E402
+from views.form_autosave import FormAutosave  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def test_oversized_edit_is_reported_not_raised_in_the_slot(app, tmp_path):
+    autosave = Autosave(str(tmp_path))
+    errors = []
+    form = FormAutosave(autosave, "checklist:1", on_error=lambda field, message: errors.append((field, message)))
+    edit = QPlainTextEdit()
+    form.bind("notes", edit)
+
+    edit.setPlainText("short")
+    edit.setPlainText("x" * MAX_RECORD_BYTES)
+    assert autosave.draft("checklist:1") == {"notes": "short"}
+    assert [field for field, _ in errors] == ["notes"] and "too large" in errors[0][1]
+    autosave.close()
@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from instrumentation import _NULL_SPAN, TRACER, TraceWriter
+
+
+def _events(path):
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+@pytest.fixture
+def tracer(tmp_path):
+    path = str(tmp_path / "trace" / "erp_trace.json")
+    TRACER.enable(path, stall_threshold_ms=60)
+    yield TRACER
+    TRACER.disable()
+
+
+def test_writer_rotates_into_standalone_json_files(tmp_path):
+    path = str(tmp_path / "trace.json")
+    writer = TraceWriter(path, max_bytes=2000, backup_count=2)
+    callback = test_writer_rotates_into_standalone_json_files
+    for i in range(200):
+        writer.write({"name": f"event {i}", "ph": "i", "ts": i, "args": {"callback": callback}})
+    writer.close()
+
+    assert sorted(os.listdir(tmp_path)) == ["trace.json", "trace.json.1", "trace.json.2"]
+    paths = [f"{path}.2", f"{path}.1", path]
+    for name in paths:
+        assert os.path.getsize(name) <= 2000 + len("\n]\n")
+    files = [_events(name) for name in paths]
+    assert all(files)
+    # Oldest first: the kept files hold the most recent events, in order and without gaps
+    numbers = [event["ts"] for events in files for event in events]
+    assert numbers == list(range(numbers[0], 200))
+    assert files[-1][-1]["args"]["callback"] == "test_writer_rotates_into_standalone_json_files"
+
+
+def test_writer_without_backups_starts_over(tmp_path):
+    path = str(tmp_path / "trace.json")
+    writer = TraceWriter(path, max_bytes=500, backup_count=0)
+    for i in range(100):
+        writer.write({"ts": i})
+    writer.flush()
+    writer.close()
+    assert os.listdir(tmp_path) == ["trace.json"]
+    assert _events(path)[-1] == {"ts": 99}
+
+
+def test_spans_are_chrome_trace_complete_events(tracer):
+    with tracer.span("load_jobs", "db", rows=3):
+        pass
+    with pytest.raises(KeyError):
+        with tracer.span("lookup"):
+            raise KeyError("x")
+
+    @tracer.traced()
+    def refresh():
+        return 7
+
+    assert refresh() == 7
+    tracer.instant("marker", args={"n": 1})
+    path = tracer.writer.path
+    tracer.disable()
+
+    events = _events(path)
+    assert [event["name"] for event in events] == ["load_jobs", "lookup",
+                                                   "test_spans_are_chrome_trace_complete_events.<locals>.refresh",
+                                                   "marker"]
+    assert events[0]["cat"] == "db" and events[0]["args"] == {"rows": 3}
+    assert events[1]["args"] == {"error": "KeyError"}
+    for event in events[:3]:
+        assert event["ph"] == "X" and event["dur"] >= 0
+        assert event["pid"] == os.getpid() and event["tid"] == threading.get_ident()
+    assert events[3]["ph"] == "i" and events[3]["s"] == "t"
+
+
+def test_disabled_tracer_hands_out_the_null_span():
+    assert not TRACER.enabled
+    assert TRACER.span("anything") is _NULL_SPAN
+    TRACER.complete("dropped", 0, 1)
+    TRACER.heartbeat()
+
+
+def test_watchdog_reports_a_blocked_heartbeat(tracer):
+    def beat_for(seconds):
+        until = time.perf_counter() + seconds
+        while time.perf_counter() < until:
+            tracer.heartbeat()
+            time.sleep(0.01)
+
+    tracer.watch_current_thread()
+    beat_for(0.2)       # beating: no stall
+    time.sleep(0.3)     # blocked: the watchdog fires once
+    beat_for(0.1)       # beating again closes the stall slice
+    path = tracer.writer.path
+    tracer.disable()
+
+    events = _events(path)
+    assert events[0]["ph"] == "M" and events[0]["args"] == {"name": "GUI"}
+    detected = [event for event in events if event["name"] == "gui_stall_detected"]
+    stalls = [event for event in events if event["name"] == "gui_stall"]
+    assert len(detected) == len(stalls) == 1
+    assert detected[0]["tid"] == stalls[0]["tid"] == threading.get_ident()
+    assert detected[0]["args"]["lag_ms"] >= 60
+    assert "test_watchdog_reports_a_blocked_heartbeat" in detected[0]["args"]["stack"]
+    assert 250_000 <= stalls[0]["dur"] < 1_000_000  # microseconds
+    assert stalls[0]["ts"] <= detected[0]["ts"] <= stalls[0]["ts"] + stalls[0]["dur"]
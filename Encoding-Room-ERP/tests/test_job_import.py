@@ -0,0 +1,100 @@
+import csv
+
+import numpy as np
+import pytest
+
+from core.job_import import MAX_SERIAL, _int_column, import_jobs
+from core.job_store import JobStore
+
+HEADER = ["Customer", "Job Ticket #", "UPC", "QTY", "Overage", "LPR", "ROLLS", "START", "STOP", "Due Date"]
+GTIN = "00614141123452"
+OTHER_GTIN = "00614141999996"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), "station-a", 1)
+    yield store
+    store.close()
+
+
+def _row(ticket, start=None, stop=None, qty=100, upc=GTIN, **overrides):
+    row = {"Customer": "ACME", "Job Ticket #": ticket, "UPC": upc, "QTY": qty, "Overage": 0, "LPR": 100,
+           "ROLLS": 1, "START": start if start is not None else "", "STOP": stop if stop is not None else "",
+           "Due Date": "2026-11-30"}
+    row.update(overrides)
+    return [row[name] for name in HEADER]
+
+
+def _import(tmp_path, store, rows, chunk_size=1000):
+    path = tmp_path / "orders.csv"
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    return import_jobs(str(path), store, chunk_size=chunk_size)
+
+
+def _errors(result):
+    return [(error.line, error.column) for error in result.errors]
+
+
+def test_int_column_accepts_ascii_digits_only():
+    values, ok = _int_column(np.array(["1,000", "", "42", "²", "٣", "1.5", "-3", "9" * 19, "9" * 18]))
+    assert ok.tolist() == [True, True, True, False, False, False, False, False, True]
+    assert values.tolist()[:3] == [1000, 0, 42] and values[-1] == 10**18 - 1
+
+
+def test_bad_numbers_are_row_errors_not_an_aborted_import(tmp_path, store):
+    result = _import(tmp_path, store, [
+        _row("JT-1"),
+        _row("JT-2", qty="99999999999999999999999"),
+        _row("JT-3", qty="²"),
+        _row("JT-4", qty=2**31),
+        _row("JT-5", start=MAX_SERIAL - 99, stop=MAX_SERIAL),
+        _row("JT-6", start=MAX_SERIAL, stop=MAX_SERIAL + 99),
+        _row("JT-7", upc="00614141123453"),
+        _row("JT-8", Overage=25, LPR=200),
+        _row("JT-9", ROLLS=0, LPR=0, start=500, stop=550),
+        _row("JT-10", **{"Due Date": "30/11/2026"}),
+    ])
+    assert result.rows_read == 10 and result.rows_imported == 2
+    assert _errors(result) == [(3, "qty"), (4, "qty"), (5, "qty"), (7, "end_serial"), (8, "upc"),
+                               (9, "overage"), (10, "end_serial"), (11, "due_date")]
+    assert sorted(store.get_job(job_id).job_ticket for job_id in store.load_table().column("job_id").values) == \
+        ["JT-1", "JT-5"]
+
+
+def test_first_line_wins_an_overlap(tmp_path, store):
+    result = _import(tmp_path, store, [
+        _row("A", 1000, 1999),
+        _row("B", 1500, 2499),        # overlaps A: rejected
+        _row("C", 2000, 2999),        # overlaps only the rejected B: accepted
+        _row("D", 1000, 1999, upc=OTHER_GTIN),  # same serials, other GTIN
+        _row("E", 2999, 3999),        # touches C's last serial
+    ])
+    assert _errors(result) == [(3, "start_serial"), (6, "start_serial")]
+    assert result.rows_imported == 3
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1000])
+def test_overlap_errors_do_not_depend_on_chunk_size(tmp_path, store, chunk_size):
+    rng = np.random.default_rng(5)
+    rows = []
+    for i in range(60):
+        start = int(rng.integers(0, 40)) * 100
+        rows.append(_row(f"JT-{i}", start, start + int(rng.integers(1, 4)) * 100 - 1,
+                         upc=GTIN if i % 3 else OTHER_GTIN))
+    reference = JobStore(str(tmp_path / "reference.db"), "ref", 2)
+    expected = _errors(_import(tmp_path, reference, rows, 1))
+    reference.close()
+    result = _import(tmp_path, store, rows, chunk_size)
+    assert expected and _errors(result) == expected
+    assert result.rows_imported == 60 - len(expected)
+
+    # And the accepted ranges really are disjoint per GTIN
+    table = store.load_table()
+    for gtin in (GTIN, OTHER_GTIN):
+        ranges = sorted((table.value(row, "start_serial"), table.value(row, "end_serial"))
+                        for row in range(len(table)) if table.value(row, "upc") == gtin)
+        assert all(end < next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
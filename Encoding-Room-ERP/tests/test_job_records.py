@@ -0,0 +1,91 @@
+from datetime import date
+
+import pytest
+
+from core.job_records import JOB_FIELDS, JobRecord, JobTable, TextColumn
+
+
+def _jobs(n=40):
+    return [{"job_id": 100 + i, "job_ticket": f"JT-{i}", "customer": f"Customer {i % 3}", "upc": "614141812345",
+             "status": "Completed" if i % 4 == 0 else "Pending", "qty": 1000 + i, "start_serial": (1 << 37) + i,
+             "lock": i % 2, "due_date": date(2026, 11, 1 + i % 28), "item": "Tote ✓" if i % 5 == 0 else ""}
+            for i in range(n)]
+
+
+def _rows(table):
+    return [table.record(row).as_dict() for row in range(len(table))]
+
+
+def test_append_extend_and_extend_rows_build_the_same_table():
+    jobs = _jobs()
+    appended, extended, loaded = JobTable(), JobTable(), JobTable()
+    for job in jobs:
+        appended.append(job)
+    extended.extend([JobRecord.from_dict(job) for job in jobs])
+    names = list(jobs[0])
+    loaded.extend_rows(names, [tuple(job[name] for name in names) for job in jobs])
+
+    expected = [JobRecord.from_dict(job).as_dict() for job in jobs]
+    assert _rows(appended) == _rows(extended) == _rows(loaded) == expected
+    assert appended.count_by("status") == {"Completed": 10, "Pending": 30}
+    assert appended.total("qty") == sum(job["qty"] for job in jobs)
+    assert appended.rows_where("customer", "Customer 1") == list(range(1, 40, 3))
+
+
+def test_append_and_extend_coerce_values_the_same_way():
+    # Spreadsheet imports hand over numbers as text and ids/tickets as numbers
+    job = {"job_id": "7", "job_ticket": 12345, "part_number": 0, "qty": "250", "overage": None, "lpr": 100.0,
+           "start_serial": "1000", "lock": True}
+    appended, extended = JobTable(), JobTable()
+    appended.append(job)
+    extended.extend([job])
+    extended.extend_rows(list(job), [tuple(job.values())])
+    for table in (appended, extended):
+        record = table.record(0)
+        assert (record.job_id, record.job_ticket, record.part_number) == (7, "12345", "")
+        assert (record.qty, record.overage, record.lpr, record.start_serial, record.lock) == (250, 0, 100, 1000, 1)
+    assert _rows(extended)[1] == _rows(extended)[0]
+    assert extended.count_where("job_ticket", 12345) == 2
+
+
+def test_row_of_with_sorted_and_unsorted_ids():
+    table = JobTable()
+    table.extend(_jobs(10))
+    assert table.row_of(105) == 5 and table.row_of(99) == -1 and table.row_of(110) == -1
+    table.append({"job_id": 50})
+    assert table.row_of(50) == 10 and table.row_of(105) == 5 and table.row_of(51) == -1
+
+
+def test_text_edits_are_folded_back_in_by_compaction(monkeypatch):
+    monkeypatch.setattr(TextColumn, "COMPACT_MIN_EDITS", 4)
+    table = JobTable()
+    table.extend(_jobs(40))
+    column = table.column("job_ticket")
+
+    table.set_value(3, "job_ticket", "Edited ✓")
+    table.update(5, {"job_ticket": None, "qty": 7})
+    assert column.edits == {3: "Edited ✓", 5: ""}
+    assert table.value(3, "job_ticket") == "Edited ✓" and table.value(5, "job_ticket") == ""
+    assert table.value(5, "qty") == 7
+
+    # More edits than max(COMPACT_MIN_EDITS, rows / 8) rewrite the buffer
+    for row in (7, 9, 11, 13):
+        table.set_value(row, "job_ticket", f"T{row}")
+    assert column.edits == {}
+    expected = [f"JT-{row}" for row in range(40)]
+    expected[3], expected[5] = "Edited ✓", ""
+    for row in (7, 9, 11, 13):
+        expected[row] = f"T{row}"
+    assert [table.value(row, "job_ticket") for row in range(40)] == expected
+    assert len(column) == 40 and column.nbytes() == len("".join(expected).encode()) + 4 * 41
+
+    column.compact()  # nothing to fold in
+    table.append({"job_id": 200, "job_ticket": "JT-200"})
+    assert table.value(40, "job_ticket") == "JT-200" and table.value(39, "job_ticket") == "JT-39"
+
+
+@pytest.mark.parametrize("name", sorted(JOB_FIELDS))
+def test_defaults_round_trip(name):
+    table = JobTable()
+    table.append({"job_id": 1})
+    assert getattr(table.record(0), name) == getattr(JobRecord(job_id=1), name)
@@ -0,0 +1,67 @@
+import random
+import time
+from datetime import date
+
+import pytest
+
+from core.job_records import JOB_STATUSES
+from core.job_store import Change, JobStore
+from core.metrics import DashboardMetrics
+
+NOW = time.time()
+TODAY = date.fromtimestamp(NOW).toordinal()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), "station-a", 1)
+    yield store
+    store.close()
+
+
+def _change(seq, job_id, **data):
+    return Change(seq, "station-b", seq, "job", str(job_id), data)
+
+
+def test_completed_without_a_date_is_not_counted_today():
+    metrics = DashboardMetrics(clock=lambda: NOW)
+    metrics.on_job_changes([_change(1, 7, status="Completed"),
+                            _change(2, 8, status="Completed", completed_date=TODAY - 1),
+                            _change(3, 9, status="Completed", completed_date=TODAY)])
+    assert metrics.snapshot().completed_today == 1
+    metrics.on_job_changes([_change(4, 9, completed_date=TODAY - 2)])
+    assert metrics.snapshot().completed_today == 0
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_change_streams_match_a_fresh_count(store, seed):
+    rng = random.Random(seed)
+    job_ids = store.save_jobs([{"customer": f"C{i}", "status": "Pending"} for i in range(30)])
+    metrics = DashboardMetrics(clock=lambda: NOW)
+    metrics.seed(store.load_table())
+    metrics.watch(store)
+
+    def random_fields():
+        fields = {}
+        if rng.random() < 0.7:
+            fields["status"] = rng.choice(JOB_STATUSES)
+        if not fields or rng.random() < 0.5:
+            fields["completed_date"] = rng.choice([TODAY, TODAY, TODAY - 1, None])
+        return fields
+
+    for _ in range(60):
+        updates = [dict(random_fields(), job_id=rng.choice(job_ids)) for _ in range(rng.randint(1, 8))]
+        if rng.random() < 0.3:
+            with store.batched_notifications():
+                for update in updates:
+                    store.save_job(update)
+        else:
+            store.save_jobs(updates)
+    metrics.unwatch()
+
+    fresh = DashboardMetrics(clock=lambda: NOW)
+    fresh.seed(store.load_table())
+    assert metrics.snapshot() == fresh.snapshot()
+    jobs = [store.get_job(job_id) for job_id in job_ids]
+    assert fresh.snapshot().completed_today == sum(
+        job.status == "Completed" and job.completed_date == date.fromordinal(TODAY) for job in jobs)
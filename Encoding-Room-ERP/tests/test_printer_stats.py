@@ -0,0 +1,170 @@
+import math
+
+import pytest
+
+from core import printer_stats
+from core.metrics import BUCKETS, _RateWindow
+from core.printer_stats import (BUCKET_SECONDS, LONG_WINDOW_S, SHORT_WINDOW_S, TREND_Z_ALERT, PrinterStats,
+                                PrinterWindow)
+from core.production_log import ENCODED, RETRIED, VOIDED, ProductionEvent
+
+T0 = 1_700_000_000.0  # a bucket boundary
+
+
+class RecordingAlerts:
+    def __init__(self):
+        self.active = {}
+        self.raised = []
+
+    def raise_alert(self, key, message):
+        self.active[key] = message
+        self.raised.append(key)
+
+    def clear_alert(self, key):
+        del self.active[key]
+
+
+def _stream(printer, start, seconds, per_second, void_every=0, retry_every=0):
+    """Labels at a steady rate; every `void_every`-th one voided, every `retry_every`-th one retried first"""
+    events = []
+    count = int(seconds * per_second)
+    for i in range(count):
+        ts = start + i / per_second
+        if retry_every and i % retry_every == 0:
+            events.append(ProductionEvent(ts, RETRIED, printer, 1, i, b""))
+        kind = VOIDED if void_every and i % void_every == 0 else ENCODED
+        events.append(ProductionEvent(ts, kind, printer, 1, i, b""))
+    return events
+
+
+def _replay(stats, events, group=256):
+    for first in range(0, len(events), group):
+        stats.on_production_events(events[first:first + group])
+
+
+# -- window eviction ---------------------------------------------------------------
+
+def test_short_window_evicts_before_long_window():
+    window = PrinterWindow("ZT411-1")
+    window.add(T0, 1)
+    window.add(T0, 0)
+    assert window.long == [1, 1, 0] and window.short == [1, 1, 0]
+
+    window.add(T0 + SHORT_WINDOW_S, 0)  # the first bucket just left the short window
+    assert window.long == [2, 1, 0] and window.short == [1, 0, 0]
+
+    window.add(T0 + LONG_WINDOW_S, 2)   # ... and now the long one
+    assert window.long == [1, 0, 1] and window.short == [0, 0, 1]
+
+
+def test_running_sums_match_the_buckets_after_wrapping():
+    window = PrinterWindow("ZT411-1")
+    for second in range(0, 3 * LONG_WINDOW_S, 3):
+        window.add(T0 + second, second % 2)
+    newest = window.current
+    expected_long = [sum(counts[k] for counts in window.buckets) for k in range(3)]
+    expected_short = [sum(window.buckets[b % window.SLOTS][k] for b in range(newest - window.SHORT_SLOTS + 1,
+                                                                             newest + 1)) for k in range(3)]
+    assert window.long == expected_long and window.short == expected_short
+    assert sum(window.long) == LONG_WINDOW_S // 3
+
+
+def test_events_older_than_the_window_are_ignored():
+    window = PrinterWindow("ZT411-1")
+    window.add(T0 + LONG_WINDOW_S, 0)
+    window.add(T0, 1)                                # a whole window late
+    window.add(T0 + BUCKET_SECONDS, 1)              # still inside, but outside the short window
+    assert window.long == [1, 1, 0] and window.short == [1, 0, 0]
+
+
+def test_idle_printer_starts_over():
+    window = PrinterWindow("ZT411-1")
+    for i in range(50):
+        window.add(T0 + i, 1)
+    window.add(T0 + 49 + LONG_WINDOW_S + BUCKET_SECONDS, 0)
+    assert window.long == [1, 0, 0] and window.short == [1, 0, 0]
+    assert sum(sum(counts) for counts in window.buckets) == 1
+
+
+def test_dashboard_rate_window_drops_minutes_older_than_an_hour():
+    window = _RateWindow()
+    window.add(1000, 5)
+    window.add(1030, 2)
+    assert window.total(1030) == 7
+    assert window.total(1000 + BUCKETS) == 2
+    window.add(1000 + BUCKETS, 1)                   # reuses minute 1000's slot
+    window.add(1000, 9)                              # too old now: ignored
+    assert window.total(1000 + BUCKETS) == 3
+
+
+# -- z-score trend and rate thresholds -----------------------------------------------
+
+def test_trend_z_is_the_binomial_z_score_of_the_short_window():
+    window = PrinterWindow("ZT411-1")
+    for event in _stream("ZT411-1", T0, LONG_WINDOW_S - SHORT_WINDOW_S, 2, void_every=100):
+        window.add(event.ts, 1 if event.kind == VOIDED else 0)
+    for event in _stream("ZT411-1", T0 + LONG_WINDOW_S - SHORT_WINDOW_S, SHORT_WINDOW_S, 2, void_every=10):
+        window.add(event.ts, 1 if event.kind == VOIDED else 0)
+    short_labels, short_voids = 120, 12
+    p = 11 / 1080
+    assert window.trend_z() == pytest.approx((short_voids - short_labels * p) / math.sqrt(short_labels * p * (1 - p)))
+
+
+def test_steady_low_void_rate_raises_nothing():
+    alerts = RecordingAlerts()
+    stats = PrinterStats(alerts)
+    _replay(stats, _stream("ZT411-1", T0, 3 * LONG_WINDOW_S, 2, void_every=100))
+    assert alerts.raised == []
+    assert stats.snapshot()["ZT411-1"].void_rate == pytest.approx(0.01, abs=0.002)
+
+
+def test_bad_roll_raises_the_trend_alert_and_clears_after_it():
+    alerts = RecordingAlerts()
+    stats = PrinterStats(alerts)
+    _replay(stats, _stream("ZT411-1", T0, LONG_WINDOW_S, 2, void_every=100))
+    _replay(stats, _stream("ZT411-1", T0 + LONG_WINDOW_S, SHORT_WINDOW_S, 2, void_every=4))
+    assert "printer:ZT411-1:void_trend" in alerts.active
+    assert stats.snapshot()["ZT411-1"].void_trend_z > TREND_Z_ALERT
+
+    # Back to normal: the trend clears once the bad minute has left the short window
+    _replay(stats, _stream("ZT411-1", T0 + LONG_WINDOW_S + SHORT_WINDOW_S, 2 * SHORT_WINDOW_S, 2, void_every=100))
+    assert "printer:ZT411-1:void_trend" not in alerts.active
+    assert alerts.raised.count("printer:ZT411-1:void_trend") == 1
+
+
+def test_few_voids_never_count_as_a_trend():
+    alerts = RecordingAlerts()
+    stats = PrinterStats(alerts)
+    _replay(stats, _stream("ZT411-1", T0, LONG_WINDOW_S, 2))       # no voids at all: tiny baseline
+    _replay(stats, _stream("ZT411-1", T0 + LONG_WINDOW_S, SHORT_WINDOW_S, 2, void_every=20))
+    window = stats.windows["ZT411-1"]
+    assert window.trend_z() > TREND_Z_ALERT and window.short[1] < printer_stats.TREND_MIN_VOIDS
+    assert "printer:ZT411-1:void_trend" not in alerts.active
+
+
+def test_void_rate_alert_has_hysteresis_and_needs_enough_labels():
+    alerts = RecordingAlerts()
+    stats = PrinterStats(alerts)
+    _replay(stats, _stream("ZT411-1", T0, 40, 2, void_every=5))     # 20% voids, but only 80 labels
+    assert alerts.raised == []
+
+    _replay(stats, _stream("ZT411-1", T0 + 40, 200, 2, void_every=12))
+    assert "printer:ZT411-1:void_rate" in alerts.active
+
+    # Between the clear and the alert threshold the alert stays up
+    _replay(stats, _stream("ZT411-1", T0 + 240, LONG_WINDOW_S, 2, void_every=25))
+    assert 0.03 < stats.snapshot()["ZT411-1"].void_rate < 0.05
+    assert "printer:ZT411-1:void_rate" in alerts.active
+    _replay(stats, _stream("ZT411-1", T0 + 240 + LONG_WINDOW_S, LONG_WINDOW_S, 2, void_every=100))
+    assert "printer:ZT411-1:void_rate" not in alerts.active
+    assert alerts.raised.count("printer:ZT411-1:void_rate") == 1
+
+
+def test_retry_rate_alert_is_per_printer():
+    alerts = RecordingAlerts()
+    stats = PrinterStats(alerts)
+    events = sorted(_stream("ZT411-1", T0, 300, 2, retry_every=5) + _stream("ZT411-2", T0, 300, 2),
+                    key=lambda event: event.ts)
+    _replay(stats, events)
+    assert list(alerts.active) == ["printer:ZT411-1:retry_rate"]
+    assert stats.snapshot()["ZT411-1"].retry_rate == pytest.approx(0.2)
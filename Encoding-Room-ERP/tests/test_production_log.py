@@ -0,0 +1,109 @@
+import os
+import struct
+import zlib
+
+import pytest
+
+from core.production_log import (ENCODED, RETRIED, VOIDED, ProductionLog, _segment_paths, read_events,
+                                 read_segment)
+
+
+def _write(directory, count, printer="ZT411-1", start=0):
+    production_log = ProductionLog(str(directory))
+    seq = production_log.append_many([(ENCODED if tag % 10 else VOIDED, printer, 77, tag, tag.to_bytes(12, "big"),
+                                       1_700_000_000.0 + tag) for tag in range(start, start + count)])
+    assert production_log.wait(seq, timeout=5)
+    production_log.close()
+    return _segment_paths(str(directory))[-1]
+
+
+def _tags(directory):
+    return [event.tag for event in read_events(str(directory))]
+
+
+def _append_bytes(path, data):
+    with open(path, "ab") as handle:
+        handle.write(data)
+
+
+def test_events_round_trip(tmp_path):
+    production_log = ProductionLog(str(tmp_path))
+    seq = production_log.append_many([(ENCODED, "ZT411-1", 7, 0, b"\x30" * 12, 1.5),
+                                      (RETRIED, "ZT411-2", 7, 1, b"", 2.0),
+                                      (VOIDED, "ZT411-1", 8, 2, b"\x30" * 26, 2.5)])
+    assert production_log.wait(seq, timeout=5)
+    production_log.close()
+    events = list(read_events(str(tmp_path)))
+    assert [(e.ts, e.kind, e.printer, e.job_id, e.tag, len(e.epc)) for e in events] == [
+        (1.5, ENCODED, "ZT411-1", 7, 0, 12), (2.0, RETRIED, "ZT411-2", 7, 1, 0), (2.5, VOIDED, "ZT411-1", 8, 2, 26)]
+
+
+@pytest.mark.parametrize("tail", [
+    b"\x20\x00\xde\xad",                                   # torn frame header
+    struct.pack("<HI", 40, 0) + b"\x01" * 10,              # torn payload
+    b"\0" * 64,                                            # zero-filled (length 0, crc32(b"") == 0)
+    struct.pack("<HI", 1, zlib.crc32(b"\x01")) + b"\x01",  # too short for any record, valid CRC
+    struct.pack("<HI", 22, zlib.crc32(b"\x09" * 22)) + b"\x09" * 22,  # unknown kind, valid CRC
+], ids=["torn-header", "torn-payload", "zero-filled", "too-short", "unknown-kind"])
+def test_torn_tail_is_cut_off_on_reopen(tmp_path, tail):
+    path = _write(tmp_path, 50)
+    size = os.path.getsize(path)
+    _append_bytes(path, tail)
+    assert _tags(tmp_path) == list(range(50))              # readers stop at the tail
+
+    _write(tmp_path, 10, start=50)                         # reopening cuts it off, new events follow
+    assert _tags(tmp_path) == list(range(60))
+    assert os.path.getsize(path) > size
+
+
+def test_bad_crc_ends_the_readable_log(tmp_path):
+    path = _write(tmp_path, 20)
+    with open(path, "r+b") as handle:
+        data = handle.read()
+        handle.seek(len(data) - 3)                          # inside the last record's EPC
+        handle.write(b"\xff")
+    assert _tags(tmp_path) == list(range(19))
+    assert sum(1 for _ in read_segment(path)) == 19
+
+
+def test_failed_commit_is_rewound_and_retried(tmp_path):
+    class HalfWrite:
+        """Writes half of the group, then fails like a full disk"""
+        def __init__(self, file):
+            self.file = file
+            self.failures = 0
+
+        def write(self, data):
+            self.file.write(data[:len(data) // 2])
+            self.file.flush()
+            self.failures += 1
+            raise OSError(28, "No space left on device")
+
+        def __getattr__(self, name):
+            return getattr(self.file, name)
+
+    production_log = ProductionLog(str(tmp_path))
+    failing = production_log._file = HalfWrite(production_log._file)
+    seq = production_log.append_many([(ENCODED, "ZT411-9", 77, tag, tag.to_bytes(12, "big"), None)
+                                      for tag in range(100)])
+    assert production_log.wait(seq, timeout=10)             # the retry reopened the file and got through
+    bad = production_log.append(ENCODED, "ZT411-9", 77, -1, b"\0" * 12)  # tag must be unsigned: dropped
+    good = production_log.append(ENCODED, "ZT411-9", 77, 100, b"\1" * 12)
+    assert not production_log.wait(bad, timeout=5) and production_log.wait(good, timeout=5)
+    production_log.close()
+
+    assert failing.failures == 1 and production_log.dropped == 1
+    events = list(read_events(str(tmp_path)))
+    assert [event.tag for event in events] == list(range(101))
+    assert {event.printer for event in events} == {"ZT411-9"}  # the declaration was written again
+
+
+def test_segments_rotate_and_read_in_order(tmp_path):
+    production_log = ProductionLog(str(tmp_path), segment_bytes=2000)
+    for first in range(0, 300, 30):
+        seq = production_log.append_many([(ENCODED, "ZT411-1", 1, tag, b"\x30" * 12, None)
+                                          for tag in range(first, first + 30)])
+        production_log.wait(seq, timeout=5)
+    production_log.close()
+    assert len(_segment_paths(str(tmp_path))) > 1
+    assert _tags(tmp_path) == list(range(300))
@@ -0,0 +1,95 @@
+import pytest
+
+from core import epc_data_file, report_export
+from core.epc_data_file import generate_job_data
+from core.job_store import JobStore
+from core.production_log import ENCODED, RETRIED, ProductionLog
+from core.report_export import ProductionSource, TagSource, export_report
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), "station-a", 1)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """Data files currently open (opened by the report and not closed yet)"""
+    files = set()
+    original_init, original_close = epc_data_file.EpcDataFile.__init__, epc_data_file.EpcDataFile.close
+
+    def init(self, path):
+        original_init(self, path)
+        files.add(self)
+
+    def close(self):
+        files.discard(self)
+        original_close(self)
+
+    monkeypatch.setattr(epc_data_file.EpcDataFile, "__init__", init)
+    monkeypatch.setattr(epc_data_file.EpcDataFile, "close", close)
+    return files
+
+
+def _job(store, start_serial, count):
+    job_id = store.save_job({"customer": "ACME", "upc": "614141812345", "start_serial": start_serial,
+                             "end_serial": start_serial + count - 1, "lpr": 100})
+    generate_job_data(store.get_job(job_id)).close()
+    return job_id
+
+
+def test_tag_report_opens_one_data_file_at_a_time(store, opened, tmp_path):
+    job_ids = [_job(store, 1000 * (i + 1), 250) for i in range(3)]
+    source = TagSource(store, job_ids + [999], batch_rows=100)
+    assert not opened and source.total_rows == 750
+
+    seen = []
+    result = export_report(source, str(tmp_path / "tags.parquet"),
+                           progress=lambda rows, fraction: seen.append(len(opened)))
+    assert result.rows == 750 and result.skipped == [999]
+    assert max(seen) == 1 and not opened
+
+
+def test_cancelled_or_failed_tag_report_closes_its_data_file(store, opened, tmp_path):
+    job_ids = [_job(store, 1000 * (i + 1), 250) for i in range(2)]
+    with pytest.raises(InterruptedError):
+        export_report(TagSource(store, job_ids, batch_rows=100), str(tmp_path / "tags.parquet"),
+                      cancelled=lambda: True)
+    assert not opened
+
+    def failing_write(self, batch):
+        raise OSError("disk full")
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(report_export.ParquetSink, "write", failing_write)
+        with pytest.raises(OSError):
+            export_report(TagSource(store, job_ids, batch_rows=100), str(tmp_path / "tags.parquet"))
+    assert not opened
+
+
+def test_tag_report_skips_stale_data_files(store, tmp_path):
+    current, stale = _job(store, 1000, 250), _job(store, 5000, 250)
+    store.set_job_fields(stale, start_serial=6000, end_serial=6249)
+    result = export_report(TagSource(store, [current, stale]), str(tmp_path / "tags.parquet"))
+    assert result.rows == 250 and result.skipped == [stale]
+
+
+@pytest.mark.parametrize("epcs", [[b"", b""], [bytes(range(12)), bytes(range(26)), b"", b"\xff" * 12]],
+                         ids=["all-empty", "mixed-lengths"])
+def test_production_report_hex_follows_each_epc_length(store, tmp_path, epcs):
+    import pyarrow.parquet as pq
+
+    job_id = _job(store, 1000, 10)
+    production_log = ProductionLog(str(tmp_path / "production"))
+    seq = production_log.append_many([(RETRIED if not epc else ENCODED, "ZT-1", job_id, tag, epc, 1000.0 + tag)
+                                      for tag, epc in enumerate(epcs)])
+    assert production_log.wait(seq, timeout=5)
+    production_log.close()
+
+    result = export_report(ProductionSource(store, directory=str(tmp_path / "production")),
+                           str(tmp_path / "production.parquet"))
+    assert result.rows == len(epcs)
+    assert pq.read_table(str(tmp_path / "production.parquet")).column("epc").to_pylist() == \
+        [epc.hex().upper() for epc in epcs]
@@ -0,0 +1,112 @@
+import itertools
+import random
+
+import pytest
+
+from core.scheduler import Printer, SchedJob, Scheduler, changeover
+
+
+def _instance(seed, n_jobs=5, n_printers=2):
+    rng = random.Random(seed)
+    printers = [Printer(f"P{i}", rng.choice([100, 150, 200]), label_sizes=None if i else ["4x2", "4x6"],
+                        label_size=rng.choice(["4x2", "2x1"]), inlay_type="A", ribbon=rng.choice(["W", "R"]))
+                for i in range(n_printers)]
+    jobs = []
+    for job_id in range(n_jobs):
+        labels = rng.choice([500, 1000, 2000, 5000])
+        jobs.append(SchedJob(job_id, labels, -(-labels // 1000), rng.choice(["4x2", "2x1", "4x6"]),
+                             rng.choice(["A", "B"]), rng.choice(["W", "R"]), rng.choice([1.0, 1.0, 5.0])))
+    return printers, jobs
+
+
+def _sequence_cost(printer, jobs):
+    before, now, cost = printer, 0.0, 0.0
+    for job in jobs:
+        now += changeover(before, job) + printer.run_minutes(job)
+        cost += job.weight * now
+        before = job
+    return cost
+
+
+def _brute_force(printers, jobs):
+    """Lowest cost over every printer assignment and order of whole jobs"""
+    best = float("inf")
+    for order in itertools.permutations(jobs):
+        for where in itertools.product(range(len(printers)), repeat=len(jobs)):
+            if all(printers[index].can_print(job) for job, index in zip(order, where)):
+                best = min(best, sum(_sequence_cost(printer, [job for job, index in zip(order, where) if index == i])
+                                     for i, printer in enumerate(printers)))
+    return best
+
+
+def _recomputed_cost(scheduler):
+    """cost() from schedule(): each job's weight times the end of its last part"""
+    ends = {}
+    for assignment in scheduler.schedule():
+        ends[assignment.job_id] = max(ends.get(assignment.job_id, 0.0), assignment.end)
+    return sum(scheduler.jobs[job_id].weight * end for job_id, end in ends.items())
+
+
+def _assert_rolls_covered(scheduler):
+    rolls = {}
+    for assignment in scheduler.schedule():
+        rolls.setdefault(assignment.job_id, []).extend(range(assignment.first_roll,
+                                                             assignment.first_roll + assignment.rolls))
+    for job_id, job in scheduler.jobs.items():
+        if job_id not in scheduler.unassigned:
+            assert sorted(rolls[job_id]) == list(range(1, job.rolls + 1))
+
+
+def test_local_search_is_close_to_the_brute_force_optimum():
+    ratios = []
+    for seed in range(20):
+        printers, jobs = _instance(seed)
+        scheduler = Scheduler(printers, jobs)
+        scheduler.plan(split=False)
+        optimum = _brute_force(printers, jobs)
+        assert scheduler.cost() >= optimum - 1e-6
+        ratios.append(scheduler.cost() / optimum)
+    assert max(ratios) < 1.10
+    assert sum(ratios) / len(ratios) < 1.02
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_roll_splitting_never_costs_more(seed):
+    printers, jobs = _instance(seed, n_jobs=12, n_printers=3)
+    whole = Scheduler(printers, jobs)
+    whole.plan(split=False)
+    scheduler = Scheduler(printers, jobs)
+    scheduler.plan()
+    assert scheduler.cost() <= whole.cost() + 1e-6
+    assert scheduler.cost() == pytest.approx(_recomputed_cost(scheduler))
+    _assert_rolls_covered(scheduler)
+
+
+def test_large_job_is_split_across_identical_printers():
+    printers = [Printer(f"P{i}", 100, label_size="4x2", inlay_type="A", ribbon="W") for i in range(2)]
+    scheduler = Scheduler(printers, [SchedJob(1, 10_000, 10, "4x2", "A", "W", 1.0)])
+    assignments = scheduler.plan()
+    assert sorted(assignment.printer for assignment in assignments) == ["P0", "P1"]
+    assert sorted(assignment.rolls for assignment in assignments) == [5, 5]
+    _assert_rolls_covered(scheduler)
+    assert scheduler.cost() == pytest.approx(_recomputed_cost(scheduler)) == pytest.approx(57.5)
+
+
+def test_cost_stays_exact_through_re_plans():
+    printers, jobs = _instance(3, n_jobs=15, n_printers=3)
+    jobs.append(SchedJob(99, 20_000, 20, "4x2", "A", "W", 5.0))
+    scheduler = Scheduler(printers, jobs)
+    scheduler.plan()
+    assert 99 in scheduler.shares
+
+    first = scheduler.start_job(99)
+    assert first == next(iter(scheduler.shares[99]))
+    scheduler.add_job(SchedJob(100, 3000, 3, "2x1", "B", "R", 1.0))
+    for step in (lambda: scheduler.printer_down("P1"), lambda: scheduler.printer_up("P1"),
+                 lambda: scheduler.remove_job(0)):
+        step()
+        assert scheduler.cost() == pytest.approx(_recomputed_cost(scheduler))
+        _assert_rolls_covered(scheduler)
+        # A started job stays first on the printers it is running on
+        for name in scheduler.pinned.get(99, ()):
+            assert scheduler.sequences[name][0] == 99
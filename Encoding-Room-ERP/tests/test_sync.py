@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+from core.job_store import JobStore
+from core.sync import SyncClient, SyncHub, serve_hub
+
+
+@pytest.fixture
+def hub_url(tmp_path):
+    server = serve_hub(str(tmp_path / "hub.db"), "127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def stations(tmp_path):
+    a = JobStore(str(tmp_path / "a.db"), "station-a", 1)
+    b = JobStore(str(tmp_path / "b.db"), "station-b", 2)
+    yield a, b
+    a.close()
+    b.close()
+
+
+def test_pending_local_edit_wins_over_older_remote_edit(hub_url, stations):
+    a, b = stations
+    client_a, client_b = SyncClient(a, hub_url), SyncClient(b, hub_url)
+    job_id = a.save_job({"customer": "ACME", "status": "Pending", "qty": 100})
+    client_a.sync_once()
+    client_b.sync_once()
+
+    # A's edit reaches the hub first; B edits the same field before it has pulled it
+    a.set_job_fields(job_id, status="On Hold", printer="ZT411-3")
+    client_a.sync_once()
+    b.set_job_fields(job_id, status="Completed")
+    b.set_step(job_id, 7, "initials", "BB")
+    a.set_step(job_id, 7, "initials", "AA")
+    client_a.sync_once()
+    client_b.sync_once()
+    client_a.sync_once()
+
+    for store in (a, b):
+        job = store.get_job(job_id)
+        assert job.status == "Completed"        # B's pending edit is sequenced last on the hub
+        assert job.printer == "ZT411-3"         # the other fields of A's change still apply
+        assert store.get_steps(job_id)[7]["initials"] == "BB"
+
+
+def test_remote_edit_applies_once_local_edit_was_pushed(hub_url, stations):
+    a, b = stations
+    client_a, client_b = SyncClient(a, hub_url), SyncClient(b, hub_url)
+    job_id = b.save_job({"customer": "ACME", "status": "Pending"})
+    client_b.sync_once()
+    client_a.sync_once()
+
+    a.set_job_fields(job_id, status="In Progress")
+    client_a.sync_once()
+    assert client_b.sync_once() == (1, 0)
+    assert b.get_job(job_id).status == "In Progress"
+
+
+def test_sync_resumes_from_the_last_seen_position(hub_url, stations, tmp_path):
+    a, b = stations
+    client_a = SyncClient(a, hub_url)
+    a.save_jobs({"job_ticket": f"JT-{i}", "qty": i} for i in range(50))
+    assert client_a.sync_once() == (0, 50)
+    assert client_a.sync_once() == (0, 0)               # own changes are neither re-pushed nor pulled back
+
+    assert SyncClient(b, hub_url).sync_once() == (50, 0)
+    b.close()
+
+    # A new session on the same store picks up after the saved hub position
+    a.set_job_fields(int(a.changes_since(0, 1)[0].key), status="Completed")
+    SyncClient(a, hub_url).sync_once()
+    reopened = JobStore(str(tmp_path / "b.db"), "station-b", 2)
+    try:
+        assert SyncClient(reopened, hub_url).sync_once() == (1, 0)
+        assert reopened.count_jobs() == 50
+    finally:
+        reopened.close()
+
+
+def test_pull_pages_through_a_long_feed(tmp_path):
+    hub = SyncHub(str(tmp_path / "hub.db"))
+    hub.push("station-a", [[seq, "job", str(seq), {"qty": seq}] for seq in range(1, 8)])
+    first = hub.pull(0, limit=5)
+    assert len(first["changes"]) == 5 and first["more"]
+    second = hub.pull(first["next"], limit=5)
+    assert [change[1] for change in second["changes"]] == [6, 7] and not second["more"]
+    assert hub.pull(second["next"], limit=5) == {"changes": [], "next": second["next"], "more": False}
+
+
+def test_retried_push_is_not_sequenced_twice(tmp_path):
+    hub = SyncHub(str(tmp_path / "hub.db"))
+    changes = [[1, "job", "101", {"qty": 1}], [2, "step", "101:7:initials", "AA"]]
+    head = hub.push("station-a", changes)
+    assert hub.push("station-a", changes) == head == 2
+    # A station's own changes are filtered out of its pull, but the position still advances
+    assert hub.pull(0, exclude_origin="station-a") == {"changes": [], "next": 2, "more": False}
+
+
+def test_failed_push_is_rolled_back(tmp_path):
+    hub = SyncHub(str(tmp_path / "hub.db"))
+    with pytest.raises(TypeError):
+        hub.push("station-a", [[1, "job", "101", {"qty": 1}], [2, "job", "102", {"due": object()}]])
+    assert hub.push("station-a", [[1, "job", "101", {"qty": 1}]]) == 1
+    assert [change[1] for change in hub.pull(0)["changes"]] == [1]
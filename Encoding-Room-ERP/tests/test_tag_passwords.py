@@ -0,0 +1,115 @@
+import hashlib
+import re
+
+import numpy as np
+import pytest
+
+from core import config
+from core.encode_export import export_job
+from core.epc_data_file import generate_job_data
+from core.job_records import JobRecord
+from core.tag_passwords import (KEY_BYTES, TagKeyError, create_master_key, derive_passwords, job_passwords,
+                                job_secret, master_key, tag_passwords, to_hex)
+
+KEY = bytes(range(KEY_BYTES))
+EPC = "3074257BF7194E4000001A85"
+
+
+@pytest.fixture(autouse=True)
+def no_key_in_environment(monkeypatch):
+    monkeypatch.setattr(config, "TAG_PASSWORD_KEY", "")
+
+
+@pytest.fixture
+def data_file(data_dir):
+    data_file = generate_job_data(JobRecord.from_dict({"job_id": 42, "upc": "614141812345", "start_serial": 1000,
+                                                       "end_serial": 1249, "lpr": 100}))
+    yield data_file
+    data_file.close()
+
+
+def test_passwords_derive_from_the_key_as_specified():
+    # The derivation in the module header, spelled out with hashlib
+    secret = hashlib.blake2b(b"job:42", key=KEY, digest_size=32, person=b"ERPJobSecret").digest()
+    digest = hashlib.blake2b(bytes.fromhex(EPC), key=secret, digest_size=8, person=b"ERPTagPassword").hexdigest()
+    assert job_secret(42, key=KEY) == secret
+    assert tag_passwords(secret, EPC) == (digest[:8].upper(), digest[8:].upper())
+    # Pinned: a change here locks tags with passwords no older station can derive
+    assert tag_passwords(secret, EPC) == ("80AD9666", "8032B04C")
+
+
+def test_passwords_differ_per_tag_and_per_job(data_file):
+    secret = job_secret(42, key=KEY)
+    access, kill = derive_passwords(secret, data_file.epcs)
+    assert len(set(access.tolist())) == len(set(kill.tolist())) == len(data_file)
+    assert (access != 0).all() and (kill != 0).all()
+    assert (access != kill).all()
+    for tag in (0, 137, 249):
+        assert tag_passwords(secret, data_file.epc(tag)) == (f"{int(access[tag]):08X}", f"{int(kill[tag]):08X}")
+
+    other_access, _ = derive_passwords(job_secret(43, key=KEY), data_file.epcs)
+    assert not (other_access == access).any()
+    other_key = bytes(reversed(KEY))
+    assert not (derive_passwords(job_secret(42, key=other_key), data_file.epcs)[0] == access).any()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_job_passwords_in_ranges_match_the_bulk_derivation(data_file, workers):
+    secret = job_secret(42, key=KEY)
+    access, kill = derive_passwords(secret, data_file.epcs)
+    ranges = [(0, 10), (10, 10), (100, 200), (240, 250)]
+    results = list(job_passwords(data_file, secret, ranges, workers=workers, chunk_size=32))
+    assert len(results) == len(ranges)
+    for (start, stop), (a, k) in zip(ranges, results):
+        assert np.array_equal(a, access[start:stop]) and np.array_equal(k, kill[start:stop])
+
+
+def test_master_key_sources(data_dir, monkeypatch):
+    with pytest.raises(TagKeyError, match="no tag password key"):
+        master_key()
+    key = create_master_key()
+    assert master_key() == key and len(key) == KEY_BYTES
+    with pytest.raises(TagKeyError, match="already configured"):
+        create_master_key()
+
+    monkeypatch.setattr(config, "TAG_PASSWORD_KEY", KEY.hex())
+    assert master_key() == KEY
+    assert job_secret(42) == job_secret(42, key=KEY)
+    monkeypatch.setattr(config, "TAG_PASSWORD_KEY", "abcd")
+    with pytest.raises(TagKeyError, match="32 bytes"):
+        master_key()
+
+
+def test_locked_zpl_sets_and_locks_each_tags_passwords(data_file, data_dir):
+    secret = job_secret(42, key=KEY)
+    path = str(data_dir / "job-42.zpl")
+    assert export_job(data_file, path, "zpl", chunk_size=64, secret=secret) == 250
+    with open(path, encoding="ascii") as handle:
+        labels = handle.read().splitlines()
+
+    access, kill = (to_hex(values) for values in derive_passwords(secret, data_file.epcs))
+    assert len(labels) == 250
+    for tag, label in enumerate(labels):
+        epc = data_file.hex(tag)
+        # The EPC is written first, then the passwords, then access / kill / EPC banks are locked
+        assert label.startswith(f"^XA^RFW,H,,,A^FD{epc}^FS")
+        assert re.findall(r"\^RZ(\w+),(\w),L\^FS", label) == [(access[tag], "A"), (kill[tag], "K"),
+                                                               (access[tag], "E")]
+        assert label.index("^RFW") < label.index("^RZ")
+
+    unlocked = str(data_dir / "open.zpl")
+    export_job(data_file, unlocked, "zpl")
+    with open(unlocked, encoding="ascii") as handle:
+        assert "^RZ" not in handle.read()
+
+
+def test_locked_csv_carries_the_passwords(data_file, data_dir):
+    secret = job_secret(42, key=KEY)
+    path = str(data_dir / "job-42.csv")
+    export_job(data_file, path, "csv", secret=secret)
+    with open(path, encoding="ascii") as handle:
+        rows = [line.split(",") for line in handle.read().splitlines()]
+    assert rows[0] == ["Tag", "Roll", "EPC", "AccessPwd", "KillPwd"]
+    for tag in (0, 99, 100, 249):
+        assert rows[tag + 1] == [str(tag + 1), str(tag // 100 + 1), data_file.hex(tag),
+                                 *tag_passwords(secret, data_file.hex(tag))]
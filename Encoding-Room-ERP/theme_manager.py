@@ -1,5 +1,6 @@
 from PyQt6.QtGui import QPalette, QColor, QFont
 from PyQt6.QtWidgets import QApplication
+from core.event_bus import EVENT_BUS, THEME_CHANGED
 
 LIGHT_THEME = {
     "WINDOW_BACKGROUND": "#f8f9fa",
@@ -61,9 +62,6 @@ class ThemeManager:
     _instance = None
     current_theme_name = "light"
     themes = {"light": LIGHT_THEME, "dark": DARK_THEME}
-    
-    # Signals or callbacks could be added here to notify widgets of theme changes
-    theme_changed_callbacks = []
 
     def __new__(cls):
         if cls._instance is None:
@@ -79,8 +77,8 @@ class ThemeManager:
         else:
             self.current_theme_name = "light"
         self.apply_theme_to_app()
-        for callback in self.theme_changed_callbacks:
-            callback()
+        # Widgets restyle on the next frame, all in one pass
+        EVENT_BUS.publish(THEME_CHANGED, None, self.current_theme_name)
 
     def apply_theme_to_app(self):
         app = QApplication.instance()
@@ -116,12 +114,10 @@ class ThemeManager:
         pass
 
     def register_for_theme_updates(self, callback):
-        if callback not in self.theme_changed_callbacks:
-            self.theme_changed_callbacks.append(callback)
+        EVENT_BUS.subscribe(THEME_CHANGED, callback, with_events=False)
 
     def unregister_for_theme_updates(self, callback):
-        if callback in self.theme_changed_callbacks:
-            self.theme_changed_callbacks.remove(callback)
+        EVENT_BUS.unsubscribe(THEME_CHANGED, callback)
 
 # Initialize a singleton instance
 THEME_MANAGER = ThemeManager() 
\ No newline at end of file
@@ -0,0 +1,186 @@
+from PyQt6.QtWidgets import (
+    QDialog, QWidget, QLabel, QVBoxLayout, QHBoxLayout, QGridLayout, QGroupBox, QCheckBox, QLineEdit,
+    QPushButton, QScrollArea
+)
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QFont
+from theme_manager import THEME_MANAGER
+from core.checklist import (APPROVAL_STEP, APPROVALS, CHECKLIST_STEPS, CHECKLIST_VERSION, DATE_FIELD, job_defaults,
+                            stored_values, value_name)
+from views.form_autosave import FormAutosave
+
+def draft_key(job_id):
+    return f"checklist:{job_id}"
+
+class ChecklistForm(QDialog):
+    """Encoding Checklist entry for one job; every edit is autosaved until Save writes it to the job store"""
+
+    def __init__(self, job_id, job_store, autosave, parent=None):
+        super().__init__(parent)
+        self.job_id = job_id
+        self.job_store = job_store
+        self.form = FormAutosave(autosave, draft_key(job_id),
+                                 on_error=lambda field, message: self.status.setText(f"Not autosaved: {message}"))
+        self.setWindowTitle(f"Encoding Checklist {CHECKLIST_VERSION} - Job {job_id}")
+        self.resize(640, 720)
+        self.setup_ui()
+        self.stored = stored_values(job_store, job_id)
+        job = job_store.get_job(job_id)
+        self.initial = dict(job_defaults(job) if job is not None else {}, **self.stored)
+        draft = self.form.load(self.initial)
+        if draft:
+            self.status.setText(f"Restored {len(draft)} unsaved change{'s' if len(draft) != 1 else ''} "
+                                f"from the last session")
+        THEME_MANAGER.register_for_theme_updates(self.update_theme_stylesheet)
+        self.update_theme_stylesheet()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(24, 24, 24, 24)
+        layout.setSpacing(12)
+
+        title = QLabel(f"Job {self.job_id}")
+        title.setObjectName("formTitle")
+        title.setFont(QFont("Segoe UI", 16, QFont.Weight.Bold))
+        layout.addWidget(title)
+
+        steps = QWidget()
+        steps_layout = QVBoxLayout(steps)
+        steps_layout.setContentsMargins(0, 0, 0, 0)
+        for step in CHECKLIST_STEPS:
+            box = QGroupBox(f"{step.number}. {step.title}".replace("&", "&&"))
+            box.setObjectName("stepBox")
+            box_layout = QVBoxLayout(box)
+            box_layout.setSpacing(6)
+            for item in step.items:
+                row = QHBoxLayout()
+                row.addSpacing(item.level * 20)
+                if item.kind == "check":
+                    widget = QCheckBox(item.label.replace("&", "&&"))
+                    row.addWidget(widget, 1)
+                else:
+                    widget = QLineEdit()
+                    widget.setObjectName("valueInput")
+                    label = QLabel(f"{item.label}:")
+                    label.setMinimumWidth(80)
+                    row.addSpacing(20)
+                    row.addWidget(label)
+                    row.addWidget(widget, 1)
+                self.form.bind(value_name(step.number, item.field), widget)
+                box_layout.addLayout(row)
+            steps_layout.addWidget(box)
+
+        approvals = QGroupBox("Approvals")
+        approvals.setObjectName("stepBox")
+        approvals_layout = QGridLayout(approvals)
+        for row, (field, label) in enumerate(APPROVALS + ((DATE_FIELD, "Date"),)):
+            edit = QLineEdit()
+            edit.setObjectName("valueInput")
+            self.form.bind(value_name(APPROVAL_STEP, field), edit)
+            approvals_layout.addWidget(QLabel(f"{label}:"), row, 0)
+            approvals_layout.addWidget(edit, row, 1)
+        steps_layout.addWidget(approvals)
+
+        scroll = QScrollArea()
+        scroll.setObjectName("stepsScroll")
+        scroll.setWidgetResizable(True)
+        scroll.setWidget(steps)
+        layout.addWidget(scroll, 1)
+
+        buttons = QHBoxLayout()
+        self.status = QLabel("Changes are kept automatically until you save")
+        self.status.setObjectName("formStatus")
+        discard_button = QPushButton("Discard Changes")
+        discard_button.setObjectName("secondaryButton")
+        discard_button.clicked.connect(self.discard_changes)
+        save_button = QPushButton("Save")
+        save_button.setObjectName("saveButton")
+        save_button.setCursor(Qt.CursorShape.PointingHandCursor)
+        save_button.clicked.connect(self.save)
+        buttons.addWidget(self.status, 1)
+        buttons.addWidget(discard_button)
+        buttons.addWidget(save_button)
+        layout.addLayout(buttons)
+
+    def save(self):
+        """Write the changed fields to the job store; the draft is dropped once they are committed"""
+        for name, value in self.form.values().items():
+            # Fields never saved before are only written once they hold something
+            changed = value != self.stored[name] if name in self.stored else value not in (False, "")
+            if changed:
+                step, field = name.split(":", 1)
+                self.job_store.set_step(self.job_id, int(step), field, value)
+                self.stored[name] = value
+        self.form.discard()
+        self.accept()
+
+    def discard_changes(self):
+        self.form.discard()
+        self.form.load(self.initial)
+        self.status.setText("Unsaved changes discarded")
+
+    def update_theme_stylesheet(self):
+        theme = THEME_MANAGER.current()
+        self.setStyleSheet(f"""
+            QDialog, QScrollArea#stepsScroll, QScrollArea#stepsScroll > QWidget > QWidget {{
+                background-color: {theme["WINDOW_BACKGROUND"]};
+            }}
+            QLabel {{
+                color: {theme["SECONDARY_TEXT"]};
+            }}
+            QLabel#formTitle {{
+                color: {theme["PRIMARY_TEXT"]};
+            }}
+            QLabel#formStatus {{
+                color: {theme["MUTED_TEXT"]};
+            }}
+            QGroupBox#stepBox {{
+                color: {theme["PRIMARY_TEXT"]};
+                font-weight: 600;
+                border: 1px solid {theme["BORDER_COLOR"]};
+                border-radius: 8px;
+                margin-top: 12px;
+                padding: 12px 8px 8px 8px;
+            }}
+            QGroupBox#stepBox::title {{
+                subcontrol-origin: margin;
+                left: 10px;
+                padding: 0 4px;
+            }}
+            QCheckBox {{
+                color: {theme["PRIMARY_TEXT"]};
+                font-weight: normal;
+            }}
+            QLineEdit#valueInput {{
+                background-color: {theme["CONTENT_BACKGROUND"]};
+                color: {theme["PRIMARY_TEXT"]};
+                border: 1px solid {theme["BORDER_COLOR"]};
+                border-radius: 6px;
+                padding: 4px 6px;
+            }}
+            QPushButton#saveButton {{
+                background-color: {theme["PRIMARY_ACCENT"]};
+                color: {theme["PRIMARY_ACCENT_TEXT"]};
+                border: none;
+                border-radius: 6px;
+                padding: 8px 16px;
+                font-weight: 500;
+            }}
+            QPushButton#saveButton:hover {{
+                background-color: {theme["PRIMARY_ACCENT_HOVER"]};
+            }}
+            QPushButton#saveButton:pressed {{
+                background-color: {theme["PRIMARY_ACCENT_PRESSED"]};
+            }}
+            QPushButton#secondaryButton {{
+                background-color: transparent;
+                color: {theme["SECONDARY_TEXT"]};
+                border: 1px solid {theme["BORDER_COLOR"]};
+                border-radius: 6px;
+                padding: 8px 16px;
+            }}
+        """)
+
+    def done(self, result):
+        THEME_MANAGER.unregister_for_theme_updates(self.update_theme_stylesheet)
+        super().done(result)
@@ -2,14 +2,21 @@ from PyQt6.QtWidgets import (
     QWidget, QLabel, QVBoxLayout, QHBoxLayout, QPushButton, 
     QFrame, QGridLayout, QSpacerItem, QSizePolicy
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QFont, QIcon
+from instrumentation import TRACER
 from theme_manager import THEME_MANAGER
+from core.event_bus import ALERT, EVENT_BUS, JOBS_CHANGED, PRODUCTION
 
 class DashboardView(QWidget):
-    def __init__(self, parent=None):
+    REFRESH_INTERVAL_MS = 10000  # only for the rolling tags/h window and the day rollover
+    REFRESH_TOPICS = (JOBS_CHANGED, PRODUCTION, ALERT)
+
+    def __init__(self, metrics=None, parent=None):
         super().__init__(parent)
         self.setObjectName("dashboardView")
+        self.metrics = metrics  # DashboardMetrics; cards read its snapshot, never the database
+        self.card_values = {}
 
         # 1. Initialize main layout for the view
         main_layout = QVBoxLayout(self)
@@ -43,6 +50,12 @@ class DashboardView(QWidget):
         self.cards_layout = QHBoxLayout(self.cards_layout_widget)
         self.cards_layout.setContentsMargins(0,0,0,0)
         self.cards_layout.setSpacing(25)
+
+        # Per-printer throughput line under the cards
+        self.printer_rates_label = QLabel("")
+        self.printer_rates_label.setObjectName("printerRates")
+        self.printer_rates_label.setFont(QFont("Segoe UI", 10))
+        self.printer_rates_label.setWordWrap(True)
         
         # Quick Actions Section elements
         self.quick_actions_frame = QFrame()
@@ -76,10 +89,20 @@ class DashboardView(QWidget):
         main_layout.addWidget(self.welcome_frame)
         main_layout.addSpacerItem(QSpacerItem(20, 15, QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Fixed))
         main_layout.addWidget(self.cards_layout_widget) # This contains the cards_layout with cards
+        main_layout.addWidget(self.printer_rates_label)
         main_layout.addSpacerItem(QSpacerItem(20, 25, QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Fixed))
         main_layout.addWidget(self.quick_actions_frame)
         main_layout.addStretch()
 
+        # Live counters: refreshed at most once per frame while jobs, production or alerts change
+        if self.metrics is not None:
+            for topic in self.REFRESH_TOPICS:
+                EVENT_BUS.subscribe(topic, self.refresh_metrics, with_events=False)
+            self.refresh_timer = QTimer(self)
+            self.refresh_timer.timeout.connect(self.refresh_metrics)
+            self.refresh_timer.start(self.REFRESH_INTERVAL_MS)
+            self.refresh_metrics()
+
     def populate_summary_cards(self):
         if not hasattr(self, 'cards_layout') or self.cards_layout is None:
             return # Guard against calls before cards_layout is fully initialized
@@ -90,24 +113,52 @@ class DashboardView(QWidget):
             if widget: widget.deleteLater()
 
         theme = THEME_MANAGER.current()
-        active_jobs_count = 12
-        completed_today_count = 35
-        system_alerts_count = 2
-
-        self.cards_layout.addWidget(self.create_summary_card(
-            "Active Jobs", str(active_jobs_count), "Jobs currently in progress", "📘", 
-            icon_color=theme["ICON_COLOR"], value_color=theme["SUCCESS_COLOR"]
-        ))
-        self.cards_layout.addWidget(self.create_summary_card(
-            "Completed Today", str(completed_today_count), "Labels printed successfully", "✅", 
-            icon_color=theme["ICON_COLOR"], value_color=theme["SUCCESS_COLOR"]
-        ))
-        self.cards_layout.addWidget(self.create_summary_card(
-            "System Alerts", str(system_alerts_count), "Requires attention", "⚠️", 
-            icon_color=theme["ALERT_COLOR"],  # Provide a base icon color (can be alert color)
-            value_color=theme["ALERT_COLOR"], # Provide a base value color (will be overridden by alert_color logic for value)
-            alert_color=theme["ALERT_COLOR"]
-        ))
+        snapshot = self.metrics.snapshot() if self.metrics is not None else None
+        active_jobs_count = snapshot.active_jobs if snapshot else 0
+        completed_today_count = snapshot.completed_today if snapshot else 0
+        system_alerts_count = len(snapshot.alerts) if snapshot else 0
+
+        cards = [
+            ("active_jobs", self.create_summary_card(
+                "Active Jobs", f"{active_jobs_count:,}", "Jobs currently in progress", "📘", 
+                icon_color=theme["ICON_COLOR"], value_color=theme["SUCCESS_COLOR"]
+            )),
+            ("completed_today", self.create_summary_card(
+                "Completed Today", f"{completed_today_count:,}", "Jobs completed today", "✅", 
+                icon_color=theme["ICON_COLOR"], value_color=theme["SUCCESS_COLOR"]
+            )),
+            ("system_alerts", self.create_summary_card(
+                "System Alerts", f"{system_alerts_count:,}", "Requires attention", "⚠️", 
+                icon_color=theme["ALERT_COLOR"],  # Provide a base icon color (can be alert color)
+                value_color=theme["ALERT_COLOR"], # Provide a base value color (will be overridden by alert_color logic for value)
+                alert_color=theme["ALERT_COLOR"]
+            )),
+        ]
+        self.card_values = {}
+        for key, card in cards:
+            self.cards_layout.addWidget(card)
+            self.card_values[key] = card.findChild(QLabel, "cardValue")
+
+    @TRACER.traced("DashboardView.refresh_metrics", "view")
+    def refresh_metrics(self):
+        # Only the value texts change; the cards themselves are rebuilt on theme changes
+        snapshot = self.metrics.snapshot()
+        values = {
+            "active_jobs": snapshot.active_jobs,
+            "completed_today": snapshot.completed_today,
+            "system_alerts": len(snapshot.alerts),
+        }
+        for key, value in values.items():
+            label = self.card_values.get(key)
+            if label is not None:
+                label.setText(f"{value:,}")
+        if self.card_values.get("system_alerts") is not None:
+            self.card_values["system_alerts"].setToolTip("\n".join(snapshot.alerts.values()))
+        if self.card_values.get("completed_today") is not None:
+            self.card_values["completed_today"].setToolTip(
+                f"{snapshot.labels_today:,} labels encoded, {snapshot.voided_today:,} voided today")
+        self.printer_rates_label.setText("  ·  ".join(
+            f"{printer}: {rate:,} tags/h" for printer, rate in snapshot.tags_per_hour.items()))
 
     def update_theme_stylesheet(self):
         theme = THEME_MANAGER.current()
@@ -129,6 +180,9 @@ class DashboardView(QWidget):
             QLabel#quickActionsTitle {{
                 color: {theme["PRIMARY_TEXT"]};
             }}
+            QLabel#printerRates {{
+                color: {theme["MUTED_TEXT"]};
+            }}
             QLabel.cardIcon {{ /* Style applied in create_summary_card */ }}
             QLabel.cardTitle {{
                 color: {theme["PRIMARY_TEXT"]};
@@ -229,4 +283,6 @@ class DashboardView(QWidget):
         return button
 
     def __del__(self):
-        THEME_MANAGER.unregister_for_theme_updates(self.update_theme_stylesheet) 
\ No newline at end of file
+        THEME_MANAGER.unregister_for_theme_updates(self.update_theme_stylesheet)
+        for topic in self.REFRESH_TOPICS:
+            EVENT_BUS.unsubscribe(topic, self.refresh_metrics) 
\ No newline at end of file
@@ -0,0 +1,46 @@
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from instrumentation import TRACER
+
+class EpcDataModel(QAbstractTableModel):
+    """Read-only model over one roll of a memory-mapped EpcDataFile; only visible rows are ever read"""
+    COLUMNS = ["Tag #", "EPC (HEX)", "EPC URI"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.data_file = None
+        self.scheme = None
+        self.first = 0
+        self.last = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.last - self.first
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        tag = self.first + index.row()
+        column = index.column()
+        if column == 0:
+            return str(tag + 1)
+        if column == 1:
+            return self.data_file.hex(tag)
+        if self.scheme is None:
+            return ""
+        return self.scheme.uri(self.scheme.decode(self.data_file[tag:tag + 1]), 0)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    @TRACER.traced("EpcDataModel.show_roll", "model")
+    def show_roll(self, data_file, roll):
+        from core.epc_schemes import SCHEMES  # NumPy; only loaded once a data file is shown
+        self.beginResetModel()
+        self.data_file = data_file
+        self.scheme = SCHEMES.get(data_file.scheme) if data_file is not None else None
+        self.first, self.last = data_file.roll_range(roll) if data_file is not None else (0, 0)
+        self.endResetModel()
@@ -0,0 +1,98 @@
+import logging
+
+from PyQt6.QtCore import QDate
+from PyQt6.QtWidgets import QCheckBox, QComboBox, QDateEdit, QDoubleSpinBox, QLineEdit, QPlainTextEdit, QSpinBox
+
+log = logging.getLogger(__name__)
+
+
+class FormAutosave:
+    """Binds form widgets to one Autosave draft: every user edit is journaled as it happens
+
+    on_error(field, message) is called when an edit cannot be autosaved (e.g. a value over the
+    journal's record size); the edit stays in the widget and is saved with the form.
+    """
+
+    def __init__(self, autosave, key, on_error=None):
+        self.autosave = autosave
+        self.key = key
+        self.on_error = on_error
+        self.widgets = {}
+
+    def bind(self, field, widget):
+        self.widgets[field] = widget
+
+        def record(*_):
+            # A Qt slot: an exception here would only be printed, and the edit silently not journaled
+            try:
+                self.autosave.set(self.key, field, self.value(field))
+            except ValueError as error:
+                log.warning("autosave of %s.%s failed: %s", self.key, field, error)
+                if self.on_error is not None:
+                    self.on_error(field, str(error))
+
+        if isinstance(widget, QLineEdit):
+            widget.textEdited.connect(record)  # user edits only, not setText()
+        elif isinstance(widget, QPlainTextEdit):
+            widget.textChanged.connect(record)
+        elif isinstance(widget, QCheckBox):
+            widget.toggled.connect(record)
+        elif isinstance(widget, (QSpinBox, QDoubleSpinBox)):
+            widget.valueChanged.connect(record)
+        elif isinstance(widget, QComboBox):
+            widget.currentTextChanged.connect(record)
+        elif isinstance(widget, QDateEdit):
+            widget.dateChanged.connect(record)
+        else:
+            raise TypeError(f"can't autosave a {type(widget).__name__}")
+
+    def value(self, field):
+        widget = self.widgets[field]
+        if isinstance(widget, QLineEdit):
+            return widget.text()
+        if isinstance(widget, QPlainTextEdit):
+            return widget.toPlainText()
+        if isinstance(widget, QCheckBox):
+            return widget.isChecked()
+        if isinstance(widget, (QSpinBox, QDoubleSpinBox)):
+            return widget.value()
+        if isinstance(widget, QComboBox):
+            return widget.currentText()
+        return widget.date().toString("yyyy-MM-dd")
+
+    def values(self):
+        return {field: self.value(field) for field in self.widgets}
+
+    def set_value(self, field, value):
+        """Show a value without recording it as an edit"""
+        widget = self.widgets[field]
+        widget.blockSignals(True)
+        try:
+            if isinstance(widget, QLineEdit):
+                widget.setText("" if value is None else str(value))
+            elif isinstance(widget, QPlainTextEdit):
+                widget.setPlainText("" if value is None else str(value))
+            elif isinstance(widget, QCheckBox):
+                widget.setChecked(bool(value))
+            elif isinstance(widget, (QSpinBox, QDoubleSpinBox)):
+                widget.setValue(value or 0)
+            elif isinstance(widget, QComboBox):
+                widget.setCurrentText("" if value is None else str(value))
+            elif value:
+                widget.setDate(QDate.fromString(str(value), "yyyy-MM-dd"))
+        finally:
+            widget.blockSignals(False)
+
+    def load(self, values):
+        """Fill the form with saved values, then with the unsaved draft on top; returns the draft"""
+        for field, value in values.items():
+            if field in self.widgets:
+                self.set_value(field, value)
+        draft = self.autosave.draft(self.key)
+        for field, value in draft.items():
+            if field in self.widgets:
+                self.set_value(field, value)
+        return draft
+
+    def discard(self):
+        self.autosave.discard(self.key)
@@ -0,0 +1,59 @@
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from instrumentation import TRACER
+from core.job_records import JOB_FIELDS
+
+class JobTableModel(QAbstractTableModel):
+    """Read-only table model over a JobTable; cells are read straight from the columns"""
+    COLUMNS = [
+        ("job_ticket", "Job Ticket #"),
+        ("customer", "Customer"),
+        ("customer_po", "Customer PO #"),
+        ("part_number", "Part #"),
+        ("inlay_type", "Inlay Type"),
+        ("label_size", "Label Size"),
+        ("qty", "QTY"),
+        ("rolls", "Rolls"),
+        ("start_serial", "Start"),
+        ("end_serial", "Stop"),
+        ("printer", "Printer"),
+        ("status", "Status"),
+        ("due_date", "Due"),
+    ]
+
+    def __init__(self, table, parent=None):
+        super().__init__(parent)
+        self.table = table
+        self._columns = [table.column(name) for name, _ in self.COLUMNS]
+        self._numeric = [JOB_FIELDS[name] in ("int", "serial") for name, _ in self.COLUMNS]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.table)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            value = self._columns[index.column()].get(index.row())
+            if value is None:
+                return ""
+            return value.isoformat() if hasattr(value, "isoformat") else str(value)
+        if role == Qt.ItemDataRole.TextAlignmentRole and self._numeric[index.column()]:
+            return int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section][1]
+        return None
+
+    def refresh(self, table=None):
+        """Reset the view after the underlying table changed (or was replaced)"""
+        with TRACER.span("JobTableModel.refresh", "model", rows=len(table if table is not None else self.table)):
+            self.beginResetModel()
+            if table is not None:
+                self.table = table
+                self._columns = [table.column(name) for name, _ in self.COLUMNS]
+            self.endResetModel()
@@ -1,12 +1,46 @@
-from PyQt6.QtWidgets import QWidget, QLabel, QVBoxLayout
-from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import (
+    QWidget, QLabel, QVBoxLayout, QHBoxLayout, QPushButton, QTableView, QAbstractItemView, QFileDialog
+)
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QFont
 from theme_manager import THEME_MANAGER
+from instrumentation import TRACER
+from core.event_bus import EVENT_BUS, TASK_PROGRESS
+from core.job_records import JobTable
+from views.job_table_model import JobTableModel
+
+class ImportWorker(QThread):
+    """Runs a bulk order-file import off the GUI thread; rows read so far go out as TASK_PROGRESS "job_import" (rows, 0)"""
+    import_finished = pyqtSignal(object)
+    import_failed = pyqtSignal(str)
+
+    def __init__(self, path, job_store, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.job_store = job_store
+
+    def run(self):
+        from core.job_import import import_jobs  # pulls in NumPy; only needed once someone imports
+        try:
+            with TRACER.span("import_jobs", "task", path=self.path):
+                result = import_jobs(self.path, self.job_store, progress=self.publish_progress)
+        except Exception as error:
+            self.import_failed.emit(str(error))
+            return
+        self.import_finished.emit(result)
+
+    def publish_progress(self, rows):
+        EVENT_BUS.publish(TASK_PROGRESS, "job_import", (rows, 0))
 
 class JobsView(QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, job_table=None, job_store=None, autosave=None, parent=None):
         super().__init__(parent)
+        self.job_store = job_store
+        self.autosave = autosave
+        self.import_worker = None
+        self.job_model = JobTableModel(job_table if job_table is not None else JobTable(), self)
         self.setup_ui()
+        EVENT_BUS.subscribe(TASK_PROGRESS, self.on_task_progress)
         THEME_MANAGER.register_for_theme_updates(self.update_theme_stylesheet)
         self.update_theme_stylesheet()
 
@@ -33,7 +67,95 @@ class JobsView(QWidget):
         description.setWordWrap(True)
         layout.addWidget(description)
 
-        layout.addStretch()
+        # Bulk import of customer order files
+        actions_layout = QHBoxLayout()
+        self.import_button = QPushButton("Import Orders…")
+        self.import_button.setObjectName("importButton")
+        self.import_button.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.import_button.clicked.connect(self.choose_import_file)
+        self.import_button.setVisible(self.job_store is not None)
+        self.import_status = QLabel("")
+        self.import_status.setObjectName("importStatus")
+        actions_layout.addWidget(self.import_button)
+        actions_layout.addWidget(self.import_status, 1)
+        layout.addLayout(actions_layout)
+
+        # Checklists left unsaved when the app last closed or crashed
+        self.recovery_status = QLabel("")
+        self.recovery_status.setObjectName("recoveryStatus")
+        self.recovery_status.setWordWrap(True)
+        layout.addWidget(self.recovery_status)
+        self.update_recovery_status()
+
+        # Job list (reads the shared columnar JobTable through JobTableModel)
+        self.jobs_table = QTableView()
+        self.jobs_table.setObjectName("jobsTable")
+        self.jobs_table.setModel(self.job_model)
+        self.jobs_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.jobs_table.setAlternatingRowColors(True)
+        self.jobs_table.verticalHeader().setVisible(False)
+        self.jobs_table.horizontalHeader().setStretchLastSection(True)
+        self.jobs_table.doubleClicked.connect(self.open_checklist)
+        layout.addWidget(self.jobs_table, 1)
+
+    def open_checklist(self, index):
+        if self.job_store is None or self.autosave is None or not index.isValid():
+            return
+        from views.checklist_form import ChecklistForm
+        job_id = self.job_model.table.column("job_id").get(index.row())
+        ChecklistForm(job_id, self.job_store, self.autosave, self).exec()
+        self.update_recovery_status()
+
+    def update_recovery_status(self):
+        drafts = sorted(int(key.split(":")[1]) for key in (self.autosave.drafts() if self.autosave else {})
+                        if key.startswith("checklist:"))
+        if drafts:
+            jobs = ", ".join(str(job_id) for job_id in drafts[:10]) + (" …" if len(drafts) > 10 else "")
+            self.recovery_status.setText(f"Unsaved checklist changes for job {jobs} - double-click the job to "
+                                         f"review and save them")
+        else:
+            self.recovery_status.setText("")
+        self.recovery_status.setVisible(bool(drafts))
+
+    def choose_import_file(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import Orders", "", "Order files (*.csv *.xlsx);;All files (*)")
+        if path:
+            self.start_import(path)
+
+    def start_import(self, path):
+        if self.import_worker is not None:
+            return
+        self.import_button.setEnabled(False)
+        self.import_status.setText("Importing…")
+        self.import_worker = ImportWorker(path, self.job_store, self)
+        self.import_worker.import_finished.connect(self.on_import_finished)
+        self.import_worker.import_failed.connect(self.on_import_failed)
+        self.import_worker.start()
+
+    def on_task_progress(self, events):
+        for event in events:
+            # Progress merged into the last frame may arrive after the import already finished
+            if event.key == "job_import" and self.import_worker is not None:
+                self.import_status.setText(f"Importing… {event.payload[0]:,} rows read")
+
+    def on_import_finished(self, result):
+        # The table itself refreshes once, from the store's single bulk change notification
+        message = f"Imported {result.rows_imported:,} of {result.rows_read:,} rows in {result.elapsed:.1f}s"
+        if result.errors:
+            first = result.errors[0]
+            message += f"; {result.rows_rejected:,} rejected (line {first.line}: {first.message})"
+        self.import_status.setText(message)
+        self._import_done()
+
+    def on_import_failed(self, message):
+        self.import_status.setText(f"Import failed: {message}")
+        self._import_done()
+
+    def _import_done(self):
+        self.import_worker.wait()
+        self.import_worker = None
+        self.import_button.setEnabled(True)
 
     def update_theme_stylesheet(self):
         theme = THEME_MANAGER.current()
@@ -49,7 +171,46 @@ class JobsView(QWidget):
                 color: {theme["SECONDARY_TEXT"]};
                 line-height: 1.4;
             }}
+            QLabel#importStatus {{
+                color: {theme["MUTED_TEXT"]};
+            }}
+            QLabel#recoveryStatus {{
+                color: {theme["ALERT_COLOR"]};
+            }}
+            QPushButton#importButton {{
+                background-color: {theme["PRIMARY_ACCENT"]};
+                color: {theme["PRIMARY_ACCENT_TEXT"]};
+                border: none;
+                border-radius: 6px;
+                padding: 8px 16px;
+                font-weight: 500;
+            }}
+            QPushButton#importButton:hover {{
+                background-color: {theme["PRIMARY_ACCENT_HOVER"]};
+            }}
+            QPushButton#importButton:pressed {{
+                background-color: {theme["PRIMARY_ACCENT_PRESSED"]};
+            }}
+            QTableView#jobsTable {{
+                background-color: {theme["CONTENT_BACKGROUND"]};
+                alternate-background-color: {theme["WINDOW_BACKGROUND"]};
+                color: {theme["PRIMARY_TEXT"]};
+                border: 1px solid {theme["BORDER_COLOR"]};
+                border-radius: 8px;
+                gridline-color: {theme["BORDER_COLOR"]};
+                selection-background-color: {theme["PRIMARY_ACCENT"]};
+                selection-color: {theme["PRIMARY_ACCENT_TEXT"]};
+            }}
+            QHeaderView::section {{
+                background-color: {theme["CONTENT_BACKGROUND"]};
+                color: {theme["SECONDARY_TEXT"]};
+                border: none;
+                border-bottom: 1px solid {theme["BORDER_COLOR"]};
+                padding: 6px;
+                font-weight: 600;
+            }}
         """)
 
     def __del__(self):
-        THEME_MANAGER.unregister_for_theme_updates(self.update_theme_stylesheet) 
\ No newline at end of file
+        THEME_MANAGER.unregister_for_theme_updates(self.update_theme_stylesheet)
+        EVENT_BUS.unsubscribe(TASK_PROGRESS, self.on_task_progress) 
\ No newline at end of file
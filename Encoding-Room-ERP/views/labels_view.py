@@ -1,11 +1,41 @@
-from PyQt6.QtWidgets import QWidget, QLabel, QVBoxLayout
-from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import (
+    QWidget, QLabel, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QSpinBox, QTableView, QAbstractItemView
+)
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QFont
 from theme_manager import THEME_MANAGER
+from instrumentation import TRACER
+from views.epc_data_model import EpcDataModel
+
+class GenerateWorker(QThread):
+    """Writes a job's EPC data file off the GUI thread"""
+    generated = pyqtSignal(object)
+    generation_failed = pyqtSignal(str)
+
+    def __init__(self, job, parent=None):
+        super().__init__(parent)
+        self.job = job
+
+    def run(self):
+        from core import config
+        from core.epc_data_file import generate_job_data
+        from core.epc_guard import EpcGuard
+        try:
+            with TRACER.span("generate_job_data", "task", job_id=self.job.job_id):
+                # Same company prefix length as the CLI (ERP_COMPANY_DIGITS), or the GTIN splits differently
+                data_file = generate_job_data(self.job, company_digits=config.COMPANY_DIGITS, guard=EpcGuard())
+        except Exception as error:
+            self.generation_failed.emit(str(error))
+            return
+        self.generated.emit(data_file)
 
 class LabelsView(QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, job_store=None, parent=None):
         super().__init__(parent)
+        self.job_store = job_store
+        self.data_file = None
+        self.generate_worker = None
+        self.epc_model = EpcDataModel(self)
         self.setup_ui()
         THEME_MANAGER.register_for_theme_updates(self.update_theme_stylesheet)
         self.update_theme_stylesheet()
@@ -33,7 +63,94 @@ class LabelsView(QWidget):
         description.setWordWrap(True)
         layout.addWidget(description)
 
-        layout.addStretch()
+        # EPC data preview: job's memory-mapped data file, one roll at a time
+        preview_layout = QHBoxLayout()
+        self.job_id_input = QLineEdit()
+        self.job_id_input.setObjectName("jobIdInput")
+        self.job_id_input.setPlaceholderText("Job ID")
+        self.job_id_input.returnPressed.connect(self.load_job_data)
+        self.load_button = QPushButton("Preview EPCs")
+        self.load_button.setObjectName("loadDataButton")
+        self.load_button.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.load_button.clicked.connect(self.load_job_data)
+        self.roll_selector = QSpinBox()
+        self.roll_selector.setObjectName("rollSelector")
+        self.roll_selector.setPrefix("Roll ")
+        self.roll_selector.setEnabled(False)
+        self.roll_selector.valueChanged.connect(self.show_roll)
+        self.data_status = QLabel("")
+        self.data_status.setObjectName("dataStatus")
+        preview_layout.addWidget(self.job_id_input)
+        preview_layout.addWidget(self.load_button)
+        preview_layout.addWidget(self.roll_selector)
+        preview_layout.addWidget(self.data_status, 1)
+        layout.addLayout(preview_layout)
+
+        self.epc_table = QTableView()
+        self.epc_table.setObjectName("epcTable")
+        self.epc_table.setModel(self.epc_model)
+        self.epc_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.epc_table.setAlternatingRowColors(True)
+        self.epc_table.verticalHeader().setVisible(False)
+        self.epc_table.verticalHeader().setDefaultSectionSize(24)
+        self.epc_table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.epc_table, 1)
+
+    def load_job_data(self):
+        from core.epc_data_file import StaleDataError, open_job_data
+        text = self.job_id_input.text().strip()
+        if not text.isdigit() or self.generate_worker is not None:
+            return
+        job_id = int(text)
+        job = self.job_store.get_job(job_id) if self.job_store is not None else None
+        if job is None:
+            self.data_status.setText(f"No job {job_id}")
+            return
+        status = f"Generating EPC data for job {job_id}…"
+        try:
+            data_file = open_job_data(job)
+        except StaleDataError:
+            # Serials, GTIN or prefix length changed since the file was written
+            data_file = None
+            status = f"Job {job_id} changed since its EPC data was generated; regenerating…"
+        if data_file is not None:
+            self.set_data_file(data_file)
+            return
+        # First preview of this job (or of its new fields): generate its data file once, in the background
+        self.load_button.setEnabled(False)
+        self.data_status.setText(status)
+        self.generate_worker = GenerateWorker(job, self)
+        self.generate_worker.generated.connect(self.on_generated)
+        self.generate_worker.generation_failed.connect(self.on_generation_failed)
+        self.generate_worker.start()
+
+    def on_generated(self, data_file):
+        self._generation_done()
+        self.set_data_file(data_file)
+
+    def on_generation_failed(self, message):
+        self._generation_done()
+        self.data_status.setText(f"Could not generate EPC data: {message}")
+
+    def _generation_done(self):
+        self.generate_worker.wait()
+        self.generate_worker = None
+        self.load_button.setEnabled(True)
+
+    def set_data_file(self, data_file):
+        self.data_file = data_file
+        self.roll_selector.blockSignals(True)
+        self.roll_selector.setRange(1, max(1, data_file.roll_count))
+        self.roll_selector.setValue(1)
+        self.roll_selector.blockSignals(False)
+        self.roll_selector.setEnabled(data_file.roll_count > 0)
+        self.data_status.setText(f"Job {data_file.job_id}: {len(data_file):,} tags on "
+                                 f"{data_file.roll_count:,} rolls ({data_file.scheme})")
+        self.show_roll(1)
+
+    def show_roll(self, roll):
+        if self.data_file is not None and self.data_file.roll_count:
+            self.epc_model.show_roll(self.data_file, roll - 1)
 
     def update_theme_stylesheet(self):
         theme = THEME_MANAGER.current()
@@ -49,7 +166,49 @@ class LabelsView(QWidget):
                 color: {theme["SECONDARY_TEXT"]};
                 line-height: 1.4;
             }}
+            QLabel#dataStatus {{
+                color: {theme["MUTED_TEXT"]};
+            }}
+            QLineEdit#jobIdInput, QSpinBox#rollSelector {{
+                background-color: {theme["CONTENT_BACKGROUND"]};
+                color: {theme["PRIMARY_TEXT"]};
+                border: 1px solid {theme["BORDER_COLOR"]};
+                border-radius: 6px;
+                padding: 6px 8px;
+            }}
+            QPushButton#loadDataButton {{
+                background-color: {theme["PRIMARY_ACCENT"]};
+                color: {theme["PRIMARY_ACCENT_TEXT"]};
+                border: none;
+                border-radius: 6px;
+                padding: 8px 16px;
+                font-weight: 500;
+            }}
+            QPushButton#loadDataButton:hover {{
+                background-color: {theme["PRIMARY_ACCENT_HOVER"]};
+            }}
+            QPushButton#loadDataButton:pressed {{
+                background-color: {theme["PRIMARY_ACCENT_PRESSED"]};
+            }}
+            QTableView#epcTable {{
+                background-color: {theme["CONTENT_BACKGROUND"]};
+                alternate-background-color: {theme["WINDOW_BACKGROUND"]};
+                color: {theme["PRIMARY_TEXT"]};
+                border: 1px solid {theme["BORDER_COLOR"]};
+                border-radius: 8px;
+                gridline-color: {theme["BORDER_COLOR"]};
+                selection-background-color: {theme["PRIMARY_ACCENT"]};
+                selection-color: {theme["PRIMARY_ACCENT_TEXT"]};
+            }}
+            QHeaderView::section {{
+                background-color: {theme["CONTENT_BACKGROUND"]};
+                color: {theme["SECONDARY_TEXT"]};
+                border: none;
+                border-bottom: 1px solid {theme["BORDER_COLOR"]};
+                padding: 6px;
+                font-weight: 600;
+            }}
         """)
 
     def __del__(self):
-        THEME_MANAGER.unregister_for_theme_updates(self.update_theme_stylesheet) 
\ No newline at end of file
+        THEME_MANAGER.unregister_for_theme_updates(self.update_theme_stylesheet)
@@ -1,11 +1,374 @@
-from PyQt6.QtWidgets import QWidget, QLabel, QVBoxLayout
-from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import (
+    QWidget, QLabel, QVBoxLayout, QHBoxLayout, QPushButton, QDateEdit, QProgressBar, QFileDialog, QComboBox,
+    QLineEdit
+)
+from PyQt6.QtCore import Qt, QThread, QDate, pyqtSignal
+from PyQt6.QtGui import QFont
+from theme_manager import THEME_MANAGER
+from instrumentation import TRACER
+from core.event_bus import EVENT_BUS, TASK_PROGRESS
+
+class ChecklistWorker(QThread):
+    """Renders a month of Encoding Checklist PDFs; the rendering itself runs in a process pool
+
+    Progress goes out as TASK_PROGRESS "checklists" (done, total)."""
+    batch_finished = pyqtSignal(int, list)
+    batch_failed = pyqtSignal(str)
+
+    def __init__(self, job_store, year, month, directory, parent=None):
+        super().__init__(parent)
+        self.job_store = job_store
+        self.year = year
+        self.month = month
+        self.directory = directory
+
+    def run(self):
+        from checklist_pdf import render_checklists
+        from core.checklist import completed_job_ids, month_range
+        try:
+            with TRACER.span("render_checklists", "task", year=self.year, month=self.month):
+                job_ids = completed_job_ids(self.job_store, *month_range(self.year, self.month))
+                rendered, failures = 0, []
+                for _, ok, message in render_checklists(job_ids, self.directory, progress=self.publish_progress):
+                    if ok:
+                        rendered += 1
+                    else:
+                        failures.append(message)
+        except Exception as error:
+            self.batch_failed.emit(str(error))
+            return
+        self.batch_finished.emit(rendered, failures)
+
+    def publish_progress(self, done, total):
+        EVENT_BUS.publish(TASK_PROGRESS, "checklists", (done, total))
+
+class ReportExportWorker(QThread):
+    """Streams one tag / production extract to a Parquet or XLSX file
+
+    Progress goes out as TASK_PROGRESS "report_export" (rows, permille)."""
+    export_finished = pyqtSignal(object)
+    export_failed = pyqtSignal(str)
+
+    def __init__(self, job_store, kind, fmt, first_day, last_day, job_ids, path, parent=None):
+        super().__init__(parent)
+        self.job_store = job_store
+        self.kind = kind
+        self.fmt = fmt
+        self.first_day = first_day
+        self.last_day = last_day
+        self.job_ids = job_ids
+        self.path = path
+
+    def run(self):
+        from core.report_export import export_report, report_source
+        try:
+            with TRACER.span("export_report", "task", kind=self.kind, format=self.fmt):
+                source = report_source(self.job_store, self.kind, self.first_day, self.last_day, self.job_ids)
+                result = export_report(source, self.path, self.fmt, self.kind,
+                                       progress=self.publish_progress,
+                                       cancelled=self.isInterruptionRequested)
+        except InterruptedError:
+            self.export_failed.emit("cancelled")
+            return
+        except Exception as error:
+            self.export_failed.emit(str(error))
+            return
+        self.export_finished.emit(result)
+
+    def publish_progress(self, rows, fraction):
+        EVENT_BUS.publish(TASK_PROGRESS, "report_export", (rows, int(fraction * 1000)))
 
 class ReportsView(QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, job_store=None, parent=None):
         super().__init__(parent)
+        self.job_store = job_store
+        self.checklist_worker = None
+        self.export_worker = None
+        self.setup_ui()
+        EVENT_BUS.subscribe(TASK_PROGRESS, self.on_task_progress)
+        THEME_MANAGER.register_for_theme_updates(self.update_theme_stylesheet)
+        self.update_theme_stylesheet()
+
+    def setup_ui(self):
         layout = QVBoxLayout(self)
-        label = QLabel("Reports View Content")
-        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        layout.addWidget(label)
-        self.setStyleSheet("background-color: #f8f9fa;") 
\ No newline at end of file
+        layout.setContentsMargins(40, 40, 40, 40)
+        layout.setSpacing(20)
+
+        # Title
+        title = QLabel("Reports")
+        title.setObjectName("pageTitle")
+        title_font = QFont("Segoe UI", 24, QFont.Weight.Bold)
+        title.setFont(title_font)
+        layout.addWidget(title)
+
+        # Description
+        description = QLabel(
+            "Produce compliance paperwork and data exports for completed work."
+        )
+        description.setObjectName("pageDescription")
+        desc_font = QFont("Segoe UI", 12)
+        description.setFont(desc_font)
+        description.setWordWrap(True)
+        layout.addWidget(description)
+
+        # Month-end Encoding Checklists (one PDF per completed job)
+        section = QLabel("Encoding Checklists")
+        section.setObjectName("sectionTitle")
+        section.setFont(QFont("Segoe UI", 14, QFont.Weight.DemiBold))
+        layout.addWidget(section)
+
+        checklist_layout = QHBoxLayout()
+        self.month_input = QDateEdit(QDate.currentDate())
+        self.month_input.setObjectName("monthInput")
+        self.month_input.setDisplayFormat("MMMM yyyy")
+        self.month_input.setCalendarPopup(True)
+        self.checklist_button = QPushButton("Render Checklists…")
+        self.checklist_button.setObjectName("checklistButton")
+        self.checklist_button.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.checklist_button.clicked.connect(self.choose_checklist_directory)
+        self.checklist_button.setEnabled(self.job_store is not None)
+        checklist_layout.addWidget(self.month_input)
+        checklist_layout.addWidget(self.checklist_button)
+        checklist_layout.addStretch(1)
+        layout.addLayout(checklist_layout)
+
+        self.checklist_progress = QProgressBar()
+        self.checklist_progress.setObjectName("checklistProgress")
+        self.checklist_progress.setVisible(False)
+        layout.addWidget(self.checklist_progress)
+        self.checklist_status = QLabel("")
+        self.checklist_status.setObjectName("checklistStatus")
+        self.checklist_status.setWordWrap(True)
+        layout.addWidget(self.checklist_status)
+
+        # Per-tag / per-event extracts for finance and customers
+        section = QLabel("Data Export")
+        section.setObjectName("sectionTitle")
+        section.setFont(QFont("Segoe UI", 14, QFont.Weight.DemiBold))
+        layout.addWidget(section)
+
+        export_layout = QHBoxLayout()
+        self.kind_input = QComboBox()
+        self.kind_input.setObjectName("reportInput")
+        self.kind_input.addItem("Encoded tags", "tags")
+        self.kind_input.addItem("Production events", "production")
+        today = QDate.currentDate()
+        self.from_input = QDateEdit(QDate(today.year(), today.month(), 1))
+        self.to_input = QDateEdit(today)
+        for date_input in (self.from_input, self.to_input):
+            date_input.setObjectName("monthInput")
+            date_input.setDisplayFormat("yyyy-MM-dd")
+            date_input.setCalendarPopup(True)
+        self.jobs_input = QLineEdit()
+        self.jobs_input.setObjectName("reportInput")
+        self.jobs_input.setPlaceholderText("Job ids (optional, e.g. 100, 200)")
+        self.format_input = QComboBox()
+        self.format_input.setObjectName("reportInput")
+        self.format_input.addItem("Parquet", "parquet")
+        self.format_input.addItem("Excel (XLSX)", "xlsx")
+        self.export_button = QPushButton("Export…")
+        self.export_button.setObjectName("checklistButton")
+        self.export_button.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.export_button.clicked.connect(self.choose_export_path)
+        self.export_button.setEnabled(self.job_store is not None)
+        self.cancel_export_button = QPushButton("Cancel")
+        self.cancel_export_button.setObjectName("secondaryButton")
+        self.cancel_export_button.clicked.connect(self.cancel_export)
+        self.cancel_export_button.setVisible(False)
+        export_layout.addWidget(self.kind_input)
+        export_layout.addWidget(QLabel("From"))
+        export_layout.addWidget(self.from_input)
+        export_layout.addWidget(QLabel("To"))
+        export_layout.addWidget(self.to_input)
+        export_layout.addWidget(self.jobs_input, 1)
+        export_layout.addWidget(self.format_input)
+        export_layout.addWidget(self.export_button)
+        export_layout.addWidget(self.cancel_export_button)
+        layout.addLayout(export_layout)
+
+        self.export_progress = QProgressBar()
+        self.export_progress.setObjectName("checklistProgress")
+        self.export_progress.setRange(0, 1000)
+        self.export_progress.setTextVisible(False)
+        self.export_progress.setVisible(False)
+        layout.addWidget(self.export_progress)
+        self.export_status = QLabel("")
+        self.export_status.setObjectName("checklistStatus")
+        self.export_status.setWordWrap(True)
+        layout.addWidget(self.export_status)
+        layout.addStretch(1)
+
+    def choose_checklist_directory(self):
+        directory = QFileDialog.getExistingDirectory(self, "Save Checklists To")
+        if directory:
+            month = self.month_input.date()
+            self.start_checklists(month.year(), month.month(), directory)
+
+    def start_checklists(self, year, month, directory):
+        if self.checklist_worker is not None:
+            return
+        self.checklist_button.setEnabled(False)
+        self.checklist_progress.setRange(0, 0)
+        self.checklist_progress.setVisible(True)
+        self.checklist_status.setText("Finding completed jobs…")
+        self.checklist_worker = ChecklistWorker(self.job_store, year, month, directory, self)
+        self.checklist_worker.batch_finished.connect(self.on_checklists_finished)
+        self.checklist_worker.batch_failed.connect(self.on_checklists_failed)
+        self.checklist_worker.start()
+
+    def on_task_progress(self, events):
+        # Progress merged into the last frame may arrive after its task already finished
+        for event in events:
+            if event.key == "checklists" and self.checklist_worker is not None:
+                self.on_checklist_progress(*event.payload)
+            elif event.key == "report_export" and self.export_worker is not None:
+                self.on_export_progress(*event.payload)
+
+    def on_checklist_progress(self, done, total):
+        self.checklist_progress.setRange(0, total)
+        self.checklist_progress.setValue(done)
+        self.checklist_status.setText(f"Rendering checklists… {done:,} of {total:,}")
+
+    def on_checklists_finished(self, rendered, failures):
+        message = f"Rendered {rendered:,} checklists to {self.checklist_worker.directory}"
+        if failures:
+            message += f"; {len(failures):,} failed ({failures[0]})"
+        self.checklist_status.setText(message)
+        self._checklists_done()
+
+    def on_checklists_failed(self, message):
+        self.checklist_status.setText(f"Rendering failed: {message}")
+        self._checklists_done()
+
+    def _checklists_done(self):
+        self.checklist_worker.wait()
+        self.checklist_worker = None
+        self.checklist_progress.setVisible(False)
+        self.checklist_button.setEnabled(True)
+
+    def choose_export_path(self):
+        fmt = self.format_input.currentData()
+        kind = self.kind_input.currentData()
+        first, last = self.from_input.date().toPyDate(), self.to_input.date().toPyDate()
+        try:
+            job_ids = [int(part) for part in self.jobs_input.text().replace(",", " ").split()]
+        except ValueError:
+            self.export_status.setText("Job ids must be numbers, e.g. 100, 200")
+            return
+        if first > last:
+            self.export_status.setText("The From date is after the To date")
+            return
+        suggested = f"{kind}-{first:%Y%m%d}-{last:%Y%m%d}.{fmt}"
+        path, _ = QFileDialog.getSaveFileName(self, "Export Report", suggested,
+                                              "Parquet (*.parquet)" if fmt == "parquet" else "Excel (*.xlsx)")
+        if path:
+            self.start_export(kind, fmt, first, last, job_ids, path)
+
+    def start_export(self, kind, fmt, first_day, last_day, job_ids, path):
+        if self.export_worker is not None:
+            return
+        self.export_button.setEnabled(False)
+        self.cancel_export_button.setVisible(True)
+        self.export_progress.setValue(0)
+        self.export_progress.setVisible(True)
+        self.export_status.setText("Starting export…")
+        self.export_worker = ReportExportWorker(self.job_store, kind, fmt, first_day, last_day, job_ids, path, self)
+        self.export_worker.export_finished.connect(self.on_export_finished)
+        self.export_worker.export_failed.connect(self.on_export_failed)
+        self.export_worker.start()
+
+    def cancel_export(self):
+        if self.export_worker is not None:
+            self.export_worker.requestInterruption()
+
+    def on_export_progress(self, rows, permille):
+        self.export_progress.setValue(permille)
+        self.export_status.setText(f"Exporting… {rows:,} rows")
+
+    def on_export_finished(self, result):
+        message = f"Exported {result.rows:,} rows to {result.path} in {result.elapsed:.1f}s"
+        if result.skipped:
+            message += f"; no EPC data for job{'s' if len(result.skipped) != 1 else ''} " \
+                       f"{', '.join(map(str, result.skipped))}"
+        self.export_status.setText(message)
+        self._export_done()
+
+    def on_export_failed(self, message):
+        self.export_status.setText(f"Export failed: {message}")
+        self._export_done()
+
+    def _export_done(self):
+        self.export_worker.wait()
+        self.export_worker = None
+        self.export_progress.setVisible(False)
+        self.cancel_export_button.setVisible(False)
+        self.export_button.setEnabled(True)
+
+    def update_theme_stylesheet(self):
+        theme = THEME_MANAGER.current()
+        self.setStyleSheet(f"""
+            QWidget {{
+                background-color: {theme["WINDOW_BACKGROUND"]};
+            }}
+            QLabel#pageTitle {{
+                color: {theme["PRIMARY_TEXT"]};
+                margin-bottom: 10px;
+            }}
+            QLabel#pageDescription {{
+                color: {theme["SECONDARY_TEXT"]};
+                line-height: 1.4;
+            }}
+            QLabel#sectionTitle {{
+                color: {theme["PRIMARY_TEXT"]};
+            }}
+            QLabel#checklistStatus {{
+                color: {theme["MUTED_TEXT"]};
+            }}
+            QLabel {{
+                color: {theme["SECONDARY_TEXT"]};
+            }}
+            QDateEdit#monthInput, QComboBox#reportInput, QLineEdit#reportInput {{
+                background-color: {theme["CONTENT_BACKGROUND"]};
+                color: {theme["PRIMARY_TEXT"]};
+                border: 1px solid {theme["BORDER_COLOR"]};
+                border-radius: 6px;
+                padding: 6px 8px;
+            }}
+            QPushButton#checklistButton {{
+                background-color: {theme["PRIMARY_ACCENT"]};
+                color: {theme["PRIMARY_ACCENT_TEXT"]};
+                border: none;
+                border-radius: 6px;
+                padding: 8px 16px;
+                font-weight: 500;
+            }}
+            QPushButton#checklistButton:hover {{
+                background-color: {theme["PRIMARY_ACCENT_HOVER"]};
+            }}
+            QPushButton#checklistButton:pressed {{
+                background-color: {theme["PRIMARY_ACCENT_PRESSED"]};
+            }}
+            QPushButton#secondaryButton {{
+                background-color: transparent;
+                color: {theme["SECONDARY_TEXT"]};
+                border: 1px solid {theme["BORDER_COLOR"]};
+                border-radius: 6px;
+                padding: 8px 16px;
+            }}
+            QProgressBar#checklistProgress {{
+                background-color: {theme["CONTENT_BACKGROUND"]};
+                border: 1px solid {theme["BORDER_COLOR"]};
+                border-radius: 4px;
+                height: 8px;
+                text-align: center;
+                color: {theme["SECONDARY_TEXT"]};
+            }}
+            QProgressBar#checklistProgress::chunk {{
+                background-color: {theme["PRIMARY_ACCENT"]};
+                border-radius: 4px;
+            }}
+        """)
+
+    def __del__(self):
+        THEME_MANAGER.unregister_for_theme_updates(self.update_theme_stylesheet)
+        EVENT_BUS.unsubscribe(TASK_PROGRESS, self.on_task_progress)